@@ -1,22 +1,70 @@
 from flask import Flask
+from app.auth import init_app as init_auth
 from app.config import Config
-from app.database import get_db
+from app.database import init_app as init_db, on_database_open, opened_database
+from app.jobs import start_job_runner
+from app.maintenance import start_index_checkpoints, start_pack_scheduler
+from app.metrics import init_app as init_metrics
 
-def create_app():
+def create_app(config=None):
     # Créer l'application Flask
     app = Flask(__name__)
     app.config.from_object(Config)
+    # Surcharges (serveur de production, scripts)
+    app.config.update(config or {})
 
-    # Initialiser la base de données
-    db = get_db()
+    # Base de données ouverte à la première requête (une connexion du pool par requête)
+    init_db(app)
+
+    # Durées, activité ZODB et commits par endpoint (exposés sur /metrics)
+    init_metrics(app)
+
+    # Pool bcrypt borné et cache des sessions (connexion, jetons)
+    init_auth(app)
+
+    # Services d'arrière-plan, démarrés à l'ouverture de la base
+    app.extensions.update(zodb_pack=None, zodb_index=None, jobs=None)
+
+    def start_services(db):
+        # Compactage périodique du stockage (si configuré)
+        app.extensions['zodb_pack'] = start_pack_scheduler(app, db)
+        # Enregistrement périodique de l'index du FileStorage (reprise rapide après un arrêt brutal)
+        app.extensions['zodb_index'] = start_index_checkpoints(app, db)
+        # Tâches de fond (suppressions en cascade, exports), reprises à l'ouverture
+        app.extensions['jobs'] = start_job_runner(app, db)
+
+    on_database_open(app, start_services)
 
     # Enregistrer les Blueprints
     from app.routes.user_routes import user_bp
     from app.routes.list_routes import list_bp
     from app.routes.todo_routes import todo_bp
+    from app.routes.job_routes import job_bp
+    from app.routes.sync_routes import sync_bp
+    from app.routes.import_routes import import_bp
+    from app.routes.auth_routes import auth_bp
+    from app.routes.metrics_routes import metrics_bp
 
     app.register_blueprint(user_bp, url_prefix='/api/users')
     app.register_blueprint(list_bp, url_prefix='/api/lists')
     app.register_blueprint(todo_bp, url_prefix='/api/todos')
+    app.register_blueprint(job_bp, url_prefix='/api/jobs')
+    app.register_blueprint(sync_bp, url_prefix='/api/sync')
+    app.register_blueprint(import_bp, url_prefix='/api/import')
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(metrics_bp, url_prefix='/metrics')
+
+    return app
 
-    return app
\ No newline at end of file
+def shutdown_app(app):
+    """Arrête les services d'arrière-plan puis ferme la base si elle a été ouverte"""
+    for name in ('zodb_pack', 'zodb_index', 'jobs'):
+        service = app.extensions.get(name)
+        if service is not None:
+            # Les tâches de fond s'arrêtent à leur prochain lot et reprendront plus tard
+            service.stop()
+    # Les calculs bcrypt en attente sont abandonnés (leurs requêtes sont terminées ou expirées)
+    app.extensions['auth']['hasher'].stop()
+    db = opened_database(app)
+    if db is not None:
+        db.close()
@@ -0,0 +1,226 @@
+import functools
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+import transaction
+from flask import current_app, g, jsonify, request
+from app.database import get_db
+
+class HasherBusy(Exception):
+    """Trop de calculs bcrypt en attente : la requête est refusée plutôt que mise en file"""
+
+def is_password_hash(value):
+    """Vrai pour un hash bcrypt (les anciens comptes ont leur mot de passe en clair)"""
+    return isinstance(value, str) and value.startswith(('$2a$', '$2b$', '$2y$'))
+
+def hash_rounds(value):
+    """Facteur de coût d'un hash bcrypt"""
+    return int(value.split('$')[2])
+
+class PasswordHasher:
+    """Calculs bcrypt sur un pool borné de threads.
+
+    bcrypt libère le GIL : les threads du pool occupent des cœurs sans bloquer
+    les threads de requêtes. Au-delà de `workers` calculs en cours et
+    `max_pending` en attente, HasherBusy est levée aussitôt : une rafale de
+    connexions ne peut pas accumuler des secondes de travail en file.
+    """
+
+    def __init__(self, workers=2, rounds=12, max_pending=32):
+        self.rounds = rounds
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._dummy_hash = None
+        self.rejected = 0
+
+    def _run(self, function, *args):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HasherBusy()
+        try:
+            future = self._executor.submit(function, *args)
+        except RuntimeError:
+            # Pool arrêté (fin du processus)
+            self._slots.release()
+            raise HasherBusy()
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def hash(self, password):
+        """Hash bcrypt d'un mot de passe, au coût configuré"""
+        salt = bcrypt.gensalt(self.rounds)
+        return self._run(bcrypt.hashpw, password.encode('utf-8'), salt).decode('ascii')
+
+    def verify(self, password, password_hash):
+        """Vérifie un mot de passe ; sans hash (utilisateur inconnu), le coût est le même"""
+        if password_hash is None:
+            if self._dummy_hash is None:
+                self._dummy_hash = self.hash(secrets.token_hex(16))
+            self._run(bcrypt.checkpw, password.encode('utf-8'), self._dummy_hash.encode('ascii'))
+            return False
+        if not is_password_hash(password_hash):
+            # Ancien compte : mot de passe en clair, remplacé par un hash à la connexion
+            return hmac.compare_digest(password.encode('utf-8'), password_hash.encode('utf-8'))
+        return self._run(bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('ascii'))
+
+    def needs_rehash(self, password_hash):
+        """Vrai si le hash est absent, en clair ou d'un autre coût que celui configuré"""
+        return not is_password_hash(password_hash) or hash_rounds(password_hash) != self.rounds
+
+    def stop(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+class SessionCache:
+    """Cache LRU des sessions vérifiées dans ce processus.
+
+    Une requête authentifiée ne lit la base (et ne calcule aucun bcrypt) que
+    si sa session n'a pas été vue depuis `revalidate_seconds` : une session
+    fermée dans un autre processus cesse d'être acceptée au plus tard après ce délai.
+    """
+
+    def __init__(self, max_entries=10000, revalidate_seconds=60):
+        self.max_entries = max_entries
+        self.revalidate_seconds = revalidate_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest, now):
+        """user_id d'une session vérifiée récemment et non expirée, sinon None"""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None or entry[1] <= now or now - entry[2] >= self.revalidate_seconds:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, digest, user_id, expires, now):
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._entries[digest] = (user_id, expires, now)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, digest):
+        with self._lock:
+            self._entries.pop(digest, None)
+
+    def discard_user(self, user_id):
+        with self._lock:
+            for digest in [digest for digest, entry in self._entries.items() if entry[0] == user_id]:
+                del self._entries[digest]
+
+    def __len__(self):
+        return len(self._entries)
+
+def token_digest(token):
+    """Empreinte d'un jeton de session, sous laquelle il est stocké"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+def token_user_id(token):
+    """Utilisateur désigné par un jeton `<user_id>.<secret>`, ou None"""
+    user_id, separator, secret = token.partition('.')
+    return user_id if separator and user_id and secret else None
+
+def password_hasher():
+    return current_app.extensions['auth']['hasher']
+
+def session_cache():
+    return current_app.extensions['auth']['sessions']
+
+def after_commit(callback):
+    """Appelle callback() si la transaction en cours est validée.
+
+    Le cache de sessions ne reflète que des écritures validées : une requête
+    rejouée après un conflit n'y laisse pas de session qui n'existe pas en base.
+    """
+    transaction.get().addAfterCommitHook(lambda committed: committed and callback())
+
+def open_session(root, user_id):
+    """Crée une session ; retourne (jeton, expiration en secondes epoch)"""
+    token = f'{user_id}.{secrets.token_urlsafe(32)}'
+    now = time.time()
+    expires = now + current_app.config.get('AUTH_SESSION_HOURS', 24) * 3600
+    digest = token_digest(token)
+    root.sessions.add(user_id, digest, expires)
+    cache = session_cache()
+    after_commit(lambda: cache.put(digest, user_id, expires, now))
+    return token, expires
+
+def close_session(root, token):
+    digest = token_digest(token)
+    cache = session_cache()
+    # Retirée aussitôt, puis après le commit : une requête concurrente peut l'y avoir remise entre-temps
+    cache.discard(digest)
+    after_commit(lambda: cache.discard(digest))
+    return root.sessions.remove(token_user_id(token), digest)
+
+def close_user_sessions(root, user_id):
+    """Ferme les sessions d'un utilisateur (mot de passe changé, compte supprimé)"""
+    cache = session_cache()
+    cache.discard_user(user_id)
+    after_commit(lambda: cache.discard_user(user_id))
+    return root.sessions.revoke_user(user_id)
+
+def authenticate(root, token):
+    """user_id de la session du jeton, ou None ; aucun calcul bcrypt"""
+    digest = token_digest(token)
+    now = time.time()
+    cache = session_cache()
+    user_id = cache.get(digest, now)
+    if user_id is not None:
+        return user_id
+    user_id = token_user_id(token)
+    expires = root.sessions.get(user_id, digest, now) if user_id is not None else None
+    if expires is None:
+        cache.discard(digest)
+        return None
+    cache.put(digest, user_id, expires, now)
+    return user_id
+
+def bearer_token():
+    """Jeton de l'en-tête `Authorization: Bearer ...`, ou None"""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token.strip():
+        return None
+    return token.strip()
+
+def authenticated(view):
+    """Exige un jeton de session valide ; l'utilisateur est dans g.user_id"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        token = bearer_token()
+        user_id = authenticate(get_db().root, token) if token else None
+        if user_id is None:
+            return jsonify({'error': 'Authentification requise'}), 401
+        g.user_id = user_id
+        return view(*args, **kwargs)
+
+    return wrapper
+
+def init_app(app):
+    """Pool bcrypt et cache de sessions du processus"""
+    config = app.config
+    app.extensions['auth'] = {
+        'hasher': PasswordHasher(config.get('AUTH_HASH_WORKERS', 2), config.get('AUTH_BCRYPT_ROUNDS', 12),
+                                 config.get('AUTH_HASH_QUEUE', 32)),
+        'sessions': SessionCache(config.get('AUTH_SESSION_CACHE_SIZE', 10000),
+                                 config.get('AUTH_SESSION_REVALIDATE_SECONDS', 60)),
+    }
+
+    @app.errorhandler(HasherBusy)
+    def hasher_busy(error):
+        response = jsonify({'error': 'Trop de connexions simultanées, veuillez réessayer'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
@@ -0,0 +1,111 @@
+import datetime
+import os
+import time
+from ZODB.scripts import repozo
+
+# Extensions des fichiers de données d'un dépôt repozo (complets, incrémentaux, compressés ou non)
+FULL_EXTENSIONS = ('.fs', '.fsz')
+DELTA_EXTENSIONS = ('.deltafs', '.deltafsz')
+
+def _run(action, argv):
+    """Exécute une opération repozo ; ses erreurs deviennent des RuntimeError"""
+    options = repozo.parseargs(argv)
+    try:
+        action(options)
+    except (repozo.RepozoError, OSError) as e:
+        raise RuntimeError(str(e))
+    return options
+
+def _report(started, size):
+    duration = time.perf_counter() - started
+    return {
+        'bytes': size,
+        'duration': duration,
+        'throughput': size / duration if duration else 0.0,
+    }
+
+def backup_database(path, repository, full=False, quick=True, gzip=False):
+    """Sauvegarde en ligne d'un FileStorage dans un dépôt repozo.
+
+    Seules les transactions validées depuis la dernière sauvegarde sont
+    ajoutées (fichier incrémental) ; une sauvegarde complète est faite s'il
+    n'y en a pas encore, si elle est demandée, ou si le fichier a été compacté.
+    Le fichier est ouvert en lecture seule, sans verrou : la copie s'arrête à
+    la dernière transaction complète, le serveur peut continuer à écrire.
+    Avec `quick`, seule la somme MD5 du dernier incrémental est revérifiée
+    sur la source avant d'ajouter la suite.
+    """
+    os.makedirs(repository, exist_ok=True)
+    before = set(os.listdir(repository))
+    argv = ['-B', '-f', path, '-r', repository]
+    if full:
+        argv.append('-F')
+    if quick:
+        argv.append('-Q')
+    if gzip:
+        argv.append('-z')
+
+    started = time.perf_counter()
+    options = _run(repozo.do_backup, argv)
+    created = sorted(name for name in set(os.listdir(repository)) - before
+                     if name.endswith(FULL_EXTENSIONS + DELTA_EXTENSIONS))
+
+    if not created:
+        report = _report(started, 0)
+        report.update(mode=None, file=None)
+        return report
+
+    # Dernière ligne du .dat : fichier écrit, positions copiées dans la source et somme MD5
+    filename, start, end, checksum = repozo.scandat(repozo.find_files(options))
+    report = _report(started, end - start)
+    report.update(
+        mode='incremental' if created[-1].endswith(DELTA_EXTENSIONS) else 'full',
+        file=filename,
+        position=end,
+        checksum=checksum,
+    )
+    return report
+
+def verify_backups(repository, quick=False):
+    """Vérifie la taille et la somme MD5 des fichiers de la dernière sauvegarde complète et de ses incrémentaux"""
+    started = time.perf_counter()
+    options = _run(repozo.do_verify, ['-V', '-r', repository] + (['-Q'] if quick else []))
+    files = repozo.find_files(options)
+    report = _report(started, sum(os.path.getsize(name) for name in files))
+    report['files'] = len(files)
+    return report
+
+def repozo_date(moment):
+    """Date repozo (UTC, aaaa-mm-jj-hh-mm-ss) ; une date sans fuseau est en heure locale"""
+    if moment.tzinfo is None:
+        moment = moment.astimezone()
+    return moment.astimezone(datetime.timezone.utc).strftime('%Y-%m-%d-%H-%M-%S')
+
+def restore_database(repository, output, at=None, verify=True):
+    """Reconstitue un FileStorage dans `output` tel qu'il était à la date `at` (par défaut, la dernière sauvegarde).
+
+    Les sommes MD5 sont vérifiées pendant la restauration. `output` ne doit
+    pas exister : la base en service n'est jamais écrasée.
+    """
+    if os.path.exists(output):
+        raise RuntimeError(f"{output} existe déjà : choisissez un autre fichier de sortie")
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    argv = ['-R', '-r', repository, '-o', output]
+    if at is not None:
+        argv += ['-D', repozo_date(at)]
+    if verify:
+        argv.append('-w')
+
+    started = time.perf_counter()
+    _run(repozo.do_recover, argv)
+    return _report(started, os.path.getsize(output))
+
+def format_backup_report(report):
+    """Résumé lisible d'une sauvegarde"""
+    if report['mode'] is None:
+        return "Aucune transaction depuis la dernière sauvegarde"
+    kind = 'complète' if report['mode'] == 'full' else 'incrémentale'
+    return (f"Sauvegarde {kind} : {report['bytes']} octets en {report['duration']:.2f}s "
+            f"({report['throughput'] / 1e6:.1f} Mo/s) -> {report['file']}")
@@ -8,7 +8,57 @@ class Config:
     """Configuration de base pour l'application"""
     SECRET_KEY = os.environ.get('SECRET_KEY') 
     DEBUG = False
-    ZODB_STORAGE = os.environ.get('ZODB_STORAGE') 
+    # Stockage ZODB : chemin FileStorage, memory://, demo://, zeo://hôte:port ou zconfig://fichier
+    ZODB_STORAGE = os.environ.get('ZODB_STORAGE') or 'data/todoapp.fs'
+    # Taille du pool de connexions ZODB (une connexion par requête/thread)
+    ZODB_POOL_SIZE = int(os.environ.get('ZODB_POOL_SIZE', 7))
+    # Nombre d'objets gardés en cache par connexion
+    ZODB_CACHE_SIZE = int(os.environ.get('ZODB_CACHE_SIZE', 400))
+    # Limite optionnelle du cache de chaque connexion en octets (0 = pas de limite)
+    ZODB_CACHE_SIZE_BYTES = int(os.environ.get('ZODB_CACHE_SIZE_BYTES', 0))
+    # Taille du cache disque du client ZEO en octets (défaut de ZEO si absent)
+    ZEO_CLIENT_CACHE_SIZE = int(os.environ['ZEO_CLIENT_CACHE_SIZE']) if os.environ.get('ZEO_CLIENT_CACHE_SIZE') else None
+    # Clés des collections d'une nouvelle base : 'uuid' (OOBTree) ou 'int' (LOBTree, ordonnées dans le temps)
+    ZODB_KEY_TYPE = os.environ.get('ZODB_KEY_TYPE', 'uuid')
+    # Compactage périodique en ligne (0 = désactivé) et âge minimal des révisions supprimées
+    ZODB_PACK_INTERVAL_HOURS = float(os.environ.get('ZODB_PACK_INTERVAL_HOURS', 0))
+    ZODB_PACK_DAYS = float(os.environ.get('ZODB_PACK_DAYS', 0))
+    # Dépôt des sauvegardes en ligne (repozo) du FileStorage
+    ZODB_BACKUP_DIR = os.environ.get('ZODB_BACKUP_DIR', 'backup/repozo')
+    # Enregistrement périodique de l'index du FileStorage en secondes (0 = seulement à la fermeture)
+    ZODB_INDEX_SAVE_SECONDS = float(os.environ.get('ZODB_INDEX_SAVE_SECONDS', 300))
+    # Pagination par curseur des listes (taille par défaut et maximale d'une page)
+    PAGE_SIZE_DEFAULT = int(os.environ.get('PAGE_SIZE_DEFAULT', 100))
+    PAGE_SIZE_MAX = int(os.environ.get('PAGE_SIZE_MAX', 1000))
+    # Nombre d'objets supprimés par lot (point de sauvegarde) lors des cascades
+    CASCADE_BATCH_SIZE = int(os.environ.get('CASCADE_BATCH_SIZE', 500))
+    # Cache des réponses GET (nombre d'entrées, 0 = désactivé) et taille maximale d'une réponse
+    RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 1024))
+    RESPONSE_CACHE_MAX_BODY = int(os.environ.get('RESPONSE_CACHE_MAX_BODY', 1024 * 1024))
+    # Nouvelles tentatives des écritures en conflit (nombre d'essais, délai de base en secondes)
+    TX_RETRY_ATTEMPTS = int(os.environ.get('TX_RETRY_ATTEMPTS', 3))
+    TX_RETRY_BACKOFF = float(os.environ.get('TX_RETRY_BACKOFF', 0.05))
+    # Objets importés entre deux commits par POST /api/import, et entre deux points de sauvegarde (0 = aucun)
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 10000))
+    IMPORT_SAVEPOINT_SIZE = int(os.environ.get('IMPORT_SAVEPOINT_SIZE', 5000))
+    # Tâches en retard comptées au plus par les statistiques (au-delà, overdue_truncated)
+    STATS_OVERDUE_LIMIT = int(os.environ.get('STATS_OVERDUE_LIMIT', 1000))
+    # Nombre maximal d'opérations acceptées par POST /api/todos/batch
+    BATCH_MAX_OPERATIONS = int(os.environ.get('BATCH_MAX_OPERATIONS', 1000))
+    # Tâches de fond : threads d'exécution, délai sans signe de vie avant reprise (s), conservation (jours)
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_STALE_SECONDS = int(os.environ.get('JOB_STALE_SECONDS', 60))
+    JOB_RETENTION_DAYS = float(os.environ.get('JOB_RETENTION_DAYS', 7))
+    # Mots de passe : coût bcrypt, threads de calcul et calculs en attente au-delà desquels on répond 503
+    AUTH_BCRYPT_ROUNDS = int(os.environ.get('AUTH_BCRYPT_ROUNDS', 12))
+    AUTH_HASH_WORKERS = int(os.environ.get('AUTH_HASH_WORKERS', 2))
+    AUTH_HASH_QUEUE = int(os.environ.get('AUTH_HASH_QUEUE', 32))
+    # Sessions : durée de validité (heures), cache LRU par processus (0 = désactivé) et revérification en base (s)
+    AUTH_SESSION_HOURS = float(os.environ.get('AUTH_SESSION_HOURS', 24))
+    AUTH_SESSION_CACHE_SIZE = int(os.environ.get('AUTH_SESSION_CACHE_SIZE', 10000))
+    AUTH_SESSION_REVALIDATE_SECONDS = float(os.environ.get('AUTH_SESSION_REVALIDATE_SECONDS', 60))
+    # Seuil de journalisation des requêtes lentes, en millisecondes (0 = désactivé)
+    SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', 0))
 
 class DevelopmentConfig(Config):
     """Configuration pour l'environnement de développement"""
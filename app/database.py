@@ -1,79 +1,319 @@
+import BTrees.OOBTree
 import ZODB
-import ZODB.FileStorage
-import ZODB.DemoStorage
 import persistent
+import threading
+import time
 import transaction
 import os
+from flask import g, has_app_context, request
+from app.utils import ids
+from app.storage import (DEFAULT_STORAGE, lock_holder, open_storage, parse_storage_uri,
+                         save_file_index, saved_index_position)
+from app.indexes import (ChangeLog, SessionStore, TextIndex, TodoIndex, TodoStats, UserIndex, rebuild_text_index,
+                         rebuild_todo_index, rebuild_todo_stats, rebuild_user_index)
 
-# Vérification de l'import BTrees
-try:
-    import BTrees.OOBTree
-    print("BTrees.OOBTree importé avec succès")
-except ImportError as e:
-    print(f"Erreur lors de l'import de BTrees.OOBTree : {str(e)}")
-    raise
+# Méthodes HTTP dont la transaction est validée en fin de requête, si la réponse est un succès
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
 
 class Database:
-    def __init__(self, path='data/todoapp.fs', use_memory=False):
-        os.makedirs(os.path.dirname(path), exist_ok=True)
+    def __init__(self, storage=DEFAULT_STORAGE, use_memory=False, pool_size=7, cache_size=400,
+                 cache_size_bytes=0, zeo_cache_size=None, key_type='uuid'):
+        if use_memory:
+            storage = 'demo://'
 
-        self.path = path
-        self.use_memory = use_memory
+        self.storage_uri = storage
+        self.storage_type, target = parse_storage_uri(storage)
+        # Chemin du fichier pour FileStorage, None pour les autres stockages
+        self.path = target if self.storage_type == 'file' else None
+        self.use_memory = self.storage_type in ('memory', 'demo')
 
-        if use_memory:
-            self.storage = ZODB.DemoStorage.DemoStorage()
-            print("Utilisation du stockage en mémoire (données non persistantes)")
-        else:
-            self._clean_lock_files()
-            self.storage = ZODB.FileStorage.FileStorage(path)
-            print(f"Utilisation du stockage persistant : {path}")
-
-        self.db = ZODB.DB(self.storage)
-        self.connection = self.db.open()
-        self.root = self.connection.root()
-
-        self._initialize_collections()
-
-    def _clean_lock_files(self):
-        """Supprime les fichiers de verrouillage pour éviter les conflits."""
-        for suffix in [".lock", ".lock.tmp"]:
-            lock_file = f"{self.path}{suffix}"
-            if os.path.exists(lock_file):
-                try:
-                    os.remove(lock_file)
-                    print(f"Fichier verrouillage supprimé: {lock_file}")
-                except Exception as e:
-                    print(f"Erreur suppression {lock_file}: {str(e)}")
-
-    def _initialize_collections(self):
+        # Durées des phases d'ouverture [(phase, secondes)], voir startup_report()
+        self.startup_phases = []
+        started = time.perf_counter()
+
+        indexed = size = None
+        if self.path:
+            self._check_lock()
+            # Position couverte par le `.index` et taille du fichier, relevées avant l'ouverture
+            indexed = saved_index_position(self.path)
+            size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        self.storage = open_storage(storage, zeo_cache_size=zeo_cache_size)
+        self.index_status = self._check_index(indexed, size) if self.path else None
+        started = self._phase('stockage', started)
+        print(f"Utilisation du stockage ZODB : {storage}")
+
+        # Le pool fournit une connexion (et donc une vue MVCC isolée) par requête
+        self.db = ZODB.DB(self.storage, pool_size=pool_size, cache_size=cache_size,
+                          cache_size_bytes=cache_size_bytes)
+        self._local = threading.local()
+        # Processus propriétaire : un processus forké doit ouvrir sa propre base
+        self.pid = os.getpid()
+        started = self._phase('ZODB.DB', started)
+
+        self._initialize_collections(key_type)
+        self._phase('collections', started)
+
+    def _phase(self, name, started):
+        now = time.perf_counter()
+        self.startup_phases.append((name, now - started))
+        return now
+
+    def startup_report(self):
+        """Résumé d'une ligne des phases d'ouverture de la base."""
+        total = sum(seconds for _, seconds in self.startup_phases)
+        phases = ', '.join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.startup_phases)
+        index = f" ; {self.index_status}" if self.index_status else ''
+        return f"Base ouverte en {total * 1000:.0f} ms ({phases}){index}"
+
+    def _check_lock(self):
+        """Refuse d'ouvrir un FileStorage verrouillé par un processus vivant.
+
+        Un fichier de verrouillage orphelin (processus arrêté brutalement) est
+        laissé en place : FileStorage reprend le verrou sans le supprimer.
+        """
+        pid = lock_holder(self.path)
+        if pid is not None:
+            raise RuntimeError(f"La base {self.path} est déjà ouverte par le processus {pid or 'inconnu'}")
+
+    def _check_index(self, indexed, size):
+        """Décrit la réutilisation du fichier `.index` et l'enregistre s'il était en retard.
+
+        FileStorage valide l'index enregistré et ne relit que les transactions
+        écrites après lui ; sans index valide, il relit tout le fichier et
+        enregistre lui-même l'index reconstruit.
+        """
+        if indexed is None or saved_index_position(self.path) != indexed:
+            # Index absent, illisible ou rejeté (remplacé à l'ouverture)
+            return f"index reconstruit ({size} octets relus)"
+        if indexed < size:
+            # Arrêt brutal : l'index est enregistré tout de suite pour ne pas relire ce
+            # reliquat au prochain démarrage
+            save_file_index(self.storage)
+            return f"index réutilisé ({size - indexed} octets relus)"
+        return "index réutilisé"
+
+    def _initialize_collections(self, key_type='uuid'):
         """Initialise les collections s'il n'existe pas déjà dans la base."""
-        if not hasattr(self.root, 'users'):
-            self.root.users = BTrees.OOBTree.BTree()
-        if not hasattr(self.root, 'todo_lists'):
-            self.root.todo_lists = BTrees.OOBTree.BTree()
-        if not hasattr(self.root, 'todos'):
-            self.root.todos = BTrees.OOBTree.BTree()
-        
+        with self.db.transaction() as connection:
+            root = connection.root()
+            if not hasattr(root, 'key_type'):
+                # Le type de clés est fixé à la création ; les bases existantes sont en UUID
+                root.key_type = 'uuid' if hasattr(root, 'users') else key_type
+            ids.configure(root.key_type)
+
+            if not hasattr(root, 'users'):
+                root.users = ids.new_tree()
+            if not hasattr(root, 'todo_lists'):
+                root.todo_lists = ids.new_tree()
+            if not hasattr(root, 'todos'):
+                root.todos = ids.new_tree()
+            if not hasattr(root, 'jobs'):
+                # Tâches de fond : identifiants UUID quel que soit le type de clés
+                root.jobs = BTrees.OOBTree.BTree()
+            if not hasattr(root, 'sessions'):
+                root.sessions = SessionStore()
+            if not hasattr(root, 'change_log'):
+                # Journal de synchronisation : les modifications antérieures n'y figurent pas
+                root.change_log = ChangeLog()
+            if getattr(getattr(root, 'todo_index', None), 'version', 1) < TodoIndex.VERSION:
+                # Migration : les bases existantes sont indexées à la création de l'index
+                root.todo_index = TodoIndex()
+                count = rebuild_todo_index(root)
+                if count:
+                    print(f"Index des tâches reconstruit ({count} tâches)")
+            if not hasattr(root, 'todo_stats'):
+                root.todo_stats = TodoStats()
+                count = rebuild_todo_stats(root)
+                if count:
+                    print(f"Compteurs des tâches recalculés ({count} tâches)")
+            if not hasattr(root, 'user_index'):
+                root.user_index = UserIndex()
+                count = rebuild_user_index(root)
+                if count:
+                    print(f"Index des utilisateurs reconstruit ({count} utilisateurs)")
+            if not hasattr(root, 'todo_text_index'):
+                root.todo_text_index = TextIndex()
+                count = rebuild_text_index(root.todo_text_index, root.todos)
+                if count:
+                    print(f"Index plein texte des tâches reconstruit ({count} tâches)")
+            if not hasattr(root, 'list_text_index'):
+                root.list_text_index = TextIndex()
+                count = rebuild_text_index(root.list_text_index, root.todo_lists)
+                if count:
+                    print(f"Index plein texte des listes reconstruit ({count} listes)")
+
         print("Collections initialisées avec succès")
-        self.commit()
+
+    def rebuild_indexes(self):
+        """Reconstruit tous les index secondaires à partir des collections."""
+        with self.db.transaction() as connection:
+            root = connection.root()
+            return {
+                'todos': rebuild_todo_index(root),
+                'stats': rebuild_todo_stats(root),
+                'users': rebuild_user_index(root),
+                'todos_text': rebuild_text_index(root.todo_text_index, root.todos),
+                'lists_text': rebuild_text_index(root.list_text_index, root.todo_lists),
+            }
+
+    def last_transaction(self):
+        """Identifiant de la dernière transaction validée dans le stockage."""
+        return self.db.lastTransaction()
+
+    def open_connection(self):
+        """Ouvre une connexion depuis le pool du ZODB.DB."""
+        return self.db.open()
+
+    @property
+    def connection(self):
+        """Connexion courante : celle de la requête, sinon celle du thread."""
+        if has_app_context():
+            if 'zodb_connection' not in g:
+                g.zodb_connection = self.open_connection()
+            return g.zodb_connection
+
+        # Hors requête (scripts, CLI) : une connexion par thread
+        if getattr(self._local, 'connection', None) is None:
+            self._local.connection = self.open_connection()
+        return self._local.connection
+
+    @property
+    def root(self):
+        """Racine de la base vue par la connexion courante."""
+        return self.connection.root()
 
     def commit(self):
         """Enregistre les changements dans la base."""
         transaction.commit()
 
+    def abort(self):
+        """Annule les changements en cours."""
+        transaction.abort()
+
+    def close_connection(self, exception=None, callbacks=()):
+        """Termine la transaction de la requête et rend la connexion au pool.
+
+        Seules les écritures réussies sont validées ; les lectures et les
+        réponses d'erreur sont annulées, sans commit vide ni modification
+        partielle. Les `callbacks(connection, exception)` sont appelés après
+        le commit ou l'annulation, avant le retour de la connexion au pool.
+        """
+        connection = g.pop('zodb_connection', None)
+        commit = g.pop('zodb_commit', False)
+        try:
+            if connection is not None:
+                if exception is None and commit:
+                    transaction.commit()
+                else:
+                    transaction.abort()
+        except Exception:
+            transaction.abort()
+            raise
+        finally:
+            try:
+                for callback in callbacks:
+                    callback(connection, exception)
+            finally:
+                if connection is not None:
+                    connection.close()
+
     def close(self):
         """Ferme proprement la base de données."""
         try:
             transaction.abort()
-            self.connection.close()
+            connection = getattr(self._local, 'connection', None)
+            if connection is not None:
+                connection.close()
+                self._local.connection = None
             self.db.close()
             self.storage.close()
             print("Connexion à la base de données fermée")
         except Exception as e:
             print(f"Erreur lors de la fermeture de la base: {str(e)}")
 
+def init_app(app):
+    """Branche le cycle de vie des connexions ZODB sur les requêtes Flask.
+
+    La base n'est ouverte qu'à la première requête (voir open_database) : créer
+    l'application ne touche pas au stockage.
+    """
+    app.extensions['zodb'] = {
+        'options': dict(
+            storage=app.config.get('ZODB_STORAGE') or DEFAULT_STORAGE,
+            pool_size=app.config.get('ZODB_POOL_SIZE', 7),
+            cache_size=app.config.get('ZODB_CACHE_SIZE', 400),
+            cache_size_bytes=app.config.get('ZODB_CACHE_SIZE_BYTES', 0),
+            zeo_cache_size=app.config.get('ZEO_CLIENT_CACHE_SIZE'),
+            key_type=app.config.get('ZODB_KEY_TYPE', 'uuid'),
+        ),
+        'callbacks': [],
+        'close_callbacks': [],
+        'lock': threading.Lock(),
+        'db': None,
+    }
+
+    @app.before_request
+    def open_zodb_connection():
+        db = open_database(app)
+        # Dernière transaction connue avant l'ouverture : la vue de la connexion
+        # est au moins aussi récente (utilisé par le cache de réponses)
+        g.zodb_tid = db.last_transaction()
+        # Chaque requête travaille sur sa propre connexion du pool
+        g.zodb_connection = db.open_connection()
+
+    @app.after_request
+    def decide_zodb_commit(response):
+        g.zodb_commit = request.method in WRITE_METHODS and response.status_code < 400
+        return response
+
+    @app.teardown_appcontext
+    def close_zodb_connection(exception=None):
+        state = app.extensions['zodb']
+        if state['db'] is not None:
+            state['db'].close_connection(exception, state['close_callbacks'])
+        else:
+            for callback in state['close_callbacks']:
+                callback(None, exception)
+
+def on_database_open(app, callback):
+    """Appelle callback(db) à l'ouverture de la base (services d'arrière-plan, instrumentation)."""
+    app.extensions['zodb']['callbacks'].append(callback)
+
+def on_connection_close(app, callback):
+    """Appelle callback(connection, exception) à la fin de chaque requête, une fois
+    sa transaction validée ou annulée (connection vaut None si la base n'est pas ouverte)."""
+    app.extensions['zodb']['close_callbacks'].append(callback)
+
+def open_database(app):
+    """Ouvre la base de l'application si ce n'est déjà fait et la retourne."""
+    state = app.extensions['zodb']
+    if state['db'] is None:
+        with state['lock']:
+            if state['db'] is None:
+                db = get_db(**state['options'])
+                started = time.perf_counter()
+                for callback in state['callbacks']:
+                    callback(db)
+                db.startup_phases.append(('services', time.perf_counter() - started))
+                print(db.startup_report())
+                state['db'] = db
+    return state['db']
+
+def opened_database(app):
+    """Base de l'application si elle a été ouverte, sinon None."""
+    state = app.extensions.get('zodb')
+    return state['db'] if state else None
+
 # Singleton pour obtenir la DB
-def get_db():
+def get_db(**options):
+    if hasattr(get_db, 'instance') and get_db.instance.pid != os.getpid():
+        # Instance héritée du processus parent : ses connexions et son stockage
+        # (verrou, socket ZEO) appartiennent au parent, on ne les touche pas
+        del get_db.instance
     if not hasattr(get_db, 'instance'):
-        get_db.instance = Database(use_memory=False)
-    return get_db.instance
\ No newline at end of file
+        if 'storage' not in options:
+            from app.config import Config
+            options['storage'] = Config.ZODB_STORAGE or DEFAULT_STORAGE
+            options.setdefault('key_type', Config.ZODB_KEY_TYPE)
+        get_db.instance = Database(**options)
+    return get_db.instance
@@ -0,0 +1,6 @@
+from .todo_index import TodoIndex, due_key, priority_key, rebuild_todo_index
+from .user_index import UserIndex, normalize_email, rebuild_user_index, valid_identifier
+from .text_index import TextIndex, rebuild_text_index, tokenize
+from .change_log import ChangeLog
+from .todo_stats import TodoStats, check_todo_stats, rebuild_todo_stats
+from .session_store import SessionStore
@@ -0,0 +1,117 @@
+import random
+import time
+import uuid
+import persistent
+import BTrees.LOBTree
+import BTrees.OOBTree
+from app.utils.ids import ID_EPOCH_MS
+
+# Bits aléatoires sous les millisecondes d'une position : deux écritures simultanées
+# ne visent pas la même clé
+RANDOM_BITS = 22
+
+def position_at(timestamp, spread=0):
+    """Position du journal à l'instant `timestamp` (secondes epoch)"""
+    return ((int(timestamp * 1000) - ID_EPOCH_MS) << RANDOM_BITS) | spread
+
+def new_position(now):
+    return position_at(now, random.getrandbits(RANDOM_BITS))
+
+class UserChanges(persistent.Persistent):
+    """Journal des modifications d'un utilisateur, ordonnées par leur horodatage.
+
+    Chaque objet n'y figure qu'une fois, à la position de sa dernière
+    modification : une synchronisation coûte le nombre d'objets modifiés.
+    Une écriture ne touche que les BTrees : des transactions simultanées du
+    même utilisateur insèrent des clés différentes, dont les conflits se résolvent.
+    """
+
+    def __init__(self):
+        # Positions <= horizon compactées : un jeton plus ancien impose une resynchronisation
+        self.horizon = 0
+        self.entries = BTrees.LOBTree.BTree()  # position -> (type, id, supprimé, horodatage)
+        self.latest = BTrees.OOBTree.BTree()   # (type, id) -> position de sa dernière entrée
+
+    def record(self, kind, object_id, deleted, now):
+        previous = self.latest.get((kind, object_id))
+        if previous is not None:
+            del self.entries[previous]
+        position = new_position(now)
+        self.entries[position] = (kind, object_id, deleted, now)
+        self.latest[(kind, object_id)] = position
+
+    def changes_after(self, position):
+        """Couples (position, entrée) postérieurs à `position`, dans l'ordre"""
+        return self.entries.items(min=position, excludemin=True)
+
+    def compact(self, cutoff):
+        """Retire les entrées antérieures à `cutoff` (horodatage) ; retourne leur nombre"""
+        removed = 0
+        horizon = self.horizon
+        for position, (kind, object_id, _, timestamp) in list(self.entries.items(max=position_at(cutoff))):
+            del self.entries[position]
+            if self.latest.get((kind, object_id)) == position:
+                del self.latest[(kind, object_id)]
+            horizon = position
+            removed += 1
+        if horizon != self.horizon:
+            self.horizon = horizon
+        return removed
+
+class ChangeLog(persistent.Persistent):
+    """Journal des créations, modifications et suppressions, par utilisateur.
+
+    Les suppressions sont des entrées « tombstone ». Les entrées plus anciennes
+    que `retention_days` jours sont compactées par pack_database : les clients
+    dont le jeton est plus ancien repartent d'un état complet.
+
+    Une entrée est positionnée à l'heure de l'écriture, mais visible seulement
+    au commit : les jetons de fin de synchronisation reculent de
+    `commit_lag_seconds`, et les entrées de cette fenêtre sont renvoyées à la
+    synchronisation suivante plutôt que manquées.
+    """
+
+    # Durée de conservation par défaut des entrées
+    retention_days = 30
+    # Durée maximale entre une écriture et son commit
+    commit_lag_seconds = 30
+
+    def __init__(self, retention_days=None):
+        # Change à chaque nouveau journal (conversion des clés) : invalide les anciens jetons
+        self.generation = uuid.uuid4().hex
+        self.users = BTrees.OOBTree.BTree()  # user_id -> UserChanges
+        if retention_days is not None:
+            self.retention_days = retention_days
+
+    def _cutoff(self, now):
+        return now - self.retention_days * 86400
+
+    def for_user(self, user_id):
+        """Journal d'un utilisateur, ou None s'il n'a aucune modification enregistrée"""
+        return self.users.get(user_id)
+
+    def settled_position(self, now=None):
+        """Position avant laquelle toutes les entrées sont validées"""
+        return position_at((time.time() if now is None else now) - self.commit_lag_seconds)
+
+    def record(self, user_id, kind, object_id, deleted=False):
+        """Enregistre la dernière modification d'un objet appartenant à `user_id`"""
+        changes = self.users.get(user_id)
+        if changes is None:
+            changes = self.users[user_id] = UserChanges()
+        changes.record(kind, object_id, deleted, time.time())
+
+    def compact(self, user_exists=lambda user_id: True):
+        """Compacte tous les journaux ; ceux des utilisateurs supprimés disparaissent une fois vides"""
+        cutoff = self._cutoff(time.time())
+        removed = 0
+        for user_id in list(self.users.keys()):
+            changes = self.users[user_id]
+            removed += changes.compact(cutoff)
+            if not changes.entries and not user_exists(user_id):
+                del self.users[user_id]
+        return removed
+
+    def clear(self):
+        self.generation = uuid.uuid4().hex
+        self.users.clear()
@@ -0,0 +1,57 @@
+import persistent
+import BTrees.OOBTree
+
+class SessionStore(persistent.Persistent):
+    """Sessions ouvertes par POST /api/auth/login, partagées par tous les processus.
+
+    Les sessions sont rangées par utilisateur : des connexions simultanées
+    d'utilisateurs différents n'écrivent pas dans les mêmes buckets. Seule
+    l'empreinte SHA-256 du jeton est stockée : une copie de la base ne
+    permet pas de se connecter.
+    """
+
+    def __init__(self):
+        self.users = BTrees.OOBTree.BTree()  # user_id -> {empreinte: expiration en secondes epoch}
+
+    def add(self, user_id, digest, expires):
+        sessions = self.users.get(user_id)
+        if sessions is None:
+            sessions = self.users[user_id] = BTrees.OOBTree.BTree()
+        sessions[digest] = expires
+
+    def get(self, user_id, digest, now):
+        """Expiration d'une session valide, ou None"""
+        sessions = self.users.get(user_id)
+        expires = sessions.get(digest) if sessions is not None else None
+        if expires is None or expires <= now:
+            return None
+        return expires
+
+    def remove(self, user_id, digest):
+        sessions = self.users.get(user_id)
+        if sessions is None or digest not in sessions:
+            return False
+        del sessions[digest]
+        return True
+
+    def revoke_user(self, user_id):
+        """Ferme toutes les sessions d'un utilisateur ; retourne leur nombre"""
+        sessions = self.users.get(user_id)
+        if sessions is None:
+            return 0
+        count = len(sessions)
+        del self.users[user_id]
+        return count
+
+    def purge(self, now):
+        """Supprime les sessions expirées ; retourne leur nombre"""
+        removed = 0
+        for user_id in list(self.users.keys()):
+            sessions = self.users[user_id]
+            expired = [digest for digest, expires in sessions.items() if expires <= now]
+            for digest in expired:
+                del sessions[digest]
+            removed += len(expired)
+            if not sessions:
+                del self.users[user_id]
+        return removed
@@ -0,0 +1,122 @@
+import re
+import unicodedata
+import persistent
+import BTrees.OOBTree
+from app.utils.ids import to_key
+
+# Les mots plus courts ne sont pas indexés (articles, lettres isolées)
+MIN_WORD_LENGTH = 2
+
+# Borne haute d'une recherche par préfixe dans l'ordre des chaînes
+PREFIX_END = '\uffff'
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+def tokenize(text):
+    """Mots normalisés d'un texte : minuscules, sans accents"""
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return [word for word in _WORD.findall(text) if len(word) >= MIN_WORD_LENGTH]
+
+class TextIndex(persistent.Persistent):
+    """Index plein texte (titre et description) des objets d'un utilisateur.
+
+    Les clés (user_id, mot) sont triées : une recherche par préfixe est un
+    simple parcours d'intervalle dans le BTree, limité à l'utilisateur.
+    """
+
+    def __init__(self):
+        self.words = BTrees.OOBTree.BTree()      # (user_id, mot) -> {clé d'objet}
+        self.documents = BTrees.OOBTree.BTree()  # clé d'objet -> (user_id, mots indexés)
+
+    def _words_of(self, obj):
+        return frozenset(tokenize(obj.title) + tokenize(obj.description))
+
+    def _add(self, user_id, word, key):
+        keys = self.words.get((user_id, word))
+        if keys is None:
+            keys = self.words[(user_id, word)] = BTrees.OOBTree.TreeSet()
+        keys.add(key)
+
+    def _remove(self, user_id, word, key):
+        keys = self.words.get((user_id, word))
+        if keys is None:
+            return
+        if key in keys:
+            keys.remove(key)
+        if not keys:
+            del self.words[(user_id, word)]
+
+    def index(self, obj):
+        """Indexe un objet ou met à jour ses mots (seules les différences sont écrites)"""
+        key = to_key(obj.id)
+        words = self._words_of(obj)
+        entry = self.documents.get(key)
+        if entry is None:
+            removed, added = (), words
+        elif entry[0] != obj.user_id:
+            self.unindex(obj)
+            removed, added = (), words
+        else:
+            old_words = frozenset(entry[1])
+            if old_words == words:
+                return
+            removed, added = old_words - words, words - old_words
+
+        for word in removed:
+            self._remove(obj.user_id, word, key)
+        for word in added:
+            self._add(obj.user_id, word, key)
+        self.documents[key] = (obj.user_id, tuple(sorted(words)))
+
+    def unindex(self, obj):
+        """Retire un objet de l'index"""
+        key = to_key(obj.id)
+        entry = self.documents.get(key)
+        if entry is None:
+            return
+        user_id, words = entry
+        for word in words:
+            self._remove(user_id, word, key)
+        del self.documents[key]
+
+    def _prefix_matches(self, user_id, prefix):
+        """Union des objets dont un mot commence par `prefix`"""
+        result = BTrees.OOBTree.TreeSet()
+        for keys in self.words.values(min=(user_id, prefix), max=(user_id, prefix + PREFIX_END)):
+            result = BTrees.OOBTree.union(result, keys)
+        return result
+
+    def search(self, user_id, query):
+        """Clés des objets de l'utilisateur contenant tous les termes (préfixes) de la requête.
+
+        Retourne None si la requête ne contient aucun terme indexable.
+        """
+        terms = sorted(set(tokenize(query)), key=len, reverse=True)
+        if not terms:
+            return None
+
+        result = None
+        for term in terms:
+            matches = self._prefix_matches(user_id, term)
+            result = matches if result is None else BTrees.OOBTree.intersection(result, matches)
+            if not result:
+                return BTrees.OOBTree.TreeSet()
+        return result
+
+    def clear(self):
+        """Vide l'index"""
+        self.words.clear()
+        self.documents.clear()
+
+
+def rebuild_text_index(text_index, objects):
+    """Reconstruit un index plein texte à partir d'une collection"""
+    text_index.clear()
+    count = 0
+    for obj in objects.values():
+        text_index.index(obj)
+        count += 1
+    return count
@@ -0,0 +1,193 @@
+import persistent
+import BTrees.OOBTree
+from app.models.todo import pack_datetime
+from app.utils.ids import to_key
+
+# Position des tâches sans échéance dans l'index trié (après toutes les dates)
+NO_DUE_DATE = 2 ** 62
+
+def due_key(due_date):
+    """Échéance sous forme d'entier comparable (microsecondes UTC pour les dates avec fuseau)"""
+    if due_date is None:
+        return NO_DUE_DATE
+    packed = pack_datetime(due_date)
+    return packed[0] if isinstance(packed, tuple) else packed
+
+def priority_key(priority):
+    """Priorité indexable, ou None si elle n'est pas entière"""
+    if isinstance(priority, int) and not isinstance(priority, bool):
+        return priority
+    return None
+
+class SortedRange:
+    """Vue d'un intervalle [low, high[ d'un TreeSet de clés triées.
+
+    Expose `keys(min=, excludemin=)` comme un BTree, pour la pagination par
+    curseur ; `accept` filtre les identifiants de tâches sans charger les objets.
+    """
+
+    def __init__(self, tree, low, high, accept=None):
+        self.tree = tree
+        self.low = low
+        self.high = high
+        self.accept = accept
+
+    def keys(self, min=None, excludemin=False):
+        start, exclude = self.low, False
+        if min is not None and min >= self.low:
+            start, exclude = min, excludemin
+        keys = self.tree.keys(min=start, max=self.high, excludemin=exclude, excludemax=True)
+        if self.accept is None:
+            return iter(keys)
+        return (key for key in keys if self.accept(key[-1]))
+
+class TodoIndex(persistent.Persistent):
+    """Index secondaires des tâches par utilisateur, liste, état de complétion, échéance et priorité"""
+
+    # Incrémenté quand la structure change : l'index est alors reconstruit au démarrage
+    VERSION = 2
+
+    def __init__(self):
+        self.version = self.VERSION
+        # Les ensembles contiennent les clés de root.todos (chaînes ou entiers)
+        self.by_user = BTrees.OOBTree.BTree()          # user_id -> {todo_id}
+        self.by_list = BTrees.OOBTree.BTree()          # list_id -> {todo_id}
+        self.by_user_status = BTrees.OOBTree.BTree()   # (user_id, is_completed) -> {todo_id}
+        self.by_list_status = BTrees.OOBTree.BTree()   # (list_id, is_completed) -> {todo_id}
+        # Index triés : parcours par plage dans l'ordre des clés
+        self.by_user_due = BTrees.OOBTree.TreeSet()       # {(user_id, échéance, todo_id)}
+        self.by_user_priority = BTrees.OOBTree.TreeSet()  # {(user_id, priorité, todo_id)}
+
+    def state(self, todo):
+        """Valeurs indexées d'une tâche, à passer à reindex après une modification"""
+        return (todo.list_id, bool(todo.is_completed), due_key(todo.due_date), priority_key(todo.priority))
+
+    def _entries(self, user_id, list_id, is_completed):
+        """Couples (index, clé) concernés par une tâche"""
+        return (
+            (self.by_user, user_id),
+            (self.by_list, list_id),
+            (self.by_user_status, (user_id, is_completed)),
+            (self.by_list_status, (list_id, is_completed)),
+        )
+
+    def _add(self, tree, key, todo_id):
+        ids = tree.get(key)
+        if ids is None:
+            ids = tree[key] = BTrees.OOBTree.TreeSet()
+        ids.add(todo_id)
+
+    def _remove(self, tree, key, todo_id):
+        ids = tree.get(key)
+        if ids is None:
+            return
+        if todo_id in ids:
+            ids.remove(todo_id)
+        if not ids:
+            del tree[key]
+
+    def _index_state(self, user_id, todo_id, state):
+        list_id, is_completed, due, priority = state
+        for tree, key in self._entries(user_id, list_id, is_completed):
+            self._add(tree, key, todo_id)
+        self.by_user_due.add((user_id, due, todo_id))
+        if priority is not None:
+            self.by_user_priority.add((user_id, priority, todo_id))
+
+    def _unindex_state(self, user_id, todo_id, state):
+        list_id, is_completed, due, priority = state
+        for tree, key in self._entries(user_id, list_id, is_completed):
+            self._remove(tree, key, todo_id)
+        if (user_id, due, todo_id) in self.by_user_due:
+            self.by_user_due.remove((user_id, due, todo_id))
+        if priority is not None and (user_id, priority, todo_id) in self.by_user_priority:
+            self.by_user_priority.remove((user_id, priority, todo_id))
+
+    def index(self, todo):
+        """Ajoute une tâche aux index"""
+        self._index_state(todo.user_id, to_key(todo.id), self.state(todo))
+
+    def unindex(self, todo, state=None):
+        """Retire une tâche des index (avec son ancien état si fourni)"""
+        self._unindex_state(todo.user_id, to_key(todo.id), state or self.state(todo))
+
+    def reindex(self, todo, old_state):
+        """Met à jour les index après une modification de la tâche"""
+        new_state = self.state(todo)
+        if old_state == new_state:
+            return
+        self._unindex_state(todo.user_id, to_key(todo.id), old_state)
+        self._index_state(todo.user_id, to_key(todo.id), new_state)
+
+    def query(self, user_id=None, list_id=None, completed=None):
+        """Identifiants des tâches correspondant aux filtres.
+
+        Retourne None si aucun filtre indexé n'est fourni (parcours complet nécessaire).
+        """
+        candidates = []
+        if list_id is not None:
+            if completed is not None:
+                candidates.append(self.by_list_status.get((list_id, completed)))
+            else:
+                candidates.append(self.by_list.get(list_id))
+        if user_id is not None:
+            if completed is not None and list_id is None:
+                candidates.append(self.by_user_status.get((user_id, completed)))
+            else:
+                candidates.append(self.by_user.get(user_id))
+
+        if not candidates:
+            return None
+        if any(ids is None for ids in candidates):
+            return BTrees.OOBTree.TreeSet()
+
+        result = candidates[0]
+        for ids in candidates[1:]:
+            result = BTrees.OOBTree.intersection(result, ids)
+        return result
+
+    def due_range(self, user_id, due_after=None, due_before=None, list_id=None, completed=None):
+        """Tâches de l'utilisateur triées par échéance, due_after <= échéance < due_before.
+
+        Sans borne, toutes les tâches de l'utilisateur, celles sans échéance en dernier.
+        """
+        low = (user_id, due_key(due_after) if due_after is not None else -NO_DUE_DATE)
+        if due_before is not None:
+            high = (user_id, due_key(due_before))
+        elif due_after is not None:
+            high = (user_id, NO_DUE_DATE)
+        else:
+            high = (user_id, NO_DUE_DATE + 1)
+        return SortedRange(self.by_user_due, low, high, self._filter(user_id, list_id, completed))
+
+    def priority_range(self, user_id, priority_min, list_id=None, completed=None):
+        """Tâches de l'utilisateur de priorité >= priority_min, triées par priorité"""
+        low = (user_id, priority_min)
+        high = (user_id, float('inf'))
+        return SortedRange(self.by_user_priority, low, high, self._filter(user_id, list_id, completed))
+
+    def _filter(self, user_id, list_id, completed):
+        """Filtre d'appartenance aux index liste/état pour les parcours triés"""
+        if list_id is None and completed is None:
+            return None
+        # Une liste n'appartient qu'à un utilisateur : son ensemble suffit
+        ids = self.query(user_id=None if list_id is not None else user_id,
+                         list_id=list_id, completed=completed)
+        return ids.__contains__
+
+    def clear(self):
+        """Vide tous les index"""
+        for tree in (self.by_user, self.by_list, self.by_user_status, self.by_list_status,
+                     self.by_user_due, self.by_user_priority):
+            tree.clear()
+
+
+def rebuild_todo_index(root):
+    """Reconstruit l'index des tâches à partir de root.todos"""
+    todo_index = root.todo_index
+    todo_index.clear()
+    count = 0
+    for todo in root.todos.values():
+        todo_index.index(todo)
+        count += 1
+    return count
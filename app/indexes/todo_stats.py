@@ -0,0 +1,169 @@
+import persistent
+import BTrees.Length
+import BTrees.OOBTree
+from app.indexes.todo_index import priority_key
+
+class TodoCounters(persistent.Persistent):
+    """Nombre de tâches d'un utilisateur ou d'une liste, au total et par priorité.
+
+    Chaque compteur est un BTrees.Length : deux transactions qui ajoutent ou
+    terminent des tâches du même utilisateur ne sont pas en conflit.
+    """
+
+    def __init__(self):
+        self.total = BTrees.Length.Length()
+        self.completed = BTrees.Length.Length()
+        self.by_priority = BTrees.OOBTree.BTree()  # (priorité, terminée) -> Length
+
+    def change(self, is_completed, priority, delta):
+        self.total.change(delta)
+        if is_completed:
+            self.completed.change(delta)
+        if priority is not None:
+            counter = self.by_priority.get((priority, is_completed))
+            if counter is None:
+                counter = self.by_priority[(priority, is_completed)] = BTrees.Length.Length()
+            counter.change(delta)
+
+    def to_dict(self):
+        """Compteurs sérialisables ; les priorités sans tâche sont omises"""
+        by_priority = {}
+        for (priority, is_completed), counter in self.by_priority.items():
+            if counter():
+                counts = by_priority.setdefault(str(priority), {'total': 0, 'completed': 0, 'open': 0})
+                counts['total'] += counter()
+                counts['completed' if is_completed else 'open'] += counter()
+        total, completed = self.total(), self.completed()
+        return {'total': total, 'completed': completed, 'open': total - completed, 'by_priority': by_priority}
+
+class TodoStats(persistent.Persistent):
+    """Compteurs de tâches par utilisateur et par liste, tenus à jour à chaque écriture"""
+
+    def __init__(self):
+        self.by_user = BTrees.OOBTree.BTree()  # user_id -> TodoCounters
+        self.by_list = BTrees.OOBTree.BTree()  # list_id -> TodoCounters
+
+    def state(self, todo):
+        """Valeurs comptées d'une tâche, à passer à reindex après une modification"""
+        return (todo.list_id, bool(todo.is_completed), priority_key(todo.priority))
+
+    def _counters(self, tree, key):
+        counters = tree.get(key)
+        if counters is None:
+            counters = tree[key] = TodoCounters()
+        return counters
+
+    def _change(self, user_id, state, delta):
+        list_id, is_completed, priority = state
+        self._counters(self.by_user, user_id).change(is_completed, priority, delta)
+        self._counters(self.by_list, list_id).change(is_completed, priority, delta)
+
+    def index(self, todo):
+        """Compte une nouvelle tâche"""
+        self._change(todo.user_id, self.state(todo), 1)
+
+    def unindex(self, todo, state=None):
+        """Décompte une tâche supprimée (avec son ancien état si fourni)"""
+        self._change(todo.user_id, state or self.state(todo), -1)
+
+    def reindex(self, todo, old_state):
+        """Met à jour les compteurs après une modification de la tâche"""
+        new_state = self.state(todo)
+        if old_state == new_state:
+            return
+        self._change(todo.user_id, old_state, -1)
+        self._change(todo.user_id, new_state, 1)
+
+    def for_user(self, user_id):
+        """Compteurs d'un utilisateur, ou None s'il n'a jamais eu de tâche"""
+        return self.by_user.get(user_id)
+
+    def for_list(self, list_id):
+        """Compteurs d'une liste, ou None si elle n'a jamais eu de tâche"""
+        return self.by_list.get(list_id)
+
+    def discard_list(self, list_id):
+        """Oublie les compteurs d'une liste supprimée"""
+        if list_id in self.by_list:
+            del self.by_list[list_id]
+
+    def discard_user(self, user_id):
+        """Oublie les compteurs d'un utilisateur supprimé"""
+        if user_id in self.by_user:
+            del self.by_user[user_id]
+
+    def clear(self):
+        self.by_user.clear()
+        self.by_list.clear()
+
+
+def _recount(root):
+    """Compteurs recalculés depuis root.todos : {(portée, id): {(priorité, terminée): nombre}}"""
+    counts = {}
+    stats = root.todo_stats
+    for todo in root.todos.values():
+        list_id, is_completed, priority = stats.state(todo)
+        for scope in (('user', todo.user_id), ('list', list_id)):
+            scope_counts = counts.setdefault(scope, {})
+            scope_counts[(priority, is_completed)] = scope_counts.get((priority, is_completed), 0) + 1
+    return counts
+
+def _stored(counters):
+    """Compteurs stockés sous la forme de _recount"""
+    counts = {}
+    if counters is None:
+        return counts
+    for key, counter in counters.by_priority.items():
+        if counter():
+            counts[key] = counter()
+    # Tâches de priorité non entière : seulement dans les totaux
+    for is_completed in (False, True):
+        counted = sum(value for (_, completed), value in counts.items() if completed == is_completed)
+        stored = counters.completed() if is_completed else counters.total() - counters.completed()
+        if stored != counted:
+            counts[(None, is_completed)] = stored - counted
+    return counts
+
+def _summary(counts):
+    by_priority = {}
+    for (priority, _), value in counts.items():
+        by_priority[str(priority)] = by_priority.get(str(priority), 0) + value
+    return {
+        'total': sum(counts.values()),
+        'completed': sum(value for (_, is_completed), value in counts.items() if is_completed),
+        'by_priority': by_priority,
+    }
+
+def check_todo_stats(root):
+    """Compare les compteurs stockés à un recomptage complet des tâches.
+
+    Retourne la liste des écarts {scope, id, expected, found}, vide si les
+    compteurs sont cohérents ; rebuild_todo_stats les corrige.
+    """
+    expected = _recount(root)
+    stats = root.todo_stats
+    stored = {('user', key): counters for key, counters in stats.by_user.items()}
+    stored.update((('list', key), counters) for key, counters in stats.by_list.items())
+
+    mismatches = []
+    for scope in sorted(set(expected) | set(stored), key=repr):
+        want = expected.get(scope, {})
+        found = _stored(stored.get(scope))
+        if want != found:
+            mismatches.append({
+                'scope': scope[0],
+                'id': scope[1],
+                'expected': _summary(want),
+                'found': _summary(found),
+            })
+    return mismatches
+
+def rebuild_todo_stats(root):
+    """Recalcule les compteurs à partir de root.todos"""
+    todo_stats = root.todo_stats
+    todo_stats.clear()
+    count = 0
+    for todo in root.todos.values():
+        todo_stats.index(todo)
+        count += 1
+    return count
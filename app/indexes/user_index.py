@@ -0,0 +1,75 @@
+import persistent
+import BTrees.OOBTree
+
+def valid_identifier(value):
+    """Vrai pour un nom d'utilisateur ou un email indexable (chaîne non vide)"""
+    return isinstance(value, str) and bool(value.strip())
+
+def normalize_email(email):
+    """Forme canonique d'un email pour les comparaisons"""
+    return email.strip().lower()
+
+class UserIndex(persistent.Persistent):
+    """Index uniques des utilisateurs par nom d'utilisateur et email"""
+
+    def __init__(self):
+        self.by_username = BTrees.OOBTree.BTree()  # username -> user_id
+        self.by_email = BTrees.OOBTree.BTree()     # email normalisé -> user_id
+
+    def find_by_username(self, username):
+        """Identifiant de l'utilisateur portant ce nom, ou None"""
+        return self.by_username.get(username)
+
+    def find_by_email(self, email):
+        """Identifiant de l'utilisateur ayant cet email, ou None"""
+        return self.by_email.get(normalize_email(email))
+
+    def username_taken(self, username, user_id=None):
+        """Vrai si le nom est utilisé par un autre utilisateur que user_id"""
+        owner = self.find_by_username(username)
+        return owner is not None and owner != user_id
+
+    def email_taken(self, email, user_id=None):
+        """Vrai si l'email est utilisé par un autre utilisateur que user_id"""
+        owner = self.find_by_email(email)
+        return owner is not None and owner != user_id
+
+    def index(self, user):
+        """Ajoute un utilisateur aux index"""
+        self.by_username[user.username] = user.id
+        self.by_email[normalize_email(user.email)] = user.id
+
+    def unindex(self, user, username=None, email=None):
+        """Retire un utilisateur des index (avec ses anciennes valeurs si fournies)"""
+        username = user.username if username is None else username
+        email = normalize_email(user.email if email is None else email)
+        if self.by_username.get(username) == user.id:
+            del self.by_username[username]
+        if self.by_email.get(email) == user.id:
+            del self.by_email[email]
+
+    def reindex(self, user, old_username, old_email):
+        """Met à jour les index après un changement de nom ou d'email"""
+        if old_username == user.username and normalize_email(old_email) == normalize_email(user.email):
+            return
+        self.unindex(user, username=old_username, email=old_email)
+        self.index(user)
+
+    def clear(self):
+        """Vide tous les index"""
+        self.by_username.clear()
+        self.by_email.clear()
+
+
+def rebuild_user_index(root):
+    """Reconstruit l'index des utilisateurs à partir de root.users"""
+    user_index = root.user_index
+    user_index.clear()
+    count = 0
+    for user in root.users.values():
+        if user_index.username_taken(user.username, user.id) or user_index.email_taken(user.email, user.id):
+            print(f"Doublon ignoré dans l'index des utilisateurs : {user.id}")
+            continue
+        user_index.index(user)
+        count += 1
+    return count
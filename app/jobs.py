@@ -0,0 +1,281 @@
+import datetime
+import json
+import os
+import socket
+import threading
+import time
+import transaction
+from concurrent.futures import ThreadPoolExecutor
+from transaction.interfaces import TransientError
+from app.models.job import Job
+from app.services import ServiceError, cascade
+from app.services.transfer import export_records
+from app.utils.transactions import retry_delay
+
+# Fonctions d'exécution par type de tâche : handler(root, job, runner) -> résumé JSON
+JOB_HANDLERS = {}
+
+class JobInterrupted(Exception):
+    """Arrêt du processus : la tâche reprendra depuis son dernier lot validé"""
+
+def job_handler(kind):
+    def register(handler):
+        JOB_HANDLERS[kind] = handler
+        return handler
+    return register
+
+def enqueue(root, kind, **params):
+    """Crée une tâche de fond ; elle est soumise au runner quand la transaction est validée"""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Type de tâche inconnu : {kind}")
+    job = Job(kind, params)
+    root.jobs[job.id] = job
+
+    runner = job_runner.current
+    if runner is not None:
+        transaction.get().addAfterCommitHook(
+            lambda committed: committed and runner.submit(job.id))
+    return job
+
+class JobRunner:
+    """Exécute les tâches de fond dans un pool de threads, chacun avec sa connexion ZODB.
+
+    L'état des tâches est en base : au démarrage, et périodiquement, les tâches
+    en attente ou dont le processus d'exécution a cessé de donner signe de vie
+    sont reprises.
+    """
+
+    def __init__(self, db, workers=2, batch_size=500, stale_seconds=60, retention_days=7,
+                 retry_attempts=3, retry_backoff=0.05, logger=None, sessions=None):
+        self.db = db
+        # Cache de sessions du processus (SessionCache), vidé des comptes supprimés
+        self.sessions = sessions
+        self.batch_size = batch_size
+        self.stale = datetime.timedelta(seconds=stale_seconds)
+        self.retention = datetime.timedelta(days=retention_days)
+        self.retry_attempts = retry_attempts
+        self.retry_backoff = retry_backoff
+        self.logger = logger
+        # Identité de ce processus pour revendiquer les tâches
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{time.time():.0f}'
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._stopping = threading.Event()
+        # Tâches soumises et pas encore terminées dans ce processus
+        self._active = set()
+        self._lock = threading.Lock()
+        self._sweeper = threading.Thread(target=self._sweep_loop, args=(stale_seconds,),
+                                         name='job-sweeper', daemon=True)
+
+    def start(self):
+        self._sweeper.start()
+        return self
+
+    def submit(self, job_id):
+        with self._lock:
+            if self._stopping.is_set() or job_id in self._active:
+                return
+            self._active.add(job_id)
+        self._executor.submit(self._run, job_id)
+
+    def stop(self, wait=True):
+        """Interrompt les tâches à leur prochain lot puis attend la fin des threads"""
+        self._stopping.set()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def checkpoint(self, job, **deltas):
+        """Avancement d'une tâche (appelé avant chaque lot validé)"""
+        if self._stopping.is_set():
+            raise JobInterrupted()
+        job.add_progress(**deltas)
+
+    def _log(self, level, message, *args):
+        if self.logger:
+            getattr(self.logger, level)(message, *args)
+
+    def _claim(self, root, job_id):
+        """Marque la tâche comme prise par ce processus, ou None si elle ne doit pas tourner ici"""
+        job = root.jobs.get(job_id)
+        if job is None or job.finished:
+            return None
+        now = datetime.datetime.now()
+        if (job.status == Job.RUNNING and job.owner != self.owner
+                and job.heartbeat is not None and now - job.heartbeat < self.stale):
+            # Une autre instance l'exécute encore
+            return None
+        job.status = Job.RUNNING
+        job.owner = self.owner
+        job.attempts += 1
+        job.started_at = job.started_at or now
+        job.touch()
+        transaction.commit()
+        return job
+
+    def _run(self, job_id):
+        connection = self.db.open_connection()
+        try:
+            root = connection.root()
+            try:
+                job = self._claim(root, job_id)
+            except TransientError:
+                # Revendiquée au même moment par une autre instance
+                transaction.abort()
+                return
+            if job is None:
+                return
+
+            handler = JOB_HANDLERS[job.kind]
+            for attempt in range(1, self.retry_attempts + 1):
+                try:
+                    job.summary = handler(root, job, self)
+                    job.status = Job.SUCCEEDED
+                    job.finished_at = datetime.datetime.now()
+                    job.touch()
+                    transaction.commit()
+                    self._log('info', "Tâche %s (%s) terminée", job.id, job.kind)
+                    return
+                except TransientError:
+                    transaction.abort()
+                    if attempt == self.retry_attempts:
+                        self._fail(job, "Conflit d'écriture non résolu")
+                        return
+                    # Même attente que les routes avant de rejouer ; un arrêt l'écourte
+                    self._stopping.wait(retry_delay(self.retry_backoff, attempt))
+                except JobInterrupted:
+                    # Reprise au prochain démarrage, depuis le dernier lot validé
+                    transaction.abort()
+                    job.status = Job.PENDING
+                    job.owner = None
+                    transaction.commit()
+                    return
+                except ServiceError as e:
+                    transaction.abort()
+                    self._fail(job, e.message)
+                    return
+                except Exception as e:
+                    transaction.abort()
+                    self._log('exception', "Échec de la tâche %s (%s)", job.id, job.kind)
+                    self._fail(job, str(e))
+                    return
+        except Exception:
+            transaction.abort()
+            self._log('exception', "Erreur du runner pour la tâche %s", job_id)
+        finally:
+            connection.close()
+            with self._lock:
+                self._active.discard(job_id)
+
+    def _fail(self, job, message):
+        job.status = Job.FAILED
+        job.error = message
+        job.finished_at = datetime.datetime.now()
+        job.touch()
+        transaction.commit()
+
+    def resume(self):
+        """Soumet les tâches à reprendre et supprime les tâches terminées trop anciennes"""
+        connection = self.db.open_connection()
+        resumable = []
+        try:
+            root = connection.root()
+            now = datetime.datetime.now()
+            expired = []
+            for job_id, job in root.jobs.items():
+                if job.status == Job.PENDING:
+                    resumable.append(job_id)
+                elif (job.status == Job.RUNNING and job.owner != self.owner
+                      and (job.heartbeat is None or now - job.heartbeat >= self.stale)):
+                    # Processus d'exécution arrêté ou disparu
+                    resumable.append(job_id)
+                elif job.finished and now - job.finished_at >= self.retention:
+                    expired.append(job_id)
+            for job_id in expired:
+                del root.jobs[job_id]
+            transaction.commit()
+        except TransientError:
+            transaction.abort()
+        finally:
+            connection.close()
+
+        for job_id in resumable:
+            self.submit(job_id)
+        return resumable
+
+    def _sweep_loop(self, interval):
+        while not self._stopping.is_set():
+            try:
+                self.resume()
+            except Exception:
+                self._log('exception', "Erreur lors de la reprise des tâches de fond")
+            self._stopping.wait(interval)
+
+def job_runner():
+    """Runner du processus courant (voir start_job_runner)"""
+    return job_runner.current
+
+job_runner.current = None
+
+def start_job_runner(app, db):
+    """Démarre le runner des tâches de fond de ce processus"""
+    runner = JobRunner(
+        db,
+        workers=app.config.get('JOB_WORKERS', 2),
+        batch_size=app.config.get('CASCADE_BATCH_SIZE', 500),
+        stale_seconds=app.config.get('JOB_STALE_SECONDS', 60),
+        retention_days=app.config.get('JOB_RETENTION_DAYS', 7),
+        retry_attempts=app.config.get('TX_RETRY_ATTEMPTS', 3),
+        retry_backoff=app.config.get('TX_RETRY_BACKOFF', 0.05),
+        logger=app.logger,
+        sessions=app.extensions['auth']['sessions'],
+    )
+    job_runner.current = runner
+    return runner.start()
+
+
+@job_handler('delete_user')
+def run_delete_user(root, job, runner):
+    """Supprime un utilisateur par lots validés un à un (reprise possible à tout moment)"""
+    user_id = job.params['user_id']
+    user = root.users.get(user_id)
+    if user is not None:
+        cascade.delete_user(root, user, batch_size=runner.batch_size, commit=True,
+                            progress=lambda **deltas: runner.checkpoint(job, **deltas))
+    if runner.sessions is not None:
+        # Sessions révoquées en base par la cascade : plus acceptées par ce processus non plus
+        sessions = runner.sessions
+        transaction.get().addAfterCommitHook(lambda committed: committed and sessions.discard_user(user_id))
+    return {'lists': job.progress.get('lists', 0), 'todos': job.progress.get('todos', 0)}
+
+@job_handler('export_user')
+def run_export_user(root, job, runner):
+    """Exporte un utilisateur en NDJSON (export_records), validé par morceaux de `batch_size` lignes.
+
+    Les données sont lues sur une connexion à part, jamais synchronisée :
+    l'export reste une image cohérente de la base malgré les commits des
+    morceaux. Une reprise recommence l'export depuis le début.
+    """
+    snapshot = runner.db.db.open(transaction_manager=transaction.TransactionManager())
+    try:
+        user = snapshot.root().users.get(job.params['user_id'])
+        if user is None:
+            raise ServiceError('Utilisateur non trouvé', 404)
+        result = job.set_result(mimetype='application/x-ndjson')
+        job.progress = {}
+        counts = {'user': 0, 'list': 0, 'todo': 0}
+        lines = []
+        for record in export_records(user):
+            counts[record['type']] += 1
+            lines.append(json.dumps(record, ensure_ascii=False) + '\n')
+            if len(lines) == runner.batch_size:
+                runner.checkpoint(job, records=len(lines))
+                result.append(''.join(lines))
+                transaction.commit()
+                # Redescendre le cache de la connexion de lecture à sa taille cible
+                snapshot.cacheGC()
+                lines = []
+        if lines:
+            runner.checkpoint(job, records=len(lines))
+            result.append(''.join(lines))
+    finally:
+        snapshot.transaction_manager.abort()
+        snapshot.close()
+    return {'lists': counts['list'], 'todos': counts['todo']}
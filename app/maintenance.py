@@ -0,0 +1,120 @@
+import threading
+import time
+from transaction.interfaces import TransientError
+from app.storage import save_file_index
+
+def storage_size(storage):
+    """Taille du stockage en octets (0 si le stockage ne la connaît pas)"""
+    try:
+        return storage.getSize()
+    except Exception:
+        return 0
+
+def pack_database(db, days=0):
+    """Compacte le stockage en ligne et supprime les objets inaccessibles.
+
+    Les révisions plus anciennes que `days` jours sont supprimées ; les requêtes
+    continuent d'être servies pendant le compactage.
+    """
+    size_before = storage_size(db.storage)
+    start = time.perf_counter()
+
+    # Entrées expirées du journal de synchronisation et sessions expirées, récupérées par ce même compactage
+    try:
+        with db.db.transaction() as connection:
+            root = connection.root()
+            sync_entries = root.change_log.compact(lambda user_id: user_id in root.users)
+            sessions = root.sessions.purge(time.time())
+    except TransientError:
+        # Conflit avec une écriture en cours : ce sera pour le prochain compactage
+        sync_entries = sessions = 0
+
+    db.db.pack(days=days)
+
+    duration = time.perf_counter() - start
+    size_after = storage_size(db.storage)
+    return {
+        'days': days,
+        'bytes_before': size_before,
+        'bytes_after': size_after,
+        'bytes_reclaimed': size_before - size_after,
+        'duration': duration,
+        'sync_entries_removed': sync_entries,
+        'sessions_removed': sessions,
+    }
+
+def format_pack_report(report):
+    """Résumé lisible d'un compactage"""
+    return (f"Compactage terminé en {report['duration']:.2f}s : "
+            f"{report['bytes_before']} -> {report['bytes_after']} octets "
+            f"({report['bytes_reclaimed']} récupérés, "
+            f"{report['sync_entries_removed']} entrées du journal de synchronisation et "
+            f"{report['sessions_removed']} sessions expirées)")
+
+class PackScheduler(threading.Thread):
+    """Compacte périodiquement la base dans un thread d'arrière-plan"""
+
+    def __init__(self, db, interval_hours, days=0, logger=None):
+        super().__init__(name='zodb-pack', daemon=True)
+        self.db = db
+        self.interval = interval_hours * 3600
+        self.days = days
+        self.logger = logger
+        self.last_report = None
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.last_report = pack_database(self.db, self.days)
+                if self.logger:
+                    self.logger.info(format_pack_report(self.last_report))
+            except Exception as e:
+                if self.logger:
+                    self.logger.error(f"Erreur lors du compactage : {str(e)}")
+
+    def stop(self):
+        self._stopped.set()
+
+def start_pack_scheduler(app, db):
+    """Démarre le compactage périodique si ZODB_PACK_INTERVAL_HOURS est défini"""
+    interval = app.config.get('ZODB_PACK_INTERVAL_HOURS', 0)
+    if not interval or db.use_memory:
+        return None
+    scheduler = PackScheduler(db, interval, app.config.get('ZODB_PACK_DAYS', 0), app.logger)
+    scheduler.start()
+    return scheduler
+
+class IndexCheckpointer(threading.Thread):
+    """Enregistre périodiquement l'index du FileStorage.
+
+    Après un arrêt brutal, FileStorage ne relit alors que les transactions
+    écrites depuis le dernier enregistrement au lieu de tout le fichier.
+    """
+
+    def __init__(self, db, interval_seconds, logger=None):
+        super().__init__(name='zodb-index', daemon=True)
+        self.db = db
+        self.interval = interval_seconds
+        self.logger = logger
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                save_file_index(self.db.storage)
+            except Exception as e:
+                if self.logger:
+                    self.logger.error(f"Erreur lors de l'enregistrement de l'index : {str(e)}")
+
+    def stop(self):
+        self._stopped.set()
+
+def start_index_checkpoints(app, db):
+    """Démarre l'enregistrement périodique de l'index si la base est un FileStorage"""
+    interval = app.config.get('ZODB_INDEX_SAVE_SECONDS', 0)
+    if not interval or db.storage_type != 'file':
+        return None
+    checkpointer = IndexCheckpointer(db, interval, app.logger)
+    checkpointer.start()
+    return checkpointer
@@ -0,0 +1,240 @@
+import copy
+import threading
+import time
+import transaction
+from flask import current_app, g, request
+from app.database import on_connection_close, on_database_open
+from app.maintenance import storage_size
+from app.utils.cache import response_cache
+from app.utils.transactions import retry_stats
+
+# Bornes (secondes) de l'histogramme des durées de requête
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Compteurs de la requête en cours, alimentés par le stockage et le synchroniseur
+_local = threading.local()
+
+def _counters():
+    counters = getattr(_local, 'counters', None)
+    if counters is None:
+        counters = _local.counters = {'bytes': 0, 'commits': 0, 'commit_seconds': 0.0}
+    return counters
+
+class EndpointMetrics:
+    """Cumuls d'un endpoint depuis le démarrage du processus"""
+
+    def __init__(self):
+        self.statuses = {}
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.duration = 0.0
+        self.loads = 0
+        self.stores = 0
+        self.bytes_written = 0
+        self.commits = 0
+        self.commit_seconds = 0.0
+        # Cache de réponses HTTP (app.utils.cache), distinct du cache d'objets ZODB
+        self.response_cache = {'hit': 0, 'miss': 0}
+
+class RequestMetrics:
+    """Mesures par endpoint : durée, activité ZODB, commits et cache de réponses"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, status, duration, loads, stores, counters, response_cache_result=None):
+        with self._lock:
+            metrics = self._endpoints.get(endpoint)
+            if metrics is None:
+                metrics = self._endpoints[endpoint] = EndpointMetrics()
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    metrics.buckets[index] += 1
+            metrics.duration += duration
+            metrics.loads += loads
+            metrics.stores += stores
+            metrics.bytes_written += counters['bytes']
+            metrics.commits += counters['commits']
+            metrics.commit_seconds += counters['commit_seconds']
+            if response_cache_result is not None:
+                metrics.response_cache[response_cache_result] += 1
+
+    def snapshot(self):
+        """Copie des mesures {endpoint: EndpointMetrics}"""
+        with self._lock:
+            return copy.deepcopy(self._endpoints)
+
+    def clear(self):
+        with self._lock:
+            self._endpoints.clear()
+
+request_metrics = RequestMetrics()
+
+class CommitTimer:
+    """Synchroniseur de transactions : durée des commits qui ont écrit des données"""
+
+    def newTransaction(self, txn):
+        pass
+
+    def beforeCompletion(self, txn):
+        counters = _counters()
+        _local.commit_started = (time.perf_counter(), counters['bytes'])
+
+    def afterCompletion(self, txn):
+        started = getattr(_local, 'commit_started', None)
+        _local.commit_started = None
+        if started is None or txn.status != 'Committed':
+            return
+        counters = _counters()
+        # Les commits sans objet modifié (fin de requête en lecture) ne comptent pas
+        if counters['bytes'] > started[1]:
+            counters['commits'] += 1
+            counters['commit_seconds'] += time.perf_counter() - started[0]
+
+commit_timer = CommitTimer()
+
+def instrument_storage(storage):
+    """Compte les octets des enregistrements écrits par le thread courant"""
+    if getattr(storage, '_metrics_instrumented', False):
+        return
+    store = storage.store
+
+    def counting_store(oid, serial, data, version, txn):
+        _counters()['bytes'] += len(data)
+        return store(oid, serial, data, version, txn)
+
+    storage.store = counting_store
+    storage._metrics_instrumented = True
+
+def _start_request():
+    _local.counters = None
+    # Les synchroniseurs sont propres au thread (ensemble faible : ré-enregistrer est sans effet)
+    transaction.manager.registerSynch(commit_timer)
+    connection = g.get('zodb_connection')
+    if connection is not None:
+        connection.getTransferCounts(clear=True)
+    g.metrics_started = time.perf_counter()
+    # Le contexte de requête n'existe plus quand la mesure est enregistrée
+    g.metrics_request = (request.method, request.path, request.endpoint or '<non routé>')
+
+def _record_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+def _finish_request(connection, exception=None):
+    """Enregistre la requête après son commit (teardown de la base) : commits et octets compris"""
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return
+    duration = time.perf_counter() - started
+
+    loads = stores = 0
+    if connection is not None:
+        loads, stores = connection.getTransferCounts(clear=True)
+
+    method, path, endpoint = g.pop('metrics_request')
+    status = g.pop('metrics_status', 500 if exception is not None else 200)
+    counters = _counters()
+    request_metrics.record(endpoint, status, duration, loads, stores, counters,
+                           g.get('response_cache'))
+
+    threshold = current_app.config.get('SLOW_REQUEST_MS', 0)
+    if threshold and duration * 1000 >= threshold:
+        current_app.logger.warning(
+            "Requête lente %s %s (%s) : %.0f ms, %d objets chargés, %d écrits, "
+            "%d octets, %d commits en %.0f ms",
+            method, path, endpoint, duration * 1000, loads, stores,
+            counters['bytes'], counters['commits'], counters['commit_seconds'] * 1000)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _line(name, value, **labels):
+    if labels:
+        rendered = ','.join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+        return f'{name}{{{rendered}}} {value}'
+    return f'{name} {value}'
+
+def render_metrics(db=None, auth=None):
+    """Mesures au format texte de Prometheus"""
+    snapshot = request_metrics.snapshot()
+    lines = []
+
+    def family(name, kind, help_text):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    family('todoapp_requests_total', 'counter', 'Requêtes traitées par endpoint et code HTTP')
+    for endpoint, metrics in snapshot.items():
+        for status, count in sorted(metrics.statuses.items()):
+            lines.append(_line('todoapp_requests_total', count, endpoint=endpoint, status=status))
+
+    family('todoapp_request_duration_seconds', 'histogram', 'Durée des requêtes')
+    for endpoint, metrics in snapshot.items():
+        total = sum(metrics.statuses.values())
+        for bound, count in zip(DURATION_BUCKETS, metrics.buckets):
+            lines.append(_line('todoapp_request_duration_seconds_bucket', count,
+                               endpoint=endpoint, le=bound))
+        lines.append(_line('todoapp_request_duration_seconds_bucket', total, endpoint=endpoint, le='+Inf'))
+        lines.append(_line('todoapp_request_duration_seconds_sum', f'{metrics.duration:.6f}', endpoint=endpoint))
+        lines.append(_line('todoapp_request_duration_seconds_count', total, endpoint=endpoint))
+
+    counters = (
+        ('todoapp_zodb_loads_total', 'Objets chargés depuis le stockage (absents du cache ZODB)', 'loads'),
+        ('todoapp_zodb_stores_total', 'Objets écrits dans le stockage', 'stores'),
+        ('todoapp_zodb_bytes_written_total', 'Octets d\'enregistrements écrits', 'bytes_written'),
+        ('todoapp_zodb_commits_total', 'Commits ayant écrit des données', 'commits'),
+        ('todoapp_zodb_commit_duration_seconds_total', 'Durée cumulée de ces commits', 'commit_seconds'),
+    )
+    for name, help_text, attribute in counters:
+        family(name, 'counter', help_text)
+        for endpoint, metrics in snapshot.items():
+            value = getattr(metrics, attribute)
+            lines.append(_line(name, f'{value:.6f}' if isinstance(value, float) else value, endpoint=endpoint))
+
+    response_cache_counters = (
+        ('hit', 'todoapp_response_cache_hits_total', 'Réponses servies par le cache de réponses'),
+        ('miss', 'todoapp_response_cache_misses_total', 'Réponses absentes du cache de réponses'),
+    )
+    for result, name, help_text in response_cache_counters:
+        family(name, 'counter', help_text)
+        for endpoint, metrics in snapshot.items():
+            if metrics.response_cache[result]:
+                lines.append(_line(name, metrics.response_cache[result], endpoint=endpoint))
+    family('todoapp_response_cache_entries', 'gauge', 'Réponses en cache')
+    lines.append(_line('todoapp_response_cache_entries', len(response_cache)))
+
+    family('todoapp_tx_conflicts_total', 'counter', 'Conflits d\'écriture, nouvelles tentatives et échecs')
+    for endpoint, stats in retry_stats.snapshot().items():
+        for outcome, count in stats.items():
+            lines.append(_line('todoapp_tx_conflicts_total', count, endpoint=endpoint, outcome=outcome))
+
+    if auth is not None:
+        family('todoapp_password_hashes_rejected_total', 'counter', 'Calculs bcrypt refusés (pool saturé, 503)')
+        lines.append(_line('todoapp_password_hashes_rejected_total', auth['hasher'].rejected))
+        family('todoapp_session_cache_hits_total', 'counter', 'Sessions acceptées par le cache de sessions')
+        lines.append(_line('todoapp_session_cache_hits_total', auth['sessions'].hits))
+        family('todoapp_session_cache_misses_total', 'counter', 'Sessions relues en base (absentes du cache de sessions)')
+        lines.append(_line('todoapp_session_cache_misses_total', auth['sessions'].misses))
+
+    if db is not None:
+        # Caches d'objets des connexions du pool (un par connexion)
+        caches = db.db.cacheDetailSize()
+        family('todoapp_zodb_cache_objects', 'gauge', 'Objets dans les caches ZODB des connexions, fantômes compris')
+        lines.append(_line('todoapp_zodb_cache_objects', sum(cache['size'] for cache in caches)))
+        family('todoapp_zodb_cache_active_objects', 'gauge', 'Objets chargés (non fantômes) dans ces caches')
+        lines.append(_line('todoapp_zodb_cache_active_objects', sum(cache['ngsize'] for cache in caches)))
+        family('todoapp_zodb_cache_target_objects', 'gauge', 'Taille cible cumulée de ces caches')
+        lines.append(_line('todoapp_zodb_cache_target_objects', db.db.getCacheSize() * len(caches)))
+        family('todoapp_zodb_storage_bytes', 'gauge', 'Taille du stockage')
+        lines.append(_line('todoapp_zodb_storage_bytes', storage_size(db.storage)))
+
+    return '\n'.join(lines) + '\n'
+
+def init_app(app):
+    """Branche l'instrumentation des requêtes sur l'application"""
+    on_database_open(app, lambda db: instrument_storage(db.storage))
+    app.before_request(_start_request)
+    app.after_request(_record_status)
+    on_connection_close(app, _finish_request)
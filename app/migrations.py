@@ -0,0 +1,156 @@
+import datetime
+import bcrypt
+import transaction
+import BTrees.Length
+import BTrees.OOBTree
+from app.indexes import (ChangeLog, SessionStore, TextIndex, TodoIndex, TodoStats, UserIndex, rebuild_text_index,
+                         rebuild_todo_index, rebuild_todo_stats, rebuild_user_index)
+from app.auth import is_password_hash
+from app.config import Config
+from app.utils import ids
+
+# Nombre d'objets migrés entre deux commits
+BATCH_SIZE = 1000
+
+def _commit_every(count, batch_size=BATCH_SIZE):
+    """Commit intermédiaire pour borner la taille des transactions de migration"""
+    if count % batch_size == 0:
+        transaction.commit()
+
+def migrate_counters(root):
+    """Ajoute les compteurs BTrees.Length aux listes et utilisateurs existants"""
+    migrated = 0
+    for todo_list in root.todo_lists.values():
+        if todo_list._todo_count is None:
+            todo_list._todo_count = BTrees.Length.Length(len(todo_list.todos))
+            migrated += 1
+            _commit_every(migrated)
+    for user in root.users.values():
+        if user._list_count is None:
+            user._list_count = BTrees.Length.Length(len(user.todo_lists))
+            migrated += 1
+            _commit_every(migrated)
+    transaction.commit()
+    return migrated
+
+def migrate_compact_todos(root):
+    """Réécrit les tâches au format compact (slots, identifiants binaires, dates entières)"""
+    migrated = 0
+    for todo in root.todos.values():
+        # __setstate__ lit l'ancien __dict__ ; marquer l'objet force sa réécriture
+        todo._p_activate()
+        todo._p_changed = True
+        migrated += 1
+        _commit_every(migrated)
+    transaction.commit()
+    return migrated
+
+def migrate_password_hashes(root):
+    """Remplace les mots de passe stockés en clair par leur hash bcrypt"""
+    migrated = 0
+    for user in root.users.values():
+        if user.password_hash and not is_password_hash(user.password_hash):
+            salt = bcrypt.gensalt(Config.AUTH_BCRYPT_ROUNDS)
+            user.password_hash = bcrypt.hashpw(user.password_hash.encode('utf-8'), salt).decode('ascii')
+            migrated += 1
+            _commit_every(migrated, batch_size=100)
+    transaction.commit()
+    return migrated
+
+# Migrations appliquées dans l'ordre par `run.py --migrate`
+MIGRATIONS = [
+    ('counters', migrate_counters),
+    ('compact_todos', migrate_compact_todos),
+    ('password_hashes', migrate_password_hashes),
+]
+
+def run_migrations(root):
+    """Exécute les migrations pas encore appliquées et retourne le nombre d'objets migrés par étape"""
+    if not hasattr(root, 'applied_migrations'):
+        root.applied_migrations = BTrees.OOBTree.BTree()
+        transaction.commit()
+
+    results = {}
+    for name, migration in MIGRATIONS:
+        if name in root.applied_migrations:
+            continue
+        results[name] = migration(root)
+        root.applied_migrations[name] = datetime.datetime.now()
+        transaction.commit()
+    return results
+
+
+def convert_keys(root, key_type):
+    """Recrée les collections avec un autre type de clés ('uuid' ou 'int').
+
+    Chaque objet reçoit un nouvel identifiant ; les références entre objets
+    (list_id, user_id) sont réécrites et les index reconstruits. Le tout est
+    validé en une seule transaction, les points de sauvegarde bornant la mémoire.
+    Refusé (RuntimeError) tant qu'une tâche de fond n'est pas terminée ; les
+    paramètres des tâches terminées désignent les nouveaux identifiants.
+    Retourne la table {ancien identifiant: nouvel identifiant}.
+    """
+    if getattr(root, 'key_type', 'uuid') == key_type:
+        return {}
+    unfinished = sum(1 for job in root.jobs.values() if not job.finished)
+    if unfinished:
+        # Une tâche en cours ou reprise plus tard viserait des identifiants disparus
+        raise RuntimeError(f"{unfinished} tâche(s) de fond non terminée(s) : attendez leur fin avant la conversion")
+    ids.configure(key_type)
+
+    id_map = {}
+    users, todo_lists, todos = ids.new_tree(), ids.new_tree(), ids.new_tree()
+
+    def renumber(obj, collection):
+        new_id = ids.new_id()
+        id_map[obj.id] = new_id
+        obj.id = new_id
+        collection[new_id] = obj
+        if len(id_map) % BATCH_SIZE == 0:
+            transaction.savepoint(optimistic=True)
+
+    for user in root.users.values():
+        renumber(user, users)
+        user.todo_lists = ids.new_tree()
+        user._list_count = BTrees.Length.Length()
+
+    for todo_list in root.todo_lists.values():
+        renumber(todo_list, todo_lists)
+        todo_list.user_id = id_map.get(todo_list.user_id, todo_list.user_id)
+        todo_list.todos = ids.new_tree()
+        todo_list._todo_count = BTrees.Length.Length()
+        owner = users.get(todo_list.user_id)
+        if owner is not None:
+            owner.add_list(todo_list)
+
+    for todo in root.todos.values():
+        renumber(todo, todos)
+        todo.list_id = id_map.get(todo.list_id, todo.list_id)
+        todo.user_id = id_map.get(todo.user_id, todo.user_id)
+        parent = todo_lists.get(todo.list_id)
+        if parent is not None:
+            parent.add_todo(todo)
+
+    root.users, root.todo_lists, root.todos = users, todo_lists, todos
+    root.key_type = key_type
+
+    for job in root.jobs.values():
+        if job.params.get('user_id') in id_map:
+            job.params = dict(job.params, user_id=id_map[job.params['user_id']])
+
+    root.todo_index = TodoIndex()
+    rebuild_todo_index(root)
+    root.todo_stats = TodoStats()
+    rebuild_todo_stats(root)
+    root.user_index = UserIndex()
+    rebuild_user_index(root)
+    root.todo_text_index = TextIndex()
+    rebuild_text_index(root.todo_text_index, root.todos)
+    root.list_text_index = TextIndex()
+    rebuild_text_index(root.list_text_index, root.todo_lists)
+    # Les identifiants ont changé : les clients repartent d'un état complet et se reconnectent
+    root.change_log = ChangeLog()
+    root.sessions = SessionStore()
+
+    transaction.commit()
+    return id_map
@@ -1,3 +1,4 @@
 from .user import User
 from .list import TodoList
-from .todo import Todo
\ No newline at end of file
+from .todo import Todo
+from .job import Job
\ No newline at end of file
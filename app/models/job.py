@@ -0,0 +1,115 @@
+import persistent
+import datetime
+import uuid
+import BTrees.LOBTree
+
+class ResultChunk(persistent.Persistent):
+    """Morceau d'un résultat : un enregistrement ZODB chacun"""
+
+    def __init__(self, data):
+        self.data = data
+
+class JobResult(persistent.Persistent):
+    """Résultat d'une tâche de fond, chargé seulement quand il est demandé.
+
+    Soit un corps unique (`body`), soit des morceaux ajoutés au fil de la
+    tâche et validés avec ses lots : un gros résultat n'est jamais un seul
+    enregistrement, ni entièrement en mémoire.
+    """
+
+    mimetype = 'application/json'
+    chunks = None
+    next_index = None  # rang du prochain morceau (None : résultat antérieur)
+
+    def __init__(self, body=None, mimetype=None):
+        self.body = body
+        if mimetype is not None:
+            self.mimetype = mimetype
+        if body is None:
+            self.chunks = BTrees.LOBTree.BTree()  # rang -> ResultChunk
+            self.next_index = 0
+
+    def append(self, data):
+        # len() d'un BTree parcourt tous ses buckets : le rang est tenu à part
+        if self.next_index is None:
+            self.next_index = self.chunks.maxKey() + 1 if self.chunks else 0
+        self.chunks[self.next_index] = ResultChunk(data)
+        self.next_index += 1
+
+    def iter_chunks(self):
+        """Corps du résultat, morceau par morceau"""
+        if self.chunks is None:
+            yield self.body
+            return
+        for chunk in self.chunks.values():
+            yield chunk.data
+
+class Job(persistent.Persistent):
+    """Tâche de fond persistante (suppression en cascade, export, ...)"""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+    def __init__(self, kind, params):
+        # Identifiant UUID quel que soit le type de clés des collections
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.params = dict(params)
+        self.status = self.PENDING
+        self.progress = {}
+        self.summary = None
+        self.error = None
+        self.owner = None
+        self.attempts = 0
+        self.created_at = datetime.datetime.now()
+        self.updated_at = self.created_at
+        self.heartbeat = None
+        self.started_at = None
+        self.finished_at = None
+        self._result = None
+
+    @property
+    def finished(self):
+        return self.status in (self.SUCCEEDED, self.FAILED)
+
+    @property
+    def result(self):
+        """Résultat (JobResult), ou None"""
+        return self._result
+
+    def set_result(self, body=None, mimetype=None):
+        """Remplace le résultat ; sans `body`, retourne un résultat à compléter par morceaux"""
+        self._result = JobResult(body, mimetype)
+        return self._result
+
+    def add_progress(self, **deltas):
+        """Ajoute des compteurs d'avancement (validés avec le lot correspondant)"""
+        progress = dict(self.progress)
+        for name, delta in deltas.items():
+            progress[name] = progress.get(name, 0) + delta
+        self.progress = progress
+        self.touch()
+
+    def touch(self):
+        self.heartbeat = self.updated_at = datetime.datetime.now()
+
+    def to_dict(self):
+        """Convertit la tâche de fond en dictionnaire pour la sérialisation JSON"""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'params': self.params,
+            'status': self.status,
+            'progress': self.progress,
+            'summary': self.summary,
+            'error': self.error,
+            'attempts': self.attempts,
+            # Un résultat par morceaux n'est complet qu'à la fin de la tâche
+            'has_result': self.status == self.SUCCEEDED and self._result is not None,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
@@ -1,19 +1,50 @@
 import persistent
-import BTrees.OOBTree
+import BTrees.Length
 import datetime
-import uuid
+from app.utils.ids import new_id, new_tree
 
 class TodoList(persistent.Persistent):
     """Modèle de liste de tâches"""
     
+    # Compteur absent des listes créées avant son introduction (voir app.migrations)
+    _todo_count = None
+    
     def __init__(self, title, description, user_id):
-        self.id = str(uuid.uuid4())
+        self.id = new_id()
         self.title = title
         self.description = description
         self.user_id = user_id
         self.created_at = datetime.datetime.now()
         self.updated_at = self.created_at
-        self.todos = BTrees.OOBTree.BTree()  # Collection de todos dans cette liste
+        self.todos = new_tree()  # Collection de todos dans cette liste
+        self._todo_count = BTrees.Length.Length()  # Nombre de todos, sans conflit en écriture
+    
+    @property
+    def todo_count(self):
+        """Nombre de tâches de la liste"""
+        if self._todo_count is None:
+            return len(self.todos)
+        return self._todo_count()
+    
+    def _todo_counter(self):
+        """Compteur persistant, créé à partir du BTree s'il manque encore"""
+        if self._todo_count is None:
+            self._todo_count = BTrees.Length.Length(len(self.todos))
+        return self._todo_count
+    
+    def add_todo(self, todo):
+        """Ajoute une tâche à la liste"""
+        if todo.id not in self.todos:
+            counter = self._todo_counter()
+            self.todos[todo.id] = todo
+            counter.change(1)
+    
+    def remove_todo(self, todo_id):
+        """Retire une tâche de la liste"""
+        if todo_id in self.todos:
+            counter = self._todo_counter()
+            del self.todos[todo_id]
+            counter.change(-1)
     
     def to_dict(self, include_todos=False):
         """Convertit la liste en dictionnaire pour la sérialisation JSON"""
@@ -24,7 +55,7 @@ class TodoList(persistent.Persistent):
             'user_id': self.user_id,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
-            'todo_count': len(self.todos)
+            'todo_count': self.todo_count
         }
         
         if include_todos:
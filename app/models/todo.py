@@ -1,12 +1,87 @@
 import persistent
 import datetime
 import uuid
+from app.utils.ids import new_id
+
+# Référence des horodatages compacts (microsecondes depuis cette date, sans fuseau)
+EPOCH = datetime.datetime(1970, 1, 1)
+MICROSECOND = datetime.timedelta(microseconds=1)
+
+# Version du format compact écrit par Todo.__getstate__
+STATE_VERSION = 1
+
+def pack_id(value):
+    """Identifiant sous sa forme stockée : entier ou 16 octets pour un UUID canonique"""
+    if isinstance(value, str):
+        if value.isdigit() and len(value) <= 19 and str(int(value)) == value:
+            return int(value)
+        try:
+            parsed = uuid.UUID(value)
+        except ValueError:
+            return value
+        if str(parsed) == value:
+            return parsed.bytes
+    return value
+
+def unpack_id(value):
+    """Identifiant sous sa forme exposée (chaîne)"""
+    if isinstance(value, bytes):
+        return str(uuid.UUID(bytes=value))
+    if isinstance(value, int):
+        return str(value)
+    return value
+
+def pack_datetime(value):
+    """Date sous forme d'entier de microsecondes (couple avec le décalage si elle a un fuseau)"""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return (value - EPOCH) // MICROSECOND
+    offset = value.utcoffset()
+    naive_utc = value.replace(tzinfo=None) - offset
+    return ((naive_utc - EPOCH) // MICROSECOND, offset // datetime.timedelta(seconds=1))
+
+def unpack_datetime(value):
+    """Date reconstruite depuis sa forme compacte"""
+    if value is None:
+        return None
+    if isinstance(value, tuple):
+        micros, offset = value
+        tz = datetime.timezone(datetime.timedelta(seconds=offset))
+        return (EPOCH + micros * MICROSECOND).replace(tzinfo=datetime.timezone.utc).astimezone(tz)
+    return EPOCH + value * MICROSECOND
+
+def _packed(name, pack, unpack):
+    """Attribut exposé normalement mais stocké sous forme compacte dans un slot"""
+    slot = '_' + name
+
+    def getter(self):
+        return unpack(getattr(self, slot))
+
+    def setter(self, value):
+        setattr(self, slot, pack(value))
+
+    return property(getter, setter)
 
 class Todo(persistent.Persistent):
     """Modèle de tâche individuelle"""
     
+    # Pas de __dict__ par instance : identifiants binaires et dates entières
+    __slots__ = (
+        '_id', 'title', 'description', '_list_id', '_user_id', '_due_date', 'priority',
+        'is_completed', '_created_at', '_updated_at', '_completed_at', '__weakref__',
+    )
+    
+    id = _packed('id', pack_id, unpack_id)
+    list_id = _packed('list_id', pack_id, unpack_id)
+    user_id = _packed('user_id', pack_id, unpack_id)
+    due_date = _packed('due_date', pack_datetime, unpack_datetime)
+    created_at = _packed('created_at', pack_datetime, unpack_datetime)
+    updated_at = _packed('updated_at', pack_datetime, unpack_datetime)
+    completed_at = _packed('completed_at', pack_datetime, unpack_datetime)
+    
     def __init__(self, title, description, list_id, user_id, due_date=None, priority=1):
-        self.id = str(uuid.uuid4())
+        self.id = new_id()
         self.title = title
         self.description = description
         self.list_id = list_id
@@ -18,6 +93,35 @@ class Todo(persistent.Persistent):
         self.updated_at = self.created_at
         self.completed_at = None
     
+    def __getstate__(self):
+        """État pickle compact : un tuple plutôt que le __dict__ complet"""
+        return (
+            STATE_VERSION, self._id, self.title, self.description, self._list_id,
+            self._user_id, self._due_date, self.priority, self.is_completed,
+            self._created_at, self._updated_at, self._completed_at,
+        )
+    
+    def __setstate__(self, state):
+        """Accepte le format compact et l'ancien __dict__ pickle"""
+        if isinstance(state, dict):
+            # Ancien format (avant les slots) : réécrit au prochain commit de l'objet
+            self.id = state['id']
+            self.title = state['title']
+            self.description = state['description']
+            self.list_id = state['list_id']
+            self.user_id = state['user_id']
+            self.due_date = state.get('due_date')
+            self.priority = state.get('priority', 1)
+            self.is_completed = state.get('is_completed', False)
+            self.created_at = state['created_at']
+            self.updated_at = state.get('updated_at', state['created_at'])
+            self.completed_at = state.get('completed_at')
+            return
+    
+        (_, self._id, self.title, self.description, self._list_id, self._user_id,
+         self._due_date, self.priority, self.is_completed, self._created_at,
+         self._updated_at, self._completed_at) = state
+    
     def to_dict(self):
         """Convertit la tâche en dictionnaire pour la sérialisation JSON"""
         todo_dict = {
@@ -1,19 +1,50 @@
 import persistent
-import BTrees.OOBTree
+import BTrees.Length
 import datetime
-import uuid
+from app.utils.ids import new_id, new_tree
 
 class User(persistent.Persistent):
     """Modèle d'utilisateur"""
     
+    # Compteur absent des utilisateurs créés avant son introduction (voir app.migrations)
+    _list_count = None
+    
     def __init__(self, username, email, password_hash):
-        self.id = str(uuid.uuid4())
+        self.id = new_id()
         self.username = username
         self.email = email
-        self.password_hash = password_hash  # En production, utilisez un hash sécurisé
+        self.password_hash = password_hash  # Hash bcrypt (voir app.auth), None sans mot de passe
         self.created_at = datetime.datetime.now()
         self.updated_at = self.created_at
-        self.todo_lists = BTrees.OOBTree.BTree()  # Collection de listes de todos
+        self.todo_lists = new_tree()  # Collection de listes de todos
+        self._list_count = BTrees.Length.Length()  # Nombre de listes, sans conflit en écriture
+    
+    @property
+    def list_count(self):
+        """Nombre de listes de l'utilisateur"""
+        if self._list_count is None:
+            return len(self.todo_lists)
+        return self._list_count()
+    
+    def _list_counter(self):
+        """Compteur persistant, créé à partir du BTree s'il manque encore"""
+        if self._list_count is None:
+            self._list_count = BTrees.Length.Length(len(self.todo_lists))
+        return self._list_count
+    
+    def add_list(self, todo_list):
+        """Ajoute une liste à l'utilisateur"""
+        if todo_list.id not in self.todo_lists:
+            counter = self._list_counter()
+            self.todo_lists[todo_list.id] = todo_list
+            counter.change(1)
+    
+    def remove_list(self, list_id):
+        """Retire une liste de l'utilisateur"""
+        if list_id in self.todo_lists:
+            counter = self._list_counter()
+            del self.todo_lists[list_id]
+            counter.change(-1)
     
     def to_dict(self, include_lists=False):
         """Convertit l'utilisateur en dictionnaire pour la sérialisation JSON"""
@@ -23,7 +54,7 @@ class User(persistent.Persistent):
             'email': self.email,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
-            'list_count': len(self.todo_lists)
+            'list_count': self.list_count
         }
         
         if include_lists:
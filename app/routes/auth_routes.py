@@ -0,0 +1,93 @@
+import datetime
+from flask import Blueprint, g, request, jsonify
+from transaction.interfaces import TransientError
+from app.auth import HasherBusy, authenticated, bearer_token, close_session, open_session, password_hasher
+from app.database import get_db
+from app.indexes import valid_identifier
+from app.utils.transactions import retry_on_conflict
+
+# Créer un Blueprint pour l'authentification
+auth_bp = Blueprint('auth', __name__)
+
+@auth_bp.route('/login', methods=['POST'])
+@retry_on_conflict
+def login():
+    """Ouvrir une session avec un nom d'utilisateur (ou un email) et un mot de passe.
+
+    La vérification bcrypt passe par le pool borné du processus (503 s'il est
+    saturé) ; les requêtes suivantes présentent le jeton retourné dans
+    `Authorization: Bearer`.
+    """
+    data = request.get_json(silent=True)
+    db = get_db()
+
+    if (not isinstance(data, dict) or not data.get('password') or not isinstance(data['password'], str)
+            or not (data.get('username') or data.get('email'))):
+        return jsonify({'error': 'Données insuffisantes'}), 400
+    identifier = data.get('username') or data.get('email')
+    if not valid_identifier(identifier):
+        return jsonify({'error': 'Données insuffisantes'}), 400
+
+    root = db.root
+    if data.get('username'):
+        user_id = root.user_index.find_by_username(data['username'])
+    else:
+        user_id = root.user_index.find_by_email(data['email'])
+    user = root.users.get(user_id) if user_id is not None else None
+
+    hasher = password_hasher()
+    password_hash = user.password_hash if user is not None else None
+    # Une requête rejouée après un conflit ne refait pas le calcul bcrypt
+    if g.get('verified_login') != (user_id, password_hash):
+        # Utilisateur inconnu : même coût qu'un mauvais mot de passe
+        if not hasher.verify(data['password'], password_hash):
+            return jsonify({'error': 'Identifiants invalides'}), 401
+        g.verified_login = (user_id, password_hash)
+
+    new_hash = None
+    if hasher.needs_rehash(password_hash):
+        # Mot de passe en clair ou coût bcrypt modifié depuis : remplacé une fois pour toutes
+        try:
+            new_hash = hasher.hash(data['password'])
+        except HasherBusy:
+            # Pool saturé : la connexion aboutit, le hash sera remplacé à la prochaine
+            pass
+
+    try:
+        if new_hash is not None:
+            user.password_hash = new_hash
+        token, expires = open_session(root, user.id)
+        db.commit()
+        return jsonify({
+            'token': token,
+            'expires_at': datetime.datetime.fromtimestamp(expires, datetime.timezone.utc).isoformat(),
+            'user': user.to_dict(),
+        })
+    except TransientError:
+        # Laisser retry_on_conflict rejouer la requête
+        raise
+    except Exception as e:
+        db.abort()
+        return jsonify({'error': f'Erreur lors de la connexion : {str(e)}'}), 500
+
+@auth_bp.route('/logout', methods=['POST'])
+@retry_on_conflict
+@authenticated
+def logout():
+    """Fermer la session du jeton présenté"""
+    db = get_db()
+    close_session(db.root, bearer_token())
+    db.commit()
+    return jsonify({'message': 'Session fermée'})
+
+@auth_bp.route('/me', methods=['GET'])
+@authenticated
+def me():
+    """Utilisateur de la session (vérifiée sans calcul bcrypt)"""
+    db = get_db()
+    user = db.root.users.get(g.user_id)
+
+    if not user:
+        return jsonify({'error': 'Utilisateur non trouvé'}), 404
+
+    return jsonify(user.to_dict())
@@ -0,0 +1,43 @@
+import io
+from flask import Blueprint, current_app, request, jsonify
+from transaction.interfaces import TransientError
+from app.auth import HasherBusy, password_hasher
+from app.database import get_db
+from app.services import ServiceError
+from app.services.transfer import Importer, import_lines
+
+# Créer un Blueprint pour l'import en masse
+import_bp = Blueprint('import', __name__)
+
+@import_bp.route('', methods=['POST'])
+def import_data():
+    """Importer un flux NDJSON (format de GET /api/users/<id>/export), validé par lots.
+
+    Avec `?user_id=`, les listes et tâches sont ajoutées à cet utilisateur
+    existant. Les lots validés avant une erreur restent importés : la réponse
+    d'erreur indique ce qui l'a été.
+    """
+    db = get_db()
+    user_id = request.args.get('user_id') or None
+
+    if user_id is not None and user_id not in db.root.users:
+        return jsonify({'error': 'Utilisateur non trouvé'}), 404
+
+    importer = Importer(db.root, user_id, hash_password=password_hasher().hash)
+    try:
+        # Le corps est lu ligne à ligne au fil de sa réception (lectures tamponnées)
+        import_lines(importer, io.BufferedReader(request.stream),
+                     batch_size=current_app.config.get('IMPORT_BATCH_SIZE', 10000),
+                     savepoint_size=current_app.config.get('IMPORT_SAVEPOINT_SIZE', 5000),
+                     attempts=max(1, current_app.config.get('TX_RETRY_ATTEMPTS', 3)))
+    except ServiceError as e:
+        return jsonify({'error': e.message, 'imported': importer.counts, 'user_ids': importer.user_ids}), e.status
+    except TransientError:
+        return jsonify({'error': 'Conflit d\'écriture, veuillez réessayer',
+                        'imported': importer.counts, 'user_ids': importer.user_ids}), 409
+    except HasherBusy:
+        # Pool bcrypt saturé par des connexions : les lots déjà validés restent importés
+        return jsonify({'error': 'Trop de connexions simultanées, veuillez réessayer',
+                        'imported': importer.counts, 'user_ids': importer.user_ids}), 503, {'Retry-After': '1'}
+
+    return jsonify({'imported': importer.counts, 'user_ids': importer.user_ids}), 201
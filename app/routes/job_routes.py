@@ -0,0 +1,63 @@
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from app.database import get_db
+from app.jobs import enqueue
+from app.models.job import Job
+from app.utils.transactions import retry_on_conflict
+
+# Créer un Blueprint pour le suivi des tâches de fond
+job_bp = Blueprint('job', __name__)
+
+# Tâches lancées par POST /api/jobs (toutes portent sur un utilisateur)
+USER_JOBS = ('export_user', 'delete_user')
+
+@job_bp.route('', methods=['POST'])
+@retry_on_conflict
+def create_job():
+    """Lancer une tâche de fond ; la réponse 202 indique où suivre son avancement"""
+    data = request.get_json()
+    db = get_db()
+    
+    if not data or data.get('kind') not in USER_JOBS or 'user_id' not in data:
+        return jsonify({'error': f'Données insuffisantes (kind parmi {", ".join(USER_JOBS)}, user_id)'}), 400
+    
+    if data['user_id'] not in db.root.users:
+        return jsonify({'error': 'Utilisateur non trouvé'}), 404
+    
+    job = enqueue(db.root, data['kind'], user_id=data['user_id'])
+    db.commit()
+    
+    return jsonify(job.to_dict()), 202, {'Location': f'/api/jobs/{job.id}'}
+
+@job_bp.route('/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """État et avancement d'une tâche de fond"""
+    db = get_db()
+    job = db.root.jobs.get(job_id)
+    
+    if job is None:
+        return jsonify({'error': 'Tâche de fond non trouvée'}), 404
+    
+    return jsonify(job.to_dict())
+
+@job_bp.route('/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Résultat d'une tâche de fond terminée, streamé morceau par morceau"""
+    db = get_db()
+    job = db.root.jobs.get(job_id)
+    
+    if job is None:
+        return jsonify({'error': 'Tâche de fond non trouvée'}), 404
+    
+    if job.status != Job.SUCCEEDED or job.result is None:
+        return jsonify({'error': 'Aucun résultat disponible', 'status': job.status}), 409
+    
+    result = job.result
+
+    def generate():
+        connection = db.connection
+        for data in result.iter_chunks():
+            yield data
+            # Morceau envoyé : redescendre le cache de la connexion à sa taille cible
+            connection.cacheGC()
+
+    return Response(stream_with_context(generate()), mimetype=result.mimetype)
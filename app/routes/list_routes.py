@@ -1,11 +1,18 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from app.database import get_db
 from app.models.list import TodoList
+from app.services import cascade
+from app.services.todos import todo_stats
+from app.utils.cache import cached_response
+from app.utils.pagination import paginated_response
+from app.utils.transactions import retry_on_conflict
+import BTrees.OOBTree
 
 # Créer un Blueprint pour les routes de listes
 list_bp = Blueprint('list', __name__)
 
 @list_bp.route('', methods=['GET'])
+@cached_response
 def get_lists():
     """Récupérer toutes les listes, avec filtrage optionnel par utilisateur"""
     db = get_db()
@@ -13,16 +20,35 @@ def get_lists():
     user_id = request.args.get('user_id')
     
     if user_id:
-        # Filtrer les listes par utilisateur
-        lists = [todo_list.to_dict() for todo_list in db.root.todo_lists.values() 
-                if todo_list.user_id == user_id]
+        # Les listes de l'utilisateur sont déjà rangées dans User.todo_lists
+        user = db.root.users.get(user_id)
+        lists = user.todo_lists if user is not None else BTrees.OOBTree.BTree()
     else:
         # Toutes les listes
-        lists = [todo_list.to_dict() for todo_list in db.root.todo_lists.values()]
+        lists = db.root.todo_lists
     
-    return jsonify(lists)
+    return paginated_response(lists, lists.__getitem__, lambda todo_list: todo_list.to_dict())
+
+@list_bp.route('/search', methods=['GET'])
+@cached_response
+def search_lists():
+    """Rechercher les listes d'un utilisateur dont le titre ou la description contient les mots (ou débuts de mots) de q"""
+    db = get_db()
+    
+    user_id = request.args.get('user_id')
+    query = request.args.get('q', '')
+    
+    if not user_id or not query.strip():
+        return jsonify({'error': 'Paramètres user_id et q requis'}), 400
+    
+    list_ids = db.root.list_text_index.search(user_id, query)
+    if list_ids is None:
+        list_ids = BTrees.OOBTree.TreeSet()
+    
+    return paginated_response(list_ids, db.root.todo_lists.__getitem__, lambda todo_list: todo_list.to_dict())
 
 @list_bp.route('/<list_id>', methods=['GET'])
+@cached_response
 def get_list(list_id):
     """Récupérer une liste par son ID"""
     db = get_db()
@@ -34,7 +60,24 @@ def get_list(list_id):
     
     return jsonify(db.root.todo_lists[list_id].to_dict(include_todos=include_todos))
 
+@list_bp.route('/<list_id>/stats', methods=['GET'])
+def get_list_stats(list_id):
+    """Nombre de tâches d'une liste (total, terminées, ouvertes, par priorité, en retard)
+
+    Pas de cache de réponse : le nombre de tâches en retard change avec l'heure.
+    """
+    db = get_db()
+    root = db.root
+    todo_list = root.todo_lists.get(list_id)
+
+    if todo_list is None:
+        return jsonify({'error': 'Liste non trouvée'}), 404
+
+    return jsonify(todo_stats(root, todo_list.user_id, list_id,
+                              overdue_limit=current_app.config.get('STATS_OVERDUE_LIMIT', 1000)))
+
 @list_bp.route('', methods=['POST'])
+@retry_on_conflict
 def create_list():
     """Créer une nouvelle liste de tâches"""
     data = request.get_json()
@@ -56,14 +99,16 @@ def create_list():
     
     # Ajouter la liste à la collection de l'utilisateur
     user = db.root.users[data['user_id']]
-    user.todo_lists[new_list.id] = new_list
-    user._p_changed = True
+    user.add_list(new_list)
+    db.root.list_text_index.index(new_list)
+    db.root.change_log.record(new_list.user_id, 'list', new_list.id)
     
     db.commit()
     
     return jsonify(new_list.to_dict()), 201
 
 @list_bp.route('/<list_id>', methods=['PUT'])
+@retry_on_conflict
 def update_list(list_id):
     """Mettre à jour une liste de tâches"""
     db = get_db()
@@ -75,11 +120,14 @@ def update_list(list_id):
     data = request.get_json()
     
     todo_list.update(data)
+    db.root.list_text_index.index(todo_list)
+    db.root.change_log.record(todo_list.user_id, 'list', todo_list.id)
     db.commit()
     
     return jsonify(todo_list.to_dict())
 
 @list_bp.route('/<list_id>', methods=['DELETE'])
+@retry_on_conflict
 def delete_list(list_id):
     """Supprimer une liste de tâches"""
     db = get_db()
@@ -88,25 +136,10 @@ def delete_list(list_id):
         return jsonify({'error': 'Liste non trouvée'}), 404
     
     todo_list = db.root.todo_lists[list_id]
-    user_id = todo_list.user_id
-    
-    # Supprimer la liste de la base de données principale
-    del db.root.todo_lists[list_id]
-    
-    # Supprimer la liste de la collection de l'utilisateur
-    if user_id in db.root.users:
-        if list_id in db.root.users[user_id].todo_lists:
-            del db.root.users[user_id].todo_lists[list_id]
-            db.root.users[user_id]._p_changed = True
-    
-    # Supprimer tous les todos appartenant à cette liste
-    todos_to_delete = []
-    for todo_id, todo in db.root.todos.items():
-        if todo.list_id == list_id:
-            todos_to_delete.append(todo_id)
     
-    for todo_id in todos_to_delete:
-        del db.root.todos[todo_id]
+    # Supprimer la liste, ses tâches et sa référence chez l'utilisateur
+    cascade.delete_todo_list(db.root, todo_list,
+                             batch_size=current_app.config.get('CASCADE_BATCH_SIZE', 500))
     
     db.commit()
     
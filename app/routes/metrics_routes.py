@@ -0,0 +1,11 @@
+from flask import Blueprint, Response, current_app
+from app.database import get_db
+from app.metrics import render_metrics
+
+# Créer un Blueprint pour l'exposition des mesures
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('', methods=['GET'])
+def get_metrics():
+    """Mesures de l'application au format texte de Prometheus"""
+    return Response(render_metrics(get_db(), current_app.extensions.get('auth')), mimetype='text/plain; version=0.0.4')
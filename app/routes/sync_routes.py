@@ -0,0 +1,104 @@
+from flask import Blueprint, current_app, request, jsonify
+from app.database import get_db
+from app.utils.pagination import PaginationError, decode_cursor, encode_cursor
+
+# Créer un Blueprint pour la synchronisation incrémentale des clients
+sync_bp = Blueprint('sync', __name__)
+
+# Type d'entrée du journal -> (collection de la racine, clé de la réponse)
+COLLECTIONS = {'user': ('users', 'users'), 'list': ('todo_lists', 'lists'), 'todo': ('todos', 'todos')}
+
+def _decode_token(token):
+    """(génération, user_id, position) d'un jeton de synchronisation"""
+    value = decode_cursor(token)
+    if (not isinstance(value, tuple) or len(value) != 3
+            or not isinstance(value[2], int) or isinstance(value[2], bool)):
+        raise PaginationError('Jeton de synchronisation invalide')
+    return value
+
+def _snapshot(root, user, position):
+    """État complet d'un utilisateur : point de départ d'un nouveau client"""
+    lists = list(user.todo_lists.values())
+    return {
+        'reset': True,
+        'has_more': False,
+        'token': encode_cursor([root.change_log.generation, user.id, position]),
+        'users': [user.to_dict()],
+        'lists': [todo_list.to_dict() for todo_list in lists],
+        'todos': [todo.to_dict() for todo_list in lists for todo in todo_list.todos.values()],
+        'deleted': [],
+    }
+
+@sync_bp.route('', methods=['GET'])
+def sync():
+    """Modifications d'un utilisateur depuis le jeton `since`, avec le jeton suivant.
+
+    Sans jeton, ou avec un jeton compacté ou d'un ancien journal, la réponse
+    est l'état complet (`reset: true`). La suppression d'une liste entraîne
+    celle de ses tâches, qui n'ont pas d'entrée propre. Le jeton de la
+    dernière page recule de ChangeLog.commit_lag_seconds : les modifications
+    les plus récentes peuvent être renvoyées une seconde fois.
+
+    Pas de cache de réponse : le jeton retourné dépend de l'heure.
+    """
+    db = get_db()
+    root = db.root
+
+    user_id = request.args.get('user_id') or None
+    since = request.args.get('since')
+    limit = request.args.get('limit')
+
+    try:
+        generation = position = None
+        if since:
+            generation, token_user_id, position = _decode_token(since)
+            if user_id is not None and user_id != token_user_id:
+                raise PaginationError('Jeton de synchronisation d\'un autre utilisateur')
+            user_id = token_user_id
+        if limit is not None:
+            limit = int(limit)
+            if limit < 1:
+                raise ValueError(limit)
+            limit = min(limit, current_app.config.get('PAGE_SIZE_MAX', 1000))
+        else:
+            limit = current_app.config.get('PAGE_SIZE_DEFAULT', 100)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    except ValueError:
+        return jsonify({'error': 'Paramètre limit invalide'}), 400
+
+    if user_id is None:
+        return jsonify({'error': 'Paramètre user_id ou since requis'}), 400
+
+    user = root.users.get(user_id)
+    changes = root.change_log.for_user(user_id)
+    settled = root.change_log.settled_position()
+
+    if (position is None or generation != root.change_log.generation
+            or (changes is not None and position < changes.horizon)):
+        if user is None:
+            return jsonify({'error': 'Utilisateur non trouvé'}), 404
+        return jsonify(_snapshot(root, user, settled))
+
+    result = {'reset': False, 'has_more': False, 'users': [], 'lists': [], 'todos': [], 'deleted': []}
+    last = position
+    entries = changes.changes_after(position) if changes is not None else ()
+    for count, (position, (kind, object_id, deleted, _)) in enumerate(entries):
+        if count == limit:
+            result['has_more'] = True
+            break
+        collection, section = COLLECTIONS[kind]
+        obj = None if deleted else getattr(root, collection).get(object_id)
+        if obj is None:
+            # Supprimé depuis (par exemple avec sa liste) : équivaut à une suppression
+            result['deleted'].append({'type': kind, 'id': object_id})
+        else:
+            result[section].append(obj.to_dict())
+        last = position
+    else:
+        # Une entrée pas encore validée peut précéder la dernière renvoyée : repartir
+        # de la position avant laquelle tout est validé (et déjà renvoyé)
+        last = settled
+
+    result['token'] = encode_cursor([root.change_log.generation, user_id, last])
+    return jsonify(result)
@@ -1,39 +1,113 @@
-from flask import Blueprint, request, jsonify
-from app.database import get_db
-from app.models.todo import Todo
 import datetime
+from flask import Blueprint, current_app, request, jsonify
+from app.database import get_db
+from app.indexes import priority_key
+from app.services import ServiceError, todos
+from app.utils.cache import cached_response
+from app.utils.pagination import paginated_response
+from app.utils.transactions import retry_on_conflict
+import BTrees.OOBTree
 
 # Créer un Blueprint pour les routes de todos
 todo_bp = Blueprint('todo', __name__)
 
+def _datetime_arg(name):
+    """Paramètre de requête ISO 8601, ou None s'il est absent"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    return datetime.datetime.fromisoformat(value)
+
 @todo_bp.route('', methods=['GET'])
+@cached_response
 def get_todos():
     """Récupérer toutes les tâches, avec filtrage optionnel"""
     db = get_db()
     
+    user_id = request.args.get('user_id') or None
+    list_id = request.args.get('list_id') or None
+    completed = request.args.get('completed')
+    sort = request.args.get('sort')
+    
+    if completed is not None:
+        completed = completed.lower() == 'true'
+    
+    try:
+        due_after = _datetime_arg('due_after')
+        due_before = _datetime_arg('due_before')
+    except ValueError:
+        return jsonify({'error': 'Format de date invalide, utilisez ISO 8601'}), 400
+    
+    priority_min = request.args.get('priority_min')
+    if priority_min is not None:
+        try:
+            priority_min = int(priority_min)
+        except ValueError:
+            return jsonify({'error': 'Paramètre priority_min invalide'}), 400
+    
+    if sort not in (None, 'due_date'):
+        return jsonify({'error': 'Tri non supporté (sort=due_date)'}), 400
+    
+    # Échéances et priorités : parcours par plage des index triés de l'utilisateur
+    if due_after or due_before or priority_min is not None or sort:
+        if user_id is None:
+            return jsonify({'error': 'Paramètre user_id requis pour ces filtres'}), 400
+        
+        predicate = None
+        if due_after or due_before or sort:
+            keys = db.root.todo_index.due_range(user_id, due_after, due_before, list_id, completed)
+            if priority_min is not None:
+                predicate = lambda todo: (priority_key(todo.priority) is not None
+                                          and todo.priority >= priority_min)
+        else:
+            keys = db.root.todo_index.priority_range(user_id, priority_min, list_id, completed)
+        
+        return paginated_response(keys, lambda key: db.root.todos[key[-1]],
+                                  lambda todo: todo.to_dict(), predicate)
+    
+    # Les index secondaires donnent directement les tâches correspondantes
+    todo_ids = db.root.todo_index.query(user_id=user_id, list_id=list_id, completed=completed)
+    
+    if todo_ids is not None:
+        return paginated_response(todo_ids, db.root.todos.__getitem__, lambda todo: todo.to_dict())
+    
+    # Aucun filtre indexé : parcours complet
+    predicate = None
+    if completed is not None:
+        predicate = lambda todo: todo.is_completed == completed
+    return paginated_response(db.root.todos, db.root.todos.__getitem__,
+                              lambda todo: todo.to_dict(), predicate)
+
+@todo_bp.route('/search', methods=['GET'])
+@cached_response
+def search_todos():
+    """Rechercher les tâches d'un utilisateur dont le titre ou la description contient les mots (ou débuts de mots) de q"""
+    db = get_db()
+    
     user_id = request.args.get('user_id')
-    list_id = request.args.get('list_id')
+    query = request.args.get('q', '')
+    list_id = request.args.get('list_id') or None
     completed = request.args.get('completed')
     
-    todos = db.root.todos.values()
-    result = []
-    
-    # Appliquer les filtres
-    for todo in todos:
-        if user_id and todo.user_id != user_id:
-            continue
-        if list_id and todo.list_id != list_id:
-            continue
-        if completed is not None:
-            is_completed = completed.lower() == 'true'
-            if todo.is_completed != is_completed:
-                continue
-                
-        result.append(todo.to_dict())
-    
-    return jsonify(result)
+    if not user_id or not query.strip():
+        return jsonify({'error': 'Paramètres user_id et q requis'}), 400
+    
+    if completed is not None:
+        completed = completed.lower() == 'true'
+    
+    todo_ids = db.root.todo_text_index.search(user_id, query)
+    if todo_ids is None:
+        todo_ids = BTrees.OOBTree.TreeSet()
+    
+    # Filtres complémentaires par les index secondaires
+    filtered = db.root.todo_index.query(user_id=user_id, list_id=list_id, completed=completed)
+    if todo_ids and (list_id is not None or completed is not None):
+        todo_ids = BTrees.OOBTree.intersection(todo_ids, filtered)
+    
+    return paginated_response(todo_ids, db.root.todos.__getitem__, lambda todo: todo.to_dict())
 
 @todo_bp.route('/<todo_id>', methods=['GET'])
+@cached_response
 def get_todo(todo_id):
     """Récupérer une tâche par son ID"""
     db = get_db()
@@ -44,143 +118,82 @@ def get_todo(todo_id):
     return jsonify(db.root.todos[todo_id].to_dict())
 
 @todo_bp.route('', methods=['POST'])
+@retry_on_conflict
 def create_todo():
     """Créer une nouvelle tâche"""
     data = request.get_json()
     db = get_db()
     
-    if not data or not all(k in data for k in ('title', 'list_id', 'user_id')):
-        return jsonify({'error': 'Données insuffisantes'}), 400
-    
-    # Vérifier si l'utilisateur existe
-    if data['user_id'] not in db.root.users:
-        return jsonify({'error': 'Utilisateur non trouvé'}), 404
+    try:
+        new_todo = todos.create_todo(db.root, data)
+    except ServiceError as e:
+        return jsonify({'error': e.message}), e.status
     
-    # Vérifier si la liste existe
-    if data['list_id'] not in db.root.todo_lists:
-        return jsonify({'error': 'Liste non trouvée'}), 404
-    
-    # Vérifier que la liste appartient à l'utilisateur
-    todo_list = db.root.todo_lists[data['list_id']]
-    if todo_list.user_id != data['user_id']:
-        return jsonify({'error': 'Cette liste n\'appartient pas à cet utilisateur'}), 403
-    
-    # Traiter la date d'échéance si elle existe
-    due_date = None
-    if 'due_date' in data and data['due_date']:
-        try:
-            due_date = datetime.datetime.fromisoformat(data['due_date'])
-        except (ValueError, TypeError):
-            return jsonify({'error': 'Format de date invalide, utilisez ISO 8601'}), 400
-    
-    description = data.get('description', '')
-    priority = data.get('priority', 1)
+    db.commit()
     
-    new_todo = Todo(
-        data['title'], 
-        description, 
-        data['list_id'], 
-        data['user_id'],
-        due_date=due_date,
-        priority=priority
-    )
+    return jsonify(new_todo.to_dict()), 201
+
+@todo_bp.route('/batch', methods=['POST'])
+@retry_on_conflict
+def batch_todos():
+    """Créer, modifier, compléter ou supprimer plusieurs tâches en une transaction"""
+    data = request.get_json()
+    db = get_db()
     
-    # Stocker la tâche dans ZODB
-    db.root.todos[new_todo.id] = new_todo
+    operations = data.get('operations') if isinstance(data, dict) else None
+    try:
+        todos.validate_batch(operations, current_app.config.get('BATCH_MAX_OPERATIONS', 1000))
+    except ServiceError as e:
+        return jsonify({'error': e.message}), e.status
     
-    # Ajouter la tâche à la liste
-    todo_list.todos[new_todo.id] = new_todo
-    todo_list._p_changed = True
+    results = todos.apply_batch(db.root, operations)
     
+    # Un seul commit (et donc une seule écriture sur disque) pour tout le lot
     db.commit()
     
-    return jsonify(new_todo.to_dict()), 201
+    return jsonify({'results': results})
 
 @todo_bp.route('/<todo_id>', methods=['PUT'])
+@retry_on_conflict
 def update_todo(todo_id):
     """Mettre à jour une tâche"""
     db = get_db()
     
-    if todo_id not in db.root.todos:
-        return jsonify({'error': 'Tâche non trouvée'}), 404
-    
-    todo = db.root.todos[todo_id]
-    data = request.get_json()
-    
-    # Si on change la liste, vérifions que la nouvelle liste existe et appartient à l'utilisateur
-    if 'list_id' in data and data['list_id'] != todo.list_id:
-        # La nouvelle liste doit exister
-        if data['list_id'] not in db.root.todo_lists:
-            return jsonify({'error': 'Nouvelle liste non trouvée'}), 404
-            
-        # La nouvelle liste doit appartenir au même utilisateur
-        new_list = db.root.todo_lists[data['list_id']]
-        if new_list.user_id != todo.user_id:
-            return jsonify({'error': 'Cette liste n\'appartient pas à cet utilisateur'}), 403
-            
-        # Supprimer la tâche de l'ancienne liste
-        old_list = db.root.todo_lists[todo.list_id]
-        if todo_id in old_list.todos:
-            del old_list.todos[todo_id]
-            old_list._p_changed = True
-            
-        # Ajouter la tâche à la nouvelle liste
-        new_list.todos[todo_id] = todo
-        new_list._p_changed = True
-        
-        # Mettre à jour l'ID de liste dans la tâche
-        todo.list_id = data['list_id']
+    try:
+        todo = todos.update_todo(db.root, todo_id, request.get_json())
+    except ServiceError as e:
+        return jsonify({'error': e.message}), e.status
     
-    todo.update(data)
     db.commit()
     
     return jsonify(todo.to_dict())
 
 @todo_bp.route('/<todo_id>', methods=['DELETE'])
+@retry_on_conflict
 def delete_todo(todo_id):
     """Supprimer une tâche"""
     db = get_db()
     
-    if todo_id not in db.root.todos:
-        return jsonify({'error': 'Tâche non trouvée'}), 404
-    
-    todo = db.root.todos[todo_id]
-    
-    # Supprimer la tâche de la base de données principale
-    del db.root.todos[todo_id]
-    
-    # Supprimer la tâche de sa liste
-    if todo.list_id in db.root.todo_lists:
-        if todo_id in db.root.todo_lists[todo.list_id].todos:
-            del db.root.todo_lists[todo.list_id].todos[todo_id]
-            db.root.todo_lists[todo.list_id]._p_changed = True
+    try:
+        todos.delete_todo(db.root, todo_id)
+    except ServiceError as e:
+        return jsonify({'error': e.message}), e.status
     
     db.commit()
     
     return jsonify({'message': 'Tâche supprimée'})
 
 @todo_bp.route('/<todo_id>/complete', methods=['PUT'])
+@retry_on_conflict
 def toggle_todo_complete(todo_id):
     """Marquer une tâche comme complétée ou non"""
     db = get_db()
     
-    if todo_id not in db.root.todos:
-        return jsonify({'error': 'Tâche non trouvée'}), 404
-    
-    todo = db.root.todos[todo_id]
-    
-    # Inverser l'état de complétion
-    todo.is_completed = not todo.is_completed
-    
-    # Mettre à jour la date de complétion
-    if todo.is_completed:
-        todo.completed_at = datetime.datetime.now()
-    else:
-        todo.completed_at = None
-    
-    todo.updated_at = datetime.datetime.now()
-    todo._p_changed = True
+    try:
+        todo = todos.toggle_todo_complete(db.root, todo_id)
+    except ServiceError as e:
+        return jsonify({'error': e.message}), e.status
     
     db.commit()
     
-    return jsonify(todo.to_dict())
\ No newline at end of file
+    return jsonify(todo.to_dict())
@@ -1,18 +1,50 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, g, request, jsonify, stream_with_context
+from transaction.interfaces import TransientError
+from app.auth import close_user_sessions, password_hasher
 from app.database import get_db
+from app.indexes import valid_identifier
+from app.jobs import enqueue
 from app.models.user import User
+from app.services import cascade
+from app.services.todos import todo_stats
+from app.services.transfer import export_records
+from app.utils.cache import cached_response
+from app.utils.pagination import STREAM_GC_INTERVAL, paginated_response
+from app.utils.transactions import retry_on_conflict
 
 # Créer un Blueprint pour les routes utilisateur
 user_bp = Blueprint('user', __name__)
 
 @user_bp.route('', methods=['GET'])
+@cached_response
 def get_users():
-    """Récupérer tous les utilisateurs"""
+    """Récupérer tous les utilisateurs, avec recherche optionnelle par nom ou email"""
     db = get_db()
-    users_list = [user.to_dict() for user in db.root.users.values()]
-    return jsonify(users_list)
+    
+    username = request.args.get('username')
+    email = request.args.get('email')
+    
+    if (username is not None and not valid_identifier(username)) or (
+            email is not None and not valid_identifier(email)):
+        return jsonify({'error': 'Critère de recherche invalide'}), 400
+
+    if username is not None or email is not None:
+        # Recherche exacte via les index uniques
+        user_ids = set()
+        if username is not None:
+            user_ids.add(db.root.user_index.find_by_username(username))
+        if email is not None:
+            user_ids.add(db.root.user_index.find_by_email(email))
+        # Les deux critères doivent désigner le même utilisateur
+        if len(user_ids) != 1 or None in user_ids:
+            return jsonify([])
+        return jsonify([db.root.users[user_ids.pop()].to_dict()])
+    
+    users = db.root.users
+    return paginated_response(users, users.__getitem__, lambda user: user.to_dict())
 
 @user_bp.route('/<user_id>', methods=['GET'])
+@cached_response
 def get_user(user_id):
     """Récupérer un utilisateur par son ID"""
     db = get_db()
@@ -26,7 +58,49 @@ def get_user(user_id):
 
     return jsonify(user.to_dict(include_lists=include_lists))
 
+@user_bp.route('/<user_id>/stats', methods=['GET'])
+def get_user_stats(user_id):
+    """Nombre de tâches d'un utilisateur (total, terminées, ouvertes, par priorité, en retard)
+
+    Pas de cache de réponse : le nombre de tâches en retard change avec l'heure.
+    """
+    db = get_db()
+    root = db.root
+    user = root.users.get(user_id)
+
+    if not user:
+        return jsonify({'error': 'Utilisateur non trouvé'}), 404
+
+    overdue_limit = current_app.config.get('STATS_OVERDUE_LIMIT', 1000)
+    stats = todo_stats(root, user_id, overdue_limit=overdue_limit)
+    # Détermine si on doit inclure le détail par liste
+    if request.args.get('include_lists', 'false').lower() == 'true':
+        stats['lists'] = {list_id: todo_stats(root, user_id, list_id, overdue_limit)
+                          for list_id in user.todo_lists.keys()}
+    return jsonify(stats)
+
+@user_bp.route('/<user_id>/export', methods=['GET'])
+def export_user(user_id):
+    """Exporter un utilisateur, ses listes et ses tâches en NDJSON (un objet par ligne, streamé)"""
+    db = get_db()
+    user = db.root.users.get(user_id)
+
+    if not user:
+        return jsonify({'error': 'Utilisateur non trouvé'}), 404
+
+    def generate():
+        connection = db.connection
+        for index, record in enumerate(export_records(user), 1):
+            yield current_app.json.dumps(record) + '\n'
+            if index % STREAM_GC_INTERVAL == 0:
+                # Redescendre le cache de la connexion à sa taille cible
+                connection.cacheGC()
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': f'attachment; filename=user-{user_id}.ndjson'})
+
 @user_bp.route('', methods=['POST'])
+@retry_on_conflict
 def create_user():
     """Créer un nouvel utilisateur"""
     data = request.get_json()
@@ -34,29 +108,42 @@ def create_user():
 
     if not data or not all(k in data for k in ('username', 'email', 'password')):
         return jsonify({'error': 'Données insuffisantes'}), 400
+    if not valid_identifier(data['username']):
+        return jsonify({'error': 'Nom d\'utilisateur invalide'}), 400
+    if not valid_identifier(data['email']):
+        return jsonify({'error': 'Email invalide'}), 400
 
     # Vérifier si l'utilisateur existe déjà
-    for user in db.root.users.values():
-        if user.username == data['username']:
-            return jsonify({'error': 'Nom d\'utilisateur déjà utilisé'}), 409
-        if user.email == data['email']:
-            return jsonify({'error': 'Email déjà utilisé'}), 409
+    if db.root.user_index.username_taken(data['username']):
+        return jsonify({'error': 'Nom d\'utilisateur déjà utilisé'}), 409
+    if db.root.user_index.email_taken(data['email']):
+        return jsonify({'error': 'Email déjà utilisé'}), 409
+
+    if not isinstance(data['password'], str) or not data['password']:
+        return jsonify({'error': 'Mot de passe invalide'}), 400
 
-    # Ici, vous devriez hacher le mot de passe avant de le stocker
-    # password_hash = generate_password_hash(data['password'])
-    password_hash = data['password']  # Ne pas faire ça en production!
+    # Hash bcrypt calculé par le pool borné du processus (503 s'il est saturé),
+    # une seule fois même si la requête est rejouée après un conflit
+    if 'password_hash' not in g:
+        g.password_hash = password_hasher().hash(data['password'])
 
-    new_user = User(data['username'], data['email'], password_hash)
+    new_user = User(data['username'], data['email'], g.password_hash)
 
     try:
         db.root.users[new_user.id] = new_user
+        db.root.user_index.index(new_user)
+        db.root.change_log.record(new_user.id, 'user', new_user.id)
         db.commit()
         return jsonify(new_user.to_dict()), 201
+    except TransientError:
+        # Laisser retry_on_conflict rejouer la requête
+        raise
     except Exception as e:
-        db.rollback()
+        db.abort()
         return jsonify({'error': f'Erreur lors de la création : {str(e)}'}), 500
 
 @user_bp.route('/<user_id>', methods=['PUT'])
+@retry_on_conflict
 def update_user(user_id):
     """Mettre à jour un utilisateur"""
     db = get_db()
@@ -66,25 +153,46 @@ def update_user(user_id):
         return jsonify({'error': 'Utilisateur non trouvé'}), 404
 
     data = request.get_json()
-    
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Données insuffisantes'}), 400
+    if 'username' in data and not valid_identifier(data['username']):
+        return jsonify({'error': 'Nom d\'utilisateur invalide'}), 400
+    if 'email' in data and not valid_identifier(data['email']):
+        return jsonify({'error': 'Email invalide'}), 400
+
     # Vérifier si le nom d'utilisateur ou l'email est déjà utilisé
-    if 'username' in data or 'email' in data:
-        for u in db.root.users.values():
-            if u.id != user_id:
-                if 'username' in data and u.username == data['username']:
-                    return jsonify({'error': 'Nom d\'utilisateur déjà utilisé'}), 409
-                if 'email' in data and u.email == data['email']:
-                    return jsonify({'error': 'Email déjà utilisé'}), 409
+    if 'username' in data and db.root.user_index.username_taken(data['username'], user_id):
+        return jsonify({'error': 'Nom d\'utilisateur déjà utilisé'}), 409
+    if 'email' in data and db.root.user_index.email_taken(data['email'], user_id):
+        return jsonify({'error': 'Email déjà utilisé'}), 409
+    if 'password' in data and (not isinstance(data['password'], str) or not data['password']):
+        return jsonify({'error': 'Mot de passe invalide'}), 400
+
+    # Une requête rejouée après un conflit ne refait pas le calcul bcrypt
+    if 'password' in data and 'password_hash' not in g:
+        g.password_hash = password_hasher().hash(data['password'])
+    password_hash = g.get('password_hash')
 
     try:
+        old_username, old_email = user.username, user.email
         user.update(data)
+        if password_hash is not None:
+            user.password_hash = password_hash
+            # Les sessions ouvertes avec l'ancien mot de passe sont fermées
+            close_user_sessions(db.root, user.id)
+        db.root.user_index.reindex(user, old_username, old_email)
+        db.root.change_log.record(user.id, 'user', user.id)
         db.commit()
         return jsonify(user.to_dict())
+    except TransientError:
+        # Laisser retry_on_conflict rejouer la requête
+        raise
     except Exception as e:
-        db.rollback()
+        db.abort()
         return jsonify({'error': f'Erreur lors de la mise à jour : {str(e)}'}), 500
 
 @user_bp.route('/<user_id>', methods=['DELETE'])
+@retry_on_conflict
 def delete_user(user_id):
     """Supprimer un utilisateur"""
     db = get_db()
@@ -92,21 +200,23 @@ def delete_user(user_id):
     if user_id not in db.root.users:
         return jsonify({'error': 'Utilisateur non trouvé'}), 404
     
+    if request.args.get('async', 'false').lower() == 'true':
+        # Suppression en tâche de fond, par lots validés un à un
+        job = enqueue(db.root, 'delete_user', user_id=user_id)
+        db.commit()
+        return jsonify(job.to_dict()), 202, {'Location': f'/api/jobs/{job.id}'}
+    
     try:
-        # Supprimer l'utilisateur
-        del db.root.users[user_id]
-
-        # Supprimer également ses listes et todos
-        lists_to_delete = [list_id for list_id, todo_list in db.root.todo_lists.items() if todo_list.user_id == user_id]
-        for list_id in lists_to_delete:
-            del db.root.todo_lists[list_id]
-
-        todos_to_delete = [todo_id for todo_id, todo in db.root.todos.items() if todo.user_id == user_id]
-        for todo_id in todos_to_delete:
-            del db.root.todos[todo_id]
+        # Supprimer l'utilisateur, ses listes et leurs tâches
+        cascade.delete_user(db.root, db.root.users[user_id],
+                            batch_size=current_app.config.get('CASCADE_BATCH_SIZE', 500))
+        close_user_sessions(db.root, user_id)
 
         db.commit()
         return jsonify({'message': 'Utilisateur et ses données supprimés'})
+    except TransientError:
+        # Laisser retry_on_conflict rejouer la requête
+        raise
     except Exception as e:
-        db.rollback()
+        db.abort()
         return jsonify({'error': f'Erreur lors de la suppression : {str(e)}'}), 500
@@ -0,0 +1,57 @@
+from app.storage import parse_storage_uri
+
+# Stockages partageables entre processus (FileStorage pose un verrou exclusif)
+SHARED_STORAGES = ('zeo', 'zconfig')
+
+def check_workers(storage_uri, workers):
+    """Refuse plusieurs processus sur un stockage qui ne peut pas être partagé"""
+    scheme, _ = parse_storage_uri(storage_uri)
+    if workers > 1 and scheme not in SHARED_STORAGES:
+        raise ValueError(f"{workers} processus nécessitent un stockage partagé "
+                         f"(ZODB_STORAGE=zeo://hôte:port), pas '{storage_uri}'")
+
+def _worker_exit(server, worker):
+    """Fin d'un processus de travail : les requêtes en cours sont terminées, fermer la base"""
+    app = getattr(worker, 'wsgi', None)
+    if app is None:
+        return
+    from app import shutdown_app
+    shutdown_app(app)
+
+def serve(host='127.0.0.1', port=8000, workers=1, threads=4, graceful_timeout=30, config=None):
+    """Sert l'application avec gunicorn : `workers` processus de `threads` threads.
+
+    Chaque processus crée l'application, donc ouvre son stockage et son pool
+    de connexions, après le fork. Sur SIGTERM, un processus cesse d'accepter
+    des connexions, termine ses requêtes (et leurs transactions) pendant au
+    plus `graceful_timeout` secondes, puis ferme ZODB.DB.
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise RuntimeError("Le paquet gunicorn est requis pour --serve")
+
+    from app import create_app
+    from app.config import Config
+    overrides = dict(config or {})
+    # Une connexion du pool par thread de requête
+    overrides.setdefault('ZODB_POOL_SIZE', max(threads, Config.ZODB_POOL_SIZE))
+    if workers > 1:
+        # Un seul compactage à la fois : le confier à `run.py --pack` (cron) ou au serveur ZEO
+        overrides['ZODB_PACK_INTERVAL_HOURS'] = 0
+
+    class TodoApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f'{host}:{port}')
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', threads)
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('graceful_timeout', graceful_timeout)
+            # L'application n'est jamais chargée dans le maître : rien n'est ouvert avant le fork
+            self.cfg.set('preload_app', False)
+            self.cfg.set('worker_exit', _worker_exit)
+
+        def load(self):
+            return create_app(overrides)
+
+    TodoApplication().run()
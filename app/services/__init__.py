@@ -0,0 +1,2 @@
+from .errors import ServiceError
+from .cascade import delete_list_todos, delete_todo_list, delete_user
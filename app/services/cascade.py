@@ -0,0 +1,83 @@
+import transaction
+from itertools import islice
+
+# Nombre d'objets supprimés entre deux points de sauvegarde
+DEFAULT_BATCH_SIZE = 500
+
+def _checkpoint(commit):
+    """Termine un lot : commit intermédiaire ou point de sauvegarde"""
+    if commit:
+        transaction.commit()
+    else:
+        # Le savepoint déverse les changements dans un fichier temporaire,
+        # ce qui permet au cache de la connexion de libérer les objets
+        transaction.savepoint(optimistic=True)
+
+def _take(tree, batch_size):
+    """Premières clés d'un BTree (copiées pour pouvoir le modifier ensuite)"""
+    return list(islice(tree.keys(), batch_size))
+
+def delete_list_todos(root, todo_list, batch_size=DEFAULT_BATCH_SIZE, commit=False, progress=None):
+    """Supprime les tâches d'une liste en parcourant TodoList.todos par lots.
+
+    `progress(lists=, todos=)` est appelé avant chaque fin de lot, dans la même transaction.
+    """
+    deleted = 0
+    while True:
+        todo_ids = _take(todo_list.todos, batch_size)
+        if not todo_ids:
+            return deleted
+        for todo_id in todo_ids:
+            todo = todo_list.todos[todo_id]
+            root.todo_index.unindex(todo)
+            root.todo_stats.unindex(todo)
+            root.todo_text_index.unindex(todo)
+            if todo_id in root.todos:
+                del root.todos[todo_id]
+            todo_list.remove_todo(todo_id)
+        deleted += len(todo_ids)
+        if progress is not None:
+            progress(lists=0, todos=len(todo_ids))
+        _checkpoint(commit)
+
+def delete_todo_list(root, todo_list, batch_size=DEFAULT_BATCH_SIZE, commit=False, progress=None):
+    """Supprime une liste, ses tâches et sa référence chez l'utilisateur"""
+    deleted_todos = delete_list_todos(root, todo_list, batch_size, commit, progress)
+
+    root.list_text_index.unindex(todo_list)
+    root.todo_stats.discard_list(todo_list.id)
+    if todo_list.id in root.todo_lists:
+        del root.todo_lists[todo_list.id]
+
+    user = root.users.get(todo_list.user_id)
+    if user is not None:
+        user.remove_list(todo_list.id)
+    # Une seule entrée pour la liste : ses tâches sont supprimées avec elle
+    root.change_log.record(todo_list.user_id, 'list', todo_list.id, deleted=True)
+
+    if progress is not None:
+        progress(lists=1, todos=0)
+
+    return deleted_todos
+
+def delete_user(root, user, batch_size=DEFAULT_BATCH_SIZE, commit=False, progress=None):
+    """Supprime un utilisateur et, par lots, ses listes et leurs tâches"""
+    deleted_lists = deleted_todos = 0
+    while True:
+        list_ids = _take(user.todo_lists, batch_size)
+        if not list_ids:
+            break
+        for list_id in list_ids:
+            deleted_todos += delete_todo_list(root, user.todo_lists[list_id], batch_size, commit, progress)
+        deleted_lists += len(list_ids)
+        _checkpoint(commit)
+
+    # L'utilisateur est supprimé en dernier : une cascade interrompue peut reprendre
+    root.user_index.unindex(user)
+    root.todo_stats.discard_user(user.id)
+    root.sessions.revoke_user(user.id)
+    if user.id in root.users:
+        del root.users[user.id]
+    root.change_log.record(user.id, 'user', user.id, deleted=True)
+
+    return {'lists': deleted_lists, 'todos': deleted_todos}
@@ -0,0 +1,7 @@
+class ServiceError(Exception):
+    """Erreur métier renvoyée au client avec un code HTTP"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
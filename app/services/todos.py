@@ -0,0 +1,207 @@
+import datetime
+import itertools
+from app.models.todo import Todo
+from app.services.errors import ServiceError
+
+# Les fonctions valident tout avant de modifier la base : une ServiceError
+# ne laisse jamais de modification partielle dans la transaction.
+
+def _parse_due_date(data):
+    """Date d'échéance ISO 8601 de `data`, ou None"""
+    if 'due_date' in data and data['due_date']:
+        if isinstance(data['due_date'], datetime.datetime):
+            return data['due_date']
+        try:
+            return datetime.datetime.fromisoformat(data['due_date'])
+        except (ValueError, TypeError):
+            raise ServiceError('Format de date invalide, utilisez ISO 8601', 400)
+    return None
+
+def get_todo(root, todo_id):
+    """Tâche existante ou ServiceError 404"""
+    todo = root.todos.get(todo_id)
+    if todo is None:
+        raise ServiceError('Tâche non trouvée', 404)
+    return todo
+
+def create_todo(root, data):
+    """Crée une tâche dans une liste de l'utilisateur"""
+    if not data or not all(k in data for k in ('title', 'list_id', 'user_id')):
+        raise ServiceError('Données insuffisantes', 400)
+    
+    # Vérifier si l'utilisateur existe
+    if data['user_id'] not in root.users:
+        raise ServiceError('Utilisateur non trouvé', 404)
+    
+    # Vérifier si la liste existe
+    todo_list = root.todo_lists.get(data['list_id'])
+    if todo_list is None:
+        raise ServiceError('Liste non trouvée', 404)
+    
+    # Vérifier que la liste appartient à l'utilisateur
+    if todo_list.user_id != data['user_id']:
+        raise ServiceError('Cette liste n\'appartient pas à cet utilisateur', 403)
+    
+    due_date = _parse_due_date(data)
+    
+    new_todo = Todo(
+        data['title'],
+        data.get('description', ''),
+        data['list_id'],
+        data['user_id'],
+        due_date=due_date,
+        priority=data.get('priority', 1)
+    )
+    
+    add_todo(root, new_todo, todo_list)
+    
+    return new_todo
+
+def add_todo(root, todo, todo_list):
+    """Stocke une nouvelle tâche dans ZODB, l'ajoute à sa liste et aux index"""
+    root.todos[todo.id] = todo
+    todo_list.add_todo(todo)
+    root.todo_index.index(todo)
+    root.todo_stats.index(todo)
+    root.todo_text_index.index(todo)
+    root.change_log.record(todo.user_id, 'todo', todo.id)
+
+def update_todo(root, todo_id, data):
+    """Met à jour une tâche, en la déplaçant de liste si `list_id` change"""
+    todo = get_todo(root, todo_id)
+    data = data or {}
+    old_state = root.todo_index.state(todo)
+    old_counted = root.todo_stats.state(todo)
+    
+    _parse_due_date(data)
+    
+    new_list = None
+    # Si on change la liste, vérifions que la nouvelle liste existe et appartient à l'utilisateur
+    if 'list_id' in data and data['list_id'] != todo.list_id:
+        new_list = root.todo_lists.get(data['list_id'])
+        if new_list is None:
+            raise ServiceError('Nouvelle liste non trouvée', 404)
+        if new_list.user_id != todo.user_id:
+            raise ServiceError('Cette liste n\'appartient pas à cet utilisateur', 403)
+    
+    if new_list is not None:
+        # Déplacer la tâche de l'ancienne liste vers la nouvelle
+        old_list = root.todo_lists.get(todo.list_id)
+        if old_list is not None:
+            old_list.remove_todo(todo_id)
+        new_list.add_todo(todo)
+        todo.list_id = new_list.id
+    
+    todo.update(data)
+    root.todo_index.reindex(todo, old_state)
+    root.todo_stats.reindex(todo, old_counted)
+    root.todo_text_index.index(todo)
+    root.change_log.record(todo.user_id, 'todo', todo.id)
+    
+    return todo
+
+def toggle_todo_complete(root, todo_id):
+    """Inverse l'état de complétion d'une tâche"""
+    todo = get_todo(root, todo_id)
+    old_state = root.todo_index.state(todo)
+    old_counted = root.todo_stats.state(todo)
+    
+    todo.is_completed = not todo.is_completed
+    
+    # Mettre à jour la date de complétion
+    if todo.is_completed:
+        todo.completed_at = datetime.datetime.now()
+    else:
+        todo.completed_at = None
+    
+    todo.updated_at = datetime.datetime.now()
+    todo._p_changed = True
+    
+    root.todo_index.reindex(todo, old_state)
+    root.todo_stats.reindex(todo, old_counted)
+    root.change_log.record(todo.user_id, 'todo', todo.id)
+    
+    return todo
+
+def delete_todo(root, todo_id):
+    """Supprime une tâche et sa référence dans sa liste"""
+    todo = get_todo(root, todo_id)
+    
+    del root.todos[todo_id]
+    root.todo_index.unindex(todo)
+    root.todo_stats.unindex(todo)
+    root.todo_text_index.unindex(todo)
+    root.change_log.record(todo.user_id, 'todo', todo_id, deleted=True)
+    
+    todo_list = root.todo_lists.get(todo.list_id)
+    if todo_list is not None:
+        todo_list.remove_todo(todo_id)
+    
+    return todo
+
+def todo_stats(root, user_id, list_id=None, overdue_limit=1000):
+    """Nombre de tâches d'un utilisateur, ou d'une de ses listes, et tâches ouvertes en retard.
+
+    Les totaux sont lus dans les compteurs de root.todo_stats, en temps
+    constant et sans charger de tâche. Le retard dépend de l'heure : c'est
+    une requête d'intervalle sur l'index des échéances, dont le coût croît
+    avec le nombre de tâches échues. Le décompte s'arrête donc à
+    `overdue_limit` (`overdue_truncated` vaut alors true) ; la liste complète
+    est GET /api/todos?due_before=...&completed=false.
+    """
+    if list_id is not None:
+        counters = root.todo_stats.for_list(list_id)
+    else:
+        counters = root.todo_stats.for_user(user_id)
+    if counters is not None:
+        stats = counters.to_dict()
+    else:
+        stats = {'total': 0, 'completed': 0, 'open': 0, 'by_priority': {}}
+    overdue = root.todo_index.due_range(user_id, due_before=datetime.datetime.now(), list_id=list_id,
+                                        completed=False)
+    count = sum(1 for _ in itertools.islice(overdue.keys(), overdue_limit + 1))
+    stats['overdue'] = min(count, overdue_limit)
+    stats['overdue_truncated'] = count > overdue_limit
+    return stats
+
+# Opérations acceptées par apply_batch : (fonction, code HTTP de succès)
+BATCH_OPERATIONS = {
+    'create': (lambda root, op: create_todo(root, op.get('data')), 201),
+    'update': (lambda root, op: update_todo(root, op.get('id'), op.get('data')), 200),
+    'complete': (lambda root, op: toggle_todo_complete(root, op.get('id')), 200),
+    'delete': (lambda root, op: delete_todo(root, op.get('id')), 200),
+}
+
+def validate_batch(operations, max_operations):
+    """Vérifie la forme du lot avant d'appliquer quoi que ce soit"""
+    if not isinstance(operations, list) or not operations:
+        raise ServiceError('Liste d\'opérations attendue', 400)
+    if len(operations) > max_operations:
+        raise ServiceError(f'Trop d\'opérations (maximum {max_operations})', 413)
+    for index, op in enumerate(operations):
+        if not isinstance(op, dict) or op.get('op') not in BATCH_OPERATIONS:
+            raise ServiceError(f'Opération {index} invalide', 400)
+        if op['op'] != 'create' and 'id' not in op:
+            raise ServiceError(f'Opération {index} sans id', 400)
+
+def apply_batch(root, operations):
+    """Applique les opérations dans la transaction courante, avec un résultat par opération.
+
+    Chaque opération a la même sémantique que la route unitaire correspondante ;
+    une opération refusée n'empêche pas les suivantes.
+    """
+    results = []
+    for index, op in enumerate(operations):
+        apply, status = BATCH_OPERATIONS[op['op']]
+        try:
+            todo = apply(root, op)
+        except ServiceError as e:
+            results.append({'index': index, 'op': op['op'], 'status': e.status, 'error': e.message})
+            continue
+        result = {'index': index, 'op': op['op'], 'status': status}
+        if op['op'] == 'delete':
+            result['id'] = todo.id
+        else:
+            result['todo'] = todo.to_dict()
+        results.append(result)
+    return results
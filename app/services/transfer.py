@@ -0,0 +1,232 @@
+import datetime
+import json
+import transaction
+from transaction.interfaces import TransientError
+from app.indexes import valid_identifier
+from app.models.list import TodoList
+from app.models.todo import Todo
+from app.models.user import User
+from app.services.errors import ServiceError
+from app.services.todos import add_todo
+
+# Objets créés entre deux commits d'un import, et entre deux points de sauvegarde
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_SAVEPOINT_SIZE = 5000
+
+def export_records(user):
+    """Enregistrements d'un utilisateur : lui-même, puis chaque liste suivie de ses tâches.
+
+    Générateur sur User.todo_lists et TodoList.todos : l'export n'est jamais
+    construit en entier en mémoire.
+    """
+    yield dict(user.to_dict(), type='user')
+    for todo_list in user.todo_lists.values():
+        yield dict(todo_list.to_dict(), type='list')
+        for todo in todo_list.todos.values():
+            yield dict(todo.to_dict(), type='todo')
+
+def _parse_datetime(record, field):
+    """Date ISO 8601 de `record`, ou None"""
+    value = record.get(field)
+    if not value:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        raise ServiceError(f'Format de date invalide pour {field}, utilisez ISO 8601', 400)
+
+def _required(record, *fields):
+    if not all(record.get(field) for field in fields):
+        raise ServiceError(f'Données insuffisantes ({", ".join(fields)})', 400)
+
+class Importer:
+    """Crée les objets d'un export, sous de nouveaux identifiants.
+
+    Les user_id et list_id de l'export sont traduits vers les objets créés ;
+    une liste peut aussi désigner un utilisateur, et une tâche une liste,
+    déjà présents dans la base. Avec `user_id`, tout est importé chez cet
+    utilisateur existant. Chaque enregistrement est validé avant toute
+    modification, comme dans les autres services. Le mot de passe d'un
+    utilisateur importé est haché par `hash_password` ; sans elle, il ne
+    pourra se connecter qu'après avoir reçu un mot de passe.
+    """
+
+    def __init__(self, root, user_id=None, hash_password=None):
+        self.root = root
+        self.target = user_id
+        self.hash_password = hash_password
+        # Utilisateur des listes qui n'en désignent pas : le dernier importé, ou la cible
+        self.current_user = user_id
+        self.id_map = {}
+        self.counts = {'users': 0, 'lists': 0, 'todos': 0}
+        self.user_ids = []
+        self._handlers = {'user': self._import_user, 'list': self._import_list, 'todo': self._import_todo}
+        self.begin()
+
+    def begin(self):
+        """Début d'un lot : ce qu'il faut défaire si son commit échoue"""
+        self._batch_ids = []
+        self._saved = (dict(self.counts), len(self.user_ids), self.current_user)
+
+    def rollback(self):
+        """Oublie les objets du lot en cours (transaction annulée)"""
+        for old_id in self._batch_ids:
+            self.id_map.pop(old_id, None)
+        counts, user_count, self.current_user = self._saved
+        self.counts = dict(counts)
+        del self.user_ids[user_count:]
+        self._batch_ids = []
+
+    def apply(self, record):
+        handler = self._handlers.get(record.get('type')) if isinstance(record, dict) else None
+        if handler is None:
+            raise ServiceError('Type d\'enregistrement inconnu (user, list ou todo)', 400)
+        handler(record)
+
+    def _map(self, old_id, new_id):
+        if old_id is not None:
+            self.id_map[old_id] = new_id
+            self._batch_ids.append(old_id)
+
+    def _import_user(self, record):
+        if self.target is not None:
+            raise ServiceError('Utilisateur inattendu : import dans un utilisateur existant', 400)
+        _required(record, 'username', 'email')
+        if not valid_identifier(record['username']):
+            raise ServiceError('Nom d\'utilisateur invalide', 400)
+        if not valid_identifier(record['email']):
+            raise ServiceError('Email invalide', 400)
+        root = self.root
+        if root.user_index.username_taken(record['username']):
+            raise ServiceError('Nom d\'utilisateur déjà utilisé', 409)
+        if root.user_index.email_taken(record['email']):
+            raise ServiceError('Email déjà utilisé', 409)
+        created_at = _parse_datetime(record, 'created_at')
+        updated_at = _parse_datetime(record, 'updated_at')
+
+        password = record.get('password')
+        if password is not None and not isinstance(password, str):
+            raise ServiceError('Mot de passe invalide', 400)
+        password_hash = self.hash_password(password) if password and self.hash_password else None
+
+        user = User(record['username'], record['email'], password_hash)
+        user.created_at = created_at or user.created_at
+        user.updated_at = updated_at or user.created_at
+        root.users[user.id] = user
+        root.user_index.index(user)
+        root.change_log.record(user.id, 'user', user.id)
+
+        self._map(record.get('id'), user.id)
+        self.current_user = user.id
+        self.user_ids.append(user.id)
+        self.counts['users'] += 1
+
+    def _import_list(self, record):
+        _required(record, 'title')
+        root = self.root
+        if self.target is not None:
+            user_id = self.target
+        elif record.get('user_id') is not None:
+            user_id = self.id_map.get(record['user_id'], record['user_id'])
+        else:
+            user_id = self.current_user
+        user = root.users.get(user_id) if user_id is not None else None
+        if user is None:
+            raise ServiceError('Utilisateur non trouvé', 404)
+        created_at = _parse_datetime(record, 'created_at')
+        updated_at = _parse_datetime(record, 'updated_at')
+
+        todo_list = TodoList(record['title'], record.get('description', ''), user.id)
+        todo_list.created_at = created_at or todo_list.created_at
+        todo_list.updated_at = updated_at or todo_list.created_at
+        root.todo_lists[todo_list.id] = todo_list
+        user.add_list(todo_list)
+        root.list_text_index.index(todo_list)
+        root.change_log.record(user.id, 'list', todo_list.id)
+
+        self._map(record.get('id'), todo_list.id)
+        self.counts['lists'] += 1
+
+    def _import_todo(self, record):
+        _required(record, 'title', 'list_id')
+        root = self.root
+        todo_list = root.todo_lists.get(self.id_map.get(record['list_id'], record['list_id']))
+        if todo_list is None:
+            raise ServiceError('Liste non trouvée', 404)
+        if self.target is not None and todo_list.user_id != self.target:
+            raise ServiceError('Cette liste n\'appartient pas à cet utilisateur', 403)
+        due_date = _parse_datetime(record, 'due_date')
+        created_at = _parse_datetime(record, 'created_at')
+        updated_at = _parse_datetime(record, 'updated_at')
+        completed_at = _parse_datetime(record, 'completed_at')
+
+        todo = Todo(record['title'], record.get('description', ''), todo_list.id, todo_list.user_id,
+                    due_date=due_date, priority=record.get('priority', 1))
+        todo.created_at = created_at or todo.created_at
+        todo.updated_at = updated_at or todo.created_at
+        if record.get('is_completed'):
+            todo.is_completed = True
+            todo.completed_at = completed_at or todo.updated_at
+        add_todo(root, todo, todo_list)
+
+        self.counts['todos'] += 1
+
+def _commit_batch(importer, batch, attempts, savepoint_size):
+    """Applique puis valide un lot ; le rejoue en entier sur un conflit d'écriture.
+
+    Les points de sauvegarde intermédiaires déversent les objets modifiés dans
+    un fichier temporaire, ce qui borne la mémoire du cache sans multiplier
+    les commits (chaque commit réécrit les buckets des BTrees touchés).
+    Un enregistrement invalide arrête l'import : les précédents du lot sont
+    validés, puis l'erreur est levée avec son numéro de ligne.
+    """
+    for attempt in range(1, attempts + 1):
+        importer.begin()
+        error = None
+        try:
+            for index, (number, record) in enumerate(batch, 1):
+                try:
+                    importer.apply(record)
+                except ServiceError as e:
+                    error = ServiceError(f'Ligne {number} : {e.message}', e.status)
+                    break
+                if savepoint_size and index % savepoint_size == 0:
+                    transaction.savepoint(optimistic=True)
+            transaction.commit()
+        except TransientError:
+            transaction.abort()
+            importer.rollback()
+            if attempt == attempts:
+                raise
+            continue
+        except Exception:
+            # Lot abandonné (pool bcrypt saturé, erreur inattendue) : seuls les précédents restent
+            transaction.abort()
+            importer.rollback()
+            raise
+        if error is not None:
+            raise error
+        return
+
+def import_lines(importer, lines, batch_size=DEFAULT_BATCH_SIZE, savepoint_size=DEFAULT_SAVEPOINT_SIZE,
+                 attempts=3):
+    """Importe des lignes NDJSON en validant tous les `batch_size` objets.
+
+    Les lots déjà validés restent en base si une ligne est refusée ou si un
+    conflit persiste ; importer.counts décrit ce qui a été importé.
+    """
+    batch = []
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            _commit_batch(importer, batch, attempts, savepoint_size)
+            raise ServiceError(f'Ligne {number} : JSON invalide', 400)
+        batch.append((number, record))
+        if len(batch) >= batch_size:
+            _commit_batch(importer, batch, attempts, savepoint_size)
+            batch = []
+    _commit_batch(importer, batch, attempts, savepoint_size)
+    return importer.counts
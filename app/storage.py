@@ -0,0 +1,113 @@
+import os
+import pickle
+import zc.lockfile
+import ZODB.FileStorage
+import ZODB.DemoStorage
+import ZODB.MappingStorage
+import ZODB.config
+
+DEFAULT_STORAGE = 'data/todoapp.fs'
+
+def parse_storage_uri(uri):
+    """Découpe ZODB_STORAGE en (type, cible).
+
+    Formes acceptées :
+    - `data/todoapp.fs` ou `file://data/todoapp.fs` : FileStorage
+    - `memory://` : MappingStorage (benchmarks, données non persistantes)
+    - `demo://` : DemoStorage
+    - `zeo://hôte:port` ou `zeo:///chemin/socket` : client ZEO
+    - `zconfig://chemin/storage.conf` : fichier ZConfig (RelStorage, etc.)
+    """
+    uri = uri or DEFAULT_STORAGE
+    if '://' not in uri:
+        return 'file', uri
+    scheme, target = uri.split('://', 1)
+    if scheme not in ('file', 'memory', 'demo', 'zeo', 'zconfig'):
+        raise ValueError(f"Type de stockage ZODB inconnu : {scheme}")
+    return scheme, target
+
+def _zeo_address(target):
+    """Adresse ZEO : (hôte, port) ou chemin de socket unix"""
+    if target.startswith('/'):
+        return target
+    host, _, port = target.rpartition(':')
+    return (host or 'localhost', int(port))
+
+def lock_holder(path):
+    """PID du processus qui détient le verrou du FileStorage `path`, None s'il est libre.
+
+    Le verrou est un verrou du système posé sur `path.lock` : il disparaît avec
+    le processus qui le tenait. Un fichier `.lock` laissé par un arrêt brutal
+    n'empêche donc pas la réouverture et n'a pas à être supprimé.
+    """
+    lock_path = path + '.lock'
+    if not os.path.exists(lock_path):
+        return None
+    try:
+        lock = zc.lockfile.LockFile(lock_path)
+    except zc.lockfile.LockError:
+        # zc.lockfile écrit « pid » dans le fichier ; 0 si illisible
+        try:
+            with open(lock_path) as lock_file:
+                return int(lock_file.read().split()[0])
+        except (OSError, ValueError, IndexError):
+            return 0
+    lock.close()
+    return None
+
+def saved_index_position(path):
+    """Position du fichier couverte par `path.index`, None si l'index est absent ou illisible.
+
+    Seul l'en-tête est lu : FileStorage ne relit au démarrage que les
+    transactions écrites après cette position.
+    """
+    try:
+        with open(path + '.index', 'rb') as index_file:
+            position = pickle.Unpickler(index_file).load()
+    except Exception:
+        return None
+    return position if isinstance(position, int) else None
+
+def save_file_index(storage):
+    """Enregistre l'index d'un FileStorage s'il a avancé depuis le dernier enregistrement.
+
+    Après un arrêt brutal, seules les transactions postérieures au dernier
+    index enregistré sont relues à l'ouverture. Retourne True si l'index a été écrit.
+    """
+    with storage._lock:
+        position = storage._pos
+        if getattr(storage, '_index_saved_at', None) == position:
+            return False
+        storage._save_index()
+        storage._index_saved_at = position
+    return True
+
+def open_storage(uri, zeo_cache_size=None):
+    """Ouvre le stockage ZODB décrit par `uri`"""
+    scheme, target = parse_storage_uri(uri)
+
+    if scheme == 'file':
+        directory = os.path.dirname(target)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        return ZODB.FileStorage.FileStorage(target)
+
+    if scheme == 'memory':
+        return ZODB.MappingStorage.MappingStorage()
+
+    if scheme == 'demo':
+        return ZODB.DemoStorage.DemoStorage()
+
+    if scheme == 'zeo':
+        # Dépendance optionnelle : seulement nécessaire pour partager la base entre nœuds
+        try:
+            import ZEO.ClientStorage
+        except ImportError:
+            raise RuntimeError("Le paquet ZEO est requis pour ZODB_STORAGE=zeo://")
+        options = {}
+        if zeo_cache_size:
+            options['cache_size'] = zeo_cache_size
+        return ZEO.ClientStorage.ClientStorage(_zeo_address(target), **options)
+
+    with open(target) as config_file:
+        return ZODB.config.storageFromFile(config_file)
@@ -0,0 +1,91 @@
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import Response, current_app, g, request
+from app.database import get_db
+
+class ResponseCache:
+    """Cache LRU de réponses sérialisées, valides pour un identifiant de transaction"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, tid):
+        """Entrée (corps, type MIME) si elle a été calculée pour `tid`, sinon None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != tid:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1:]
+
+    def put(self, key, tid, body, mimetype, max_entries):
+        with self._lock:
+            self._entries[key] = (tid, body, mimetype)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+response_cache = ResponseCache()
+
+def make_etag(key, tid):
+    """ETag stable entre processus : transaction + route + arguments"""
+    digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:16]
+    return f'{tid.hex()}-{digest}'
+
+def _respond(body, mimetype, etag):
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype=mimetype)
+    response.set_etag(etag)
+    return response
+
+def cached_response(view):
+    """Met en cache la réponse JSON d'une route GET.
+
+    Une entrée n'est valide que si aucune transaction n'a été validée depuis
+    son calcul : un succès évite le chargement des objets et la sérialisation.
+    Les réponses portent un ETag et `If-None-Match` donne un 304.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        max_entries = current_app.config.get('RESPONSE_CACHE_SIZE', 1024)
+        if not max_entries or request.args.get('stream', 'false').lower() == 'true':
+            return view(*args, **kwargs)
+
+        key = (request.endpoint, tuple(sorted(kwargs.items())),
+               tuple(sorted(request.args.items(multi=True))))
+
+        current_tid = get_db().last_transaction()
+        entry = response_cache.get(key, current_tid)
+        g.response_cache = 'hit' if entry is not None else 'miss'
+        if entry is not None:
+            return _respond(*entry, make_etag(key, current_tid))
+
+        response = current_app.make_response(view(*args, **kwargs))
+        if response.status_code != 200 or response.is_streamed:
+            return response
+
+        # La réponse reflète au moins l'état de la transaction vue à l'ouverture
+        # de la connexion : c'est sous cet identifiant qu'elle est mise en cache
+        tid = g.get('zodb_tid', current_tid)
+        body = response.get_data()
+        if len(body) <= current_app.config.get('RESPONSE_CACHE_MAX_BODY', 1024 * 1024):
+            response_cache.put(key, tid, body, response.mimetype, max_entries)
+        return _respond(body, response.mimetype, make_etag(key, tid))
+
+    return wrapper
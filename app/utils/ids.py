@@ -0,0 +1,173 @@
+import os
+import threading
+import time
+import uuid
+import BTrees.LOBTree
+import BTrees.OOBTree
+
+# Types de clés des collections : 'uuid' (chaînes, OOBTree) ou 'int' (entiers 64 bits, LOBTree)
+KEY_TYPES = ('uuid', 'int')
+
+# Début de l'horloge des identifiants entiers (2024-01-01 UTC, en millisecondes)
+ID_EPOCH_MS = 1704067200000
+NODE_BITS = 10
+SEQUENCE_BITS = 12
+
+class IdGenerator:
+    """Identifiants entiers 64 bits ordonnés dans le temps (style Snowflake).
+
+    41 bits de millisecondes, 10 bits de nœud, 12 bits de séquence : les
+    insertions se font en fin de BTree au lieu d'être dispersées.
+    """
+
+    def __init__(self, node_id=0):
+        if not 0 <= node_id < (1 << NODE_BITS):
+            raise ValueError(f"Identifiant de nœud hors limites : {node_id}")
+        self.node_id = node_id
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def next_id(self):
+        with self._lock:
+            now = int(time.time() * 1000) - ID_EPOCH_MS
+            if now < self._last_ms:
+                # Horloge revenue en arrière : continuer sur la dernière milliseconde
+                now = self._last_ms
+            if now == self._last_ms:
+                self._sequence = (self._sequence + 1) & ((1 << SEQUENCE_BITS) - 1)
+                if self._sequence == 0:
+                    # Séquence épuisée pour cette milliseconde
+                    while now <= self._last_ms:
+                        now = int(time.time() * 1000) - ID_EPOCH_MS
+            else:
+                self._sequence = 0
+            self._last_ms = now
+            return (now << (NODE_BITS + SEQUENCE_BITS)) | (self.node_id << SEQUENCE_BITS) | self._sequence
+
+_MISSING = object()
+
+class IntKeyBTree(BTrees.LOBTree.BTree):
+    """LOBTree qui accepte aussi les identifiants sous forme de chaînes.
+
+    L'API continue de manipuler des identifiants textuels ; la conversion en
+    entier se fait ici, au seul endroit où les clés sont comparées. Toute
+    l'API de mapping utilisée par l'application convertit ses clés, bornes
+    `min`/`max` des parcours comprises.
+    """
+
+    def __getitem__(self, key):
+        return super().__getitem__(to_int_key(key))
+
+    def __setitem__(self, key, value):
+        super().__setitem__(to_int_key(key), value)
+
+    def __delitem__(self, key):
+        super().__delitem__(to_int_key(key))
+
+    def __contains__(self, key):
+        try:
+            return super().__contains__(to_int_key(key))
+        except KeyError:
+            return False
+
+    def has_key(self, key):
+        try:
+            return super().has_key(to_int_key(key))
+        except KeyError:
+            return False
+
+    def get(self, key, default=None):
+        try:
+            return super().get(to_int_key(key), default)
+        except KeyError:
+            return default
+
+    def pop(self, key, default=_MISSING):
+        try:
+            key = to_int_key(key)
+        except KeyError:
+            if default is _MISSING:
+                raise
+            return default
+        if default is _MISSING:
+            return super().pop(key)
+        return super().pop(key, default)
+
+    def setdefault(self, key, default):
+        return super().setdefault(to_int_key(key), default)
+
+    def insert(self, key, value):
+        return super().insert(to_int_key(key), value)
+
+    def update(self, items):
+        items = items.items() if hasattr(items, 'items') else items
+        super().update([(to_int_key(key), value) for key, value in items])
+
+    def keys(self, min=None, max=None, excludemin=False, excludemax=False):
+        return super().keys(_bound(min), _bound(max), excludemin, excludemax)
+
+    def values(self, min=None, max=None, excludemin=False, excludemax=False):
+        return super().values(_bound(min), _bound(max), excludemin, excludemax)
+
+    def items(self, min=None, max=None, excludemin=False, excludemax=False):
+        return super().items(_bound(min), _bound(max), excludemin, excludemax)
+
+    def iterkeys(self, min=None, max=None, excludemin=False, excludemax=False):
+        return super().iterkeys(_bound(min), _bound(max), excludemin, excludemax)
+
+    def itervalues(self, min=None, max=None, excludemin=False, excludemax=False):
+        return super().itervalues(_bound(min), _bound(max), excludemin, excludemax)
+
+    def iteritems(self, min=None, max=None, excludemin=False, excludemax=False):
+        return super().iteritems(_bound(min), _bound(max), excludemin, excludemax)
+
+    def minKey(self, key=None):
+        return super().minKey(_bound(key))
+
+    def maxKey(self, key=None):
+        return super().maxKey(_bound(key))
+
+def _bound(key):
+    """Borne de parcours convertie en clé entière (None : pas de borne)"""
+    return None if key is None else to_int_key(key)
+
+def to_int_key(value):
+    """Clé entière d'un identifiant (KeyError s'il n'est pas numérique)"""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.isdigit() and len(value) <= 19:
+        return int(value)
+    raise KeyError(value)
+
+_state = {'key_type': 'uuid', 'generator': None}
+
+def configure(key_type, node_id=None):
+    """Choisit le type de clés (lu dans la base à l'ouverture)"""
+    if key_type not in KEY_TYPES:
+        raise ValueError(f"Type de clé inconnu : {key_type}")
+    if node_id is None:
+        node_id = int(os.environ.get('ZODB_NODE_ID', 0))
+    _state['key_type'] = key_type
+    _state['generator'] = IdGenerator(node_id) if key_type == 'int' else None
+
+def key_type():
+    return _state['key_type']
+
+def new_id():
+    """Nouvel identifiant textuel selon le type de clés courant"""
+    if _state['generator'] is not None:
+        return str(_state['generator'].next_id())
+    return str(uuid.uuid4())
+
+def to_key(value):
+    """Clé de collection d'un identifiant textuel"""
+    if _state['key_type'] == 'int':
+        return to_int_key(value)
+    return value
+
+def new_tree(key_type=None):
+    """BTree vide adapté au type de clés"""
+    if (key_type or _state['key_type']) == 'int':
+        return IntKeyBTree()
+    return BTrees.OOBTree.BTree()
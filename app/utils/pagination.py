@@ -0,0 +1,117 @@
+import base64
+import json
+from itertools import islice
+from flask import Response, current_app, jsonify, request, stream_with_context
+from app.database import get_db
+
+# Nombre d'objets streamés entre deux passages du ramasse-miettes du cache ZODB
+STREAM_GC_INTERVAL = 1000
+
+class PaginationError(ValueError):
+    """Paramètres de pagination invalides"""
+
+def encode_cursor(key):
+    """Encode une clé de BTree en curseur opaque"""
+    raw = json.dumps(key).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Décode un curseur opaque en clé de BTree"""
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(cursor + padding))
+    except (ValueError, TypeError):
+        raise PaginationError('Curseur invalide')
+    # Les clés composées des index triés sont des tuples (listes en JSON)
+    return tuple(key) if isinstance(key, list) else key
+
+def iter_after(source, after=None):
+    """Clés d'un BTree/TreeSet strictement après `after` (parcours par plage)"""
+    if after is None:
+        return iter(source.keys())
+    try:
+        return iter(source.keys(min=after, excludemin=True))
+    except (TypeError, KeyError, ValueError):
+        # Curseur d'un autre type que les clés de la collection (ou non convertible en clé entière)
+        raise PaginationError('Curseur invalide')
+
+def iter_items(keys, load, predicate=None):
+    """Couples (clé, objet) pour des clés données, filtrés par `predicate`"""
+    for key in keys:
+        item = load(key)
+        if predicate is None or predicate(item):
+            yield key, item
+
+def get_page_params():
+    """Lit `cursor`, `limit`, `stream` et `all` dans la requête courante.
+
+    Sans `limit`, une page de PAGE_SIZE_DEFAULT objets ; `limit` vaut None
+    seulement pour un flux (`stream=true`) ou le tableau complet demandé
+    explicitement (`all=true`).
+    """
+    cursor = request.args.get('cursor')
+    limit = request.args.get('limit')
+    stream = request.args.get('stream', 'false').lower() == 'true'
+    everything = request.args.get('all', 'false').lower() == 'true'
+
+    after = decode_cursor(cursor) if cursor else None
+
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise PaginationError('Paramètre limit invalide')
+        if limit < 1:
+            raise PaginationError('Paramètre limit invalide')
+        limit = min(limit, current_app.config.get('PAGE_SIZE_MAX', 1000))
+    elif not stream and not (everything and cursor is None):
+        # Mémoire bornée par requête : le tableau complet est un choix explicite
+        limit = current_app.config.get('PAGE_SIZE_DEFAULT', 100)
+
+    return after, limit, stream
+
+def stream_json_array(dicts):
+    """Génère un tableau JSON morceau par morceau"""
+    connection = get_db().connection
+    yield '['
+    for index, item in enumerate(dicts):
+        if index:
+            yield ','
+            if index % STREAM_GC_INTERVAL == 0:
+                # Redescendre le cache de la connexion à sa taille cible
+                connection.cacheGC()
+        yield current_app.json.dumps(item)
+    yield ']'
+
+def paginated_response(source, load, serialize, predicate=None):
+    """Réponse JSON d'une collection BTree, paginée ou streamée selon la requête.
+
+    - `?limit=&cursor=` : une page {'items': [...], 'next_cursor': ...}
+    - sans paramètre : la première page, de PAGE_SIZE_DEFAULT objets
+    - `?stream=true` : le tableau JSON est produit au fil de l'eau
+    - `?all=true` : le tableau complet, construit en mémoire (comportement historique)
+    """
+    try:
+        after, limit, stream = get_page_params()
+        keys = iter_after(source, after)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+
+    items = iter_items(keys, load, predicate)
+
+    if stream:
+        if limit is not None:
+            items = islice(items, limit)
+        dicts = (serialize(item) for _, item in items)
+        return Response(stream_with_context(stream_json_array(dicts)),
+                        mimetype='application/json')
+
+    if limit is None:
+        return jsonify([serialize(item) for _, item in items])
+
+    page = list(islice(items, limit + 1))
+    next_cursor = encode_cursor(page[limit - 1][0]) if len(page) > limit else None
+    return jsonify({
+        'items': [serialize(item) for _, item in page[:limit]],
+        'next_cursor': next_cursor,
+    })
@@ -0,0 +1,60 @@
+import functools
+import random
+import threading
+import time
+import transaction
+from transaction.interfaces import TransientError
+from flask import current_app, jsonify, request
+
+class RetryStats:
+    """Compteurs des conflits d'écriture et des nouvelles tentatives, par endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def record(self, endpoint, name):
+        with self._lock:
+            counters = self._counters.setdefault(endpoint, {'conflicts': 0, 'retries': 0, 'failures': 0})
+            counters[name] += 1
+
+    def snapshot(self):
+        """Copie des compteurs {endpoint: {'conflicts', 'retries', 'failures'}}"""
+        with self._lock:
+            return {endpoint: dict(counters) for endpoint, counters in self._counters.items()}
+
+retry_stats = RetryStats()
+
+def retry_delay(backoff, attempt):
+    """Attente avant la tentative suivante : exponentielle, avec gigue pour désynchroniser les écrivains"""
+    return backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+
+def retry_on_conflict(view):
+    """Rejoue une route d'écriture quand son commit échoue sur un conflit ZODB.
+
+    Le nombre de tentatives et le délai de base (doublé à chaque essai) viennent
+    de TX_RETRY_ATTEMPTS et TX_RETRY_BACKOFF.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        attempts = max(1, current_app.config.get('TX_RETRY_ATTEMPTS', 3))
+        backoff = current_app.config.get('TX_RETRY_BACKOFF', 0.05)
+
+        for attempt in range(1, attempts + 1):
+            try:
+                return view(*args, **kwargs)
+            except TransientError:
+                # Repartir d'une vue à jour de la base avant de rejouer
+                transaction.abort()
+                retry_stats.record(request.endpoint, 'conflicts')
+
+                if attempt == attempts:
+                    retry_stats.record(request.endpoint, 'failures')
+                    current_app.logger.warning("Conflit non résolu sur %s après %d tentatives",
+                                               request.endpoint, attempts)
+                    return jsonify({'error': 'Conflit d\'écriture, veuillez réessayer'}), 409
+
+                retry_stats.record(request.endpoint, 'retries')
+                time.sleep(retry_delay(backoff, attempt))
+
+    return wrapper
@@ -0,0 +1,258 @@
+"""Charge de l'API REST : latences p50/p99, débit et croissance du stockage par endpoint.
+
+Amorce une base (N utilisateurs × M listes × K tâches) puis rejoue les
+endpoints chauds avec des clients concurrents, soit via le client de test
+Flask, soit via un vrai serveur WSGI multi-thread.
+
+    python benchmarks/api_load.py [--users 50 --lists 5 --todos 40]
+        [--requests 500 --concurrency 8] [--transport client|http|both]
+        [--storage chemin.fs|memory://] [--json resultats.json]
+"""
+import argparse
+import collections
+import datetime
+import http.client
+import itertools
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import transaction
+from werkzeug.serving import make_server
+
+from app import create_app
+from app.database import Database, get_db
+from app.models.list import TodoList
+from app.models.user import User
+from app.services import todos as todo_services
+
+COMMIT_EVERY = 1000
+
+def seed(db, users, lists, todos, rng):
+    """Crée users × lists × todos objets ; retourne les identifiants créés"""
+    root = db.root
+    user_ids, list_ids = [], []
+    pending = 0
+    for u in range(users):
+        user = User(f'bench{u}', f'bench{u}@example.com', 'x')
+        root.users[user.id] = user
+        root.user_index.index(user)
+        user_ids.append(user.id)
+        for m in range(lists):
+            todo_list = TodoList(f'Liste {m} de {user.username}', 'Liste de démonstration', user.id)
+            root.todo_lists[todo_list.id] = todo_list
+            user.add_list(todo_list)
+            root.list_text_index.index(todo_list)
+            list_ids.append((user.id, todo_list.id))
+            for k in range(todos):
+                due = datetime.datetime(2026, 1, 1) + datetime.timedelta(days=rng.randrange(365))
+                todo_services.create_todo(root, {
+                    'title': f'Tâche {k} à faire', 'description': 'Description de la tâche',
+                    'list_id': todo_list.id, 'user_id': user.id,
+                    'due_date': due, 'priority': rng.randint(1, 3),
+                })
+                pending += 1
+                if pending >= COMMIT_EVERY:
+                    transaction.commit()
+                    pending = 0
+    transaction.commit()
+    return user_ids, list_ids
+
+def scenarios(user_ids, list_ids, rng):
+    """Endpoints mesurés : nom -> fabrique de requêtes (méthode, chemin, corps JSON)"""
+    lock = threading.Lock()
+    usernames = itertools.count()
+    victims = queue.Queue()
+    # Les listes supprimées sont prises en fin de jeu pour ne pas vider les premières
+    for _, list_id in reversed(list_ids):
+        victims.put(list_id)
+
+    def pick(sequence):
+        with lock:
+            return rng.choice(sequence)
+
+    def create_todo():
+        user_id, list_id = pick(list_ids)
+        return 'POST', '/api/todos', {'title': 'Nouvelle tâche', 'list_id': list_id,
+                                      'user_id': user_id, 'priority': 2}
+
+    def create_user():
+        n = next(usernames)
+        return 'POST', '/api/users', {'username': f'load{n}', 'email': f'load{n}@example.com',
+                                      'password': 'secret'}
+
+    def delete_list():
+        try:
+            return 'DELETE', f'/api/lists/{victims.get_nowait()}', None
+        except queue.Empty:
+            return None
+
+    return [
+        ('get_todos?user_id', lambda: ('GET', f'/api/todos?user_id={pick(user_ids)}', None)),
+        ('get_todos?list_id', lambda: ('GET', f'/api/todos?list_id={pick(list_ids)[1]}', None)),
+        ('get_todos?completed', lambda: ('GET', f'/api/todos?user_id={pick(user_ids)}&completed=false', None)),
+        ('get_todos?sort=due_date', lambda: ('GET', f'/api/todos?user_id={pick(user_ids)}'
+                                                    '&sort=due_date&limit=50', None)),
+        ('create_todo', create_todo),
+        ('create_user', create_user),
+        ('delete_list', delete_list),
+    ]
+
+class ClientTransport:
+    """Requêtes via le client de test Flask (un client par thread)"""
+    name = 'client'
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, body, headers=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body, headers=headers)
+        response.close()
+        return response.status_code
+
+    def close(self):
+        pass
+
+class HttpTransport:
+    """Requêtes HTTP vers un serveur WSGI Werkzeug multi-thread local"""
+    name = 'http'
+
+    def __init__(self, app):
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def request(self, method, path, body, headers=None):
+        connection = http.client.HTTPConnection('127.0.0.1', self.server.server_port, timeout=60)
+        try:
+            headers = dict(headers or {})
+            payload = None
+            if body is not None:
+                payload = json.dumps(body).encode('utf-8')
+                headers['Content-Type'] = 'application/json'
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        finally:
+            connection.close()
+
+    def close(self):
+        self.server.shutdown()
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+def run_scenario(transport, make_request, count, concurrency):
+    """Exécute `count` requêtes sur `concurrency` threads ; latences (s), erreurs, durée"""
+    latencies, errors = [], []
+    remaining = itertools.count()
+
+    def worker():
+        while next(remaining) < count:
+            spec = make_request()
+            if spec is None:
+                return
+            started = time.perf_counter()
+            status = transport.request(*spec)
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                errors.append(status)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), errors, time.perf_counter() - started
+
+def storage_size(db):
+    """Taille du FileStorage, ou None pour les autres stockages"""
+    if db.path and os.path.exists(db.path):
+        return os.path.getsize(db.path)
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--lists', type=int, default=5, help="Listes par utilisateur")
+    parser.add_argument('--todos', type=int, default=40, help="Tâches par liste")
+    parser.add_argument('--requests', type=int, default=500, help="Requêtes par endpoint")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--transport', choices=['client', 'http', 'both'], default='both')
+    parser.add_argument('--storage', help="Stockage ZODB (par défaut un FileStorage temporaire)")
+    parser.add_argument('--no-cache', action='store_true', help="Désactiver le cache de réponses")
+    parser.add_argument('--seed', type=int, default=0, help="Graine des données et des requêtes")
+    parser.add_argument('--json', help="Écrire les résultats dans ce fichier")
+    args = parser.parse_args()
+
+    transports = ['client', 'http'] if args.transport == 'both' else [args.transport]
+    results = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        for transport_name in transports:
+            rng = random.Random(args.seed)
+            storage = args.storage or os.path.join(directory, f'{transport_name}.fs')
+            db = get_db.instance = Database(storage=storage)
+
+            app = create_app()
+            if args.no_cache:
+                app.config['RESPONSE_CACHE_SIZE'] = 0
+
+            started = time.perf_counter()
+            user_ids, list_ids = seed(db, args.users, args.lists, args.todos, rng)
+            print(f"[{transport_name}] amorçage : {len(user_ids)} utilisateurs, {len(list_ids)} listes, "
+                  f"{len(list_ids) * args.todos} tâches en {time.perf_counter() - started:.1f} s")
+
+            transport = (ClientTransport if transport_name == 'client' else HttpTransport)(app)
+            try:
+                for name, make_request in scenarios(user_ids, list_ids, rng):
+                    size_before = storage_size(db)
+                    latencies, errors, elapsed = run_scenario(transport, make_request,
+                                                              args.requests, args.concurrency)
+                    size_after = storage_size(db)
+                    growth = None
+                    if size_before is not None and latencies:
+                        growth = (size_after - size_before) / len(latencies)
+                    results.append({
+                        'transport': transport_name, 'endpoint': name, 'requests': len(latencies),
+                        'errors': len(errors), 'error_statuses': dict(collections.Counter(errors)),
+                        'p50_ms': percentile(latencies, 0.50) * 1000,
+                        'p99_ms': percentile(latencies, 0.99) * 1000,
+                        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+                        'bytes_per_op': growth,
+                    })
+            finally:
+                transport.close()
+                db.close()
+                del get_db.instance
+
+    print(f"\n{'transport':9} {'endpoint':26} {'req':>6} {'err':>4} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'req/s':>8} {'octets/op':>10}")
+    for r in results:
+        growth = f"{r['bytes_per_op']:10.0f}" if r['bytes_per_op'] is not None else f"{'-':>10}"
+        print(f"{r['transport']:9} {r['endpoint']:26} {r['requests']:6} {r['errors']:4} "
+              f"{r['p50_ms']:8.2f} {r['p99_ms']:8.2f} {r['throughput']:8.0f} {growth}")
+
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump({'parameters': vars(args), 'results': results}, output, indent=2)
+
+if __name__ == '__main__':
+    main()
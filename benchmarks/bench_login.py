@@ -0,0 +1,137 @@
+"""Connexion sous charge : débit de POST /api/auth/login et des requêtes authentifiées par jeton.
+
+Crée des utilisateurs dont le mot de passe est haché au coût choisi, puis
+envoie des connexions concurrentes (pool bcrypt borné : les refus 503 sont
+comptés à part) et des GET /api/auth/me portant un jeton, avec et sans le
+cache de sessions.
+
+    python benchmarks/bench_login.py [--users 20 --requests 200]
+        [--concurrency 1,4,16] [--rounds 12 --workers 2 --queue 32]
+        [--transport client|http] [--json resultats.json]
+"""
+import argparse
+import collections
+import itertools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bcrypt
+import transaction
+
+from api_load import ClientTransport, HttpTransport, percentile, run_scenario
+from app import create_app, shutdown_app
+from app.database import Database, get_db
+from app.models.user import User
+
+PASSWORD = 'mot de passe de test'
+
+def seed(db, users, rounds):
+    """Crée `users` comptes au même mot de passe ; retourne leurs noms"""
+    root = db.root
+    password_hash = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(rounds)).decode('ascii')
+    usernames = []
+    for u in range(users):
+        user = User(f'login{u}', f'login{u}@example.com', password_hash)
+        root.users[user.id] = user
+        root.user_index.index(user)
+        usernames.append(user.username)
+    transaction.commit()
+    return usernames
+
+def login_tokens(app, usernames):
+    """Un jeton par utilisateur, obtenu hors mesure"""
+    client = app.test_client()
+    tokens = []
+    for username in usernames:
+        response = client.post('/api/auth/login', json={'username': username, 'password': PASSWORD})
+        tokens.append(response.get_json()['token'])
+    return tokens
+
+def scenarios(usernames, tokens):
+    """Requêtes mesurées : nom -> fabrique de requêtes (méthode, chemin, corps JSON, en-têtes)"""
+    lock = threading.Lock()
+    turns = itertools.count()
+
+    def pick(sequence):
+        with lock:
+            return sequence[next(turns) % len(sequence)]
+
+    return [
+        ('login', lambda: ('POST', '/api/auth/login', {'username': pick(usernames), 'password': PASSWORD}, None)),
+        ('login (mauvais mot de passe)',
+         lambda: ('POST', '/api/auth/login', {'username': pick(usernames), 'password': 'faux'}, None)),
+        ('me (jeton)', lambda: ('GET', '/api/auth/me', None, {'Authorization': f'Bearer {pick(tokens)}'})),
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=200, help="Requêtes par mesure")
+    parser.add_argument('--concurrency', default='1,4,16', help="Clients concurrents (liste)")
+    parser.add_argument('--rounds', type=int, default=12, help="Coût bcrypt")
+    parser.add_argument('--workers', type=int, default=2, help="Threads du pool bcrypt")
+    parser.add_argument('--queue', type=int, default=32, help="Calculs bcrypt en attente avant refus")
+    parser.add_argument('--transport', choices=['client', 'http'], default='http')
+    parser.add_argument('--json', help="Écrire les résultats dans ce fichier")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(',')]
+    results = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        for cache_size in (10000, 0):
+            db = get_db.instance = Database(storage=os.path.join(directory, f'login-{cache_size}.fs'),
+                                            pool_size=max(levels) + 2)
+            app = create_app({
+                'AUTH_BCRYPT_ROUNDS': args.rounds, 'AUTH_HASH_WORKERS': args.workers,
+                'AUTH_HASH_QUEUE': args.queue, 'AUTH_SESSION_CACHE_SIZE': cache_size,
+            })
+            started = time.perf_counter()
+            usernames = seed(db, args.users, args.rounds)
+            print(f"[cache {cache_size}] amorçage : {len(usernames)} utilisateurs (coût {args.rounds}) "
+                  f"en {time.perf_counter() - started:.1f} s")
+
+            transport = (ClientTransport if args.transport == 'client' else HttpTransport)(app)
+            try:
+                tokens = login_tokens(app, usernames)
+                for name, make_request in scenarios(usernames, tokens):
+                    if cache_size == 0 and not name.startswith('me'):
+                        # Sans cache, seules les requêtes authentifiées changent
+                        continue
+                    for concurrency in levels:
+                        latencies, errors, elapsed = run_scenario(transport, make_request,
+                                                                  args.requests, concurrency)
+                        statuses = collections.Counter(errors)
+                        results.append({
+                            'scenario': name, 'session_cache': cache_size, 'concurrency': concurrency,
+                            'requests': len(latencies), 'rejected': statuses.pop(503, 0),
+                            'error_statuses': dict(statuses),
+                            'p50_ms': percentile(latencies, 0.50) * 1000,
+                            'p99_ms': percentile(latencies, 0.99) * 1000,
+                            'throughput': len(latencies) / elapsed if elapsed else 0.0,
+                        })
+            finally:
+                transport.close()
+                shutdown_app(app)
+                del get_db.instance
+
+    print(f"\n{'scénario':30} {'cache':>6} {'conc':>5} {'req':>5} {'503':>5} {'p50 ms':>9} {'p99 ms':>9} "
+          f"{'req/s':>8}")
+    for r in results:
+        # Les refus de mauvais mot de passe (401) sont attendus
+        print(f"{r['scenario']:30} {r['session_cache']:6} {r['concurrency']:5} {r['requests']:5} "
+              f"{r['rejected']:5} {r['p50_ms']:9.2f} {r['p99_ms']:9.2f} {r['throughput']:8.1f}")
+
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump({'parameters': vars(args), 'results': results}, output, indent=2)
+
+if __name__ == '__main__':
+    main()
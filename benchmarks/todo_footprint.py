@@ -0,0 +1,98 @@
+"""Empreinte des tâches : taille dans le FileStorage et mémoire dans le cache ZODB.
+
+Compare l'ancien format de Todo (__dict__ complet, UUID en chaînes, datetime)
+au format compact actuel (slots, UUID binaires, dates entières).
+
+    python benchmarks/todo_footprint.py [--count 100000]
+"""
+import argparse
+import datetime
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import BTrees.OOBTree
+import persistent
+import transaction
+import ZODB
+import ZODB.FileStorage
+
+from app.models.todo import Todo
+
+class LegacyTodo(persistent.Persistent):
+    """Disposition d'origine de Todo (avant les slots)"""
+
+    def __init__(self, title, description, list_id, user_id, due_date=None, priority=1):
+        self.id = str(uuid.uuid4())
+        self.title = title
+        self.description = description
+        self.list_id = list_id
+        self.user_id = user_id
+        self.due_date = due_date
+        self.priority = priority
+        self.is_completed = False
+        self.created_at = datetime.datetime.now()
+        self.updated_at = self.created_at
+        self.completed_at = None
+
+def build(path, factory, count):
+    """Crée `count` tâches dans un FileStorage neuf et retourne sa taille"""
+    db = ZODB.DB(ZODB.FileStorage.FileStorage(path))
+    with db.transaction() as connection:
+        connection.root.todos = BTrees.OOBTree.BTree()
+    list_id, user_id = str(uuid.uuid4()), str(uuid.uuid4())
+    connection = db.open()
+    todos = connection.root.todos
+    for index in range(count):
+        todo = factory(f'Tâche {index}', 'Description', list_id, user_id,
+                       due_date=datetime.datetime.now(), priority=2)
+        todos[todo.id] = todo
+        if index % 10000 == 9999:
+            transaction.commit()
+    transaction.commit()
+    connection.close()
+    db.close()
+    return os.path.getsize(path)
+
+def cache_memory(path, count):
+    """Mémoire occupée par les tâches chargées dans le cache d'une connexion"""
+    db = ZODB.DB(ZODB.FileStorage.FileStorage(path, read_only=True), cache_size=count * 2)
+    connection = db.open()
+    todos = list(connection.root.todos.values())
+    for todo in todos:
+        todo._p_deactivate()
+    gc.collect()
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for todo in todos:
+        todo._p_activate()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    connection.close()
+    db.close()
+    return size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=100000)
+    args = parser.parse_args()
+
+    scale = 100000 / args.count
+    with tempfile.TemporaryDirectory() as directory:
+        for name, factory in (('ancien format', LegacyTodo), ('format compact', Todo)):
+            path = os.path.join(directory, f'{factory.__name__}.fs')
+            storage = build(path, factory, args.count)
+            memory = cache_memory(path, args.count)
+            print(f"{name:15} stockage : {storage * scale / 1e6:7.1f} Mo / 100k tâches, "
+                  f"cache : {memory * scale / 1e6:7.1f} Mo / 100k tâches")
+
+if __name__ == '__main__':
+    main()
@@ -1,45 +1,219 @@
-from app import create_app
+from app import create_app, shutdown_app
 import atexit
 import argparse
 import os
 import sys
-import shutil
 import signal
 
 def force_unlock():
-    """Supprime les fichiers de verrouillage pour débloquer la base ZODB."""
-    lock_files = ['data/todoapp.fs.lock', 'data/todoapp.fs.lock.tmp']
-    for lock_file in lock_files:
+    """Supprime les fichiers de verrouillage orphelins, jamais le verrou d'un processus vivant."""
+    from app.config import Config
+    from app.storage import lock_holder, parse_storage_uri
+    scheme, path = parse_storage_uri(Config.ZODB_STORAGE)
+    if scheme != 'file':
+        print(f"Pas de fichier de verrouillage pour le stockage '{Config.ZODB_STORAGE}'")
+        return
+    pid = lock_holder(path)
+    if pid is not None:
+        print(f"Base verrouillée par le processus {pid or 'inconnu'} toujours actif : arrêtez-le d'abord")
+        sys.exit(1)
+    for lock_file in [f'{path}.lock', f'{path}.lock.tmp']:
         if os.path.exists(lock_file):
             os.remove(lock_file)
-            print(f"Fichier de verrouillage supprimé: {lock_file}")
+            print(f"Fichier de verrouillage orphelin supprimé: {lock_file}")
+
+def _file_storage_path():
+    """Chemin du FileStorage configuré, ou arrêt si la base n'est pas un fichier local"""
+    from app.config import Config
+    from app.storage import parse_storage_uri
+    scheme, path = parse_storage_uri(Config.ZODB_STORAGE)
+    if scheme != 'file':
+        print(f"Le stockage '{Config.ZODB_STORAGE}' n'est pas un FileStorage local "
+              "(sauvegarder le fichier du serveur ZEO sur ce serveur)")
+        sys.exit(1)
+    return path
+
+def _open_database(hint=None):
+    """Ouvre la base pour une commande hors ligne, ou arrêt si elle est déjà utilisée"""
+    from app.database import get_db
+    try:
+        return get_db()
+    except RuntimeError as e:
+        print(f"Impossible d'ouvrir la base : {str(e)}")
+        if hint:
+            print(hint)
+        sys.exit(1)
 
 def reset_data():
     """Réinitialise les fichiers de données après sauvegarde."""
-    if os.path.exists('data'):
-        # Créer un dossier de backup s'il n'existe pas
-        os.makedirs('backup', exist_ok=True)
-        
-        # Sauvegarde des fichiers avant suppression
-        for file in os.listdir('data'):
-            src = os.path.join('data', file)
-            dst = os.path.join('backup', file)
-            if os.path.isfile(src):
-                shutil.copy2(src, dst)
-        
-        print("Sauvegarde des données effectuée dans 'backup/'")
+    from app.backup import backup_database, format_backup_report
+    from app.config import Config
+    from app.storage import lock_holder
+    path = _file_storage_path()
+    if os.path.exists(path):
+        pid = lock_holder(path)
+        if pid is not None:
+            print(f"Base ouverte par le processus {pid or 'inconnu'} : arrêtez-le avant de la réinitialiser")
+            sys.exit(1)
+
+        # Sauvegarde (incrémentale si possible) avant suppression
+        print(format_backup_report(backup_database(path, Config.ZODB_BACKUP_DIR)))
+        print(f"Sauvegarde des données effectuée dans '{Config.ZODB_BACKUP_DIR}/'")
 
         # Suppression des fichiers de la base de données
-        for file in os.listdir('data'):
-            os.remove(os.path.join('data', file))
+        for suffix in ['', '.index', '.tmp', '.lock']:
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
     
     print("Données réinitialisées")
 
+def backup(full=False):
+    """Sauvegarde en ligne (la base peut être en service) : seules les nouvelles transactions sont copiées."""
+    from app.backup import backup_database, format_backup_report
+    from app.config import Config
+    try:
+        print(format_backup_report(backup_database(_file_storage_path(), Config.ZODB_BACKUP_DIR, full=full)))
+    except RuntimeError as e:
+        print(f"Erreur lors de la sauvegarde : {str(e)}")
+        sys.exit(1)
+
+def verify_backup():
+    """Vérifie les sommes de contrôle de la dernière chaîne de sauvegardes."""
+    from app.backup import verify_backups
+    from app.config import Config
+    try:
+        report = verify_backups(Config.ZODB_BACKUP_DIR)
+    except RuntimeError as e:
+        print(f"Sauvegarde invalide : {str(e)}")
+        sys.exit(1)
+    print(f"Sauvegarde vérifiée : {report['files']} fichiers, {report['bytes']} octets "
+          f"en {report['duration']:.2f}s ({report['throughput'] / 1e6:.1f} Mo/s)")
+
+def restore(output, at=None):
+    """Restaure la base telle qu'elle était à une date donnée dans un nouveau fichier."""
+    import datetime
+    from app.backup import restore_database
+    from app.config import Config
+    try:
+        moment = datetime.datetime.fromisoformat(at) if at else None
+    except ValueError:
+        print("Format de date invalide, utilisez ISO 8601")
+        sys.exit(1)
+    try:
+        report = restore_database(Config.ZODB_BACKUP_DIR, output, moment)
+    except RuntimeError as e:
+        print(f"Erreur lors de la restauration : {str(e)}")
+        sys.exit(1)
+    print(f"Base restaurée dans {output} : {report['bytes']} octets en {report['duration']:.2f}s "
+          f"({report['throughput'] / 1e6:.1f} Mo/s)")
+
+def rebuild_indexes():
+    """Reconstruit les index secondaires d'une base existante."""
+    db = _open_database()
+    try:
+        for name, count in db.rebuild_indexes().items():
+            print(f"Index '{name}' reconstruit : {count} entrées")
+    finally:
+        db.close()
+
+def check_stats(repair=False):
+    """Compare les compteurs de tâches à un recomptage complet, et les corrige avec `repair`."""
+    import transaction
+    from app.indexes import check_todo_stats, rebuild_todo_stats
+    db = _open_database()
+    try:
+        mismatches = check_todo_stats(db.root)
+        for mismatch in mismatches:
+            print(f"Compteurs incohérents ({mismatch['scope']} {mismatch['id']}) : "
+                  f"attendu {mismatch['expected']}, trouvé {mismatch['found']}")
+        if not mismatches:
+            print("Compteurs des tâches cohérents")
+        elif repair:
+            count = rebuild_todo_stats(db.root)
+            transaction.commit()
+            print(f"Compteurs recalculés ({count} tâches)")
+    finally:
+        db.close()
+    if mismatches and not repair:
+        sys.exit(1)
+
+def migrate():
+    """Met à jour les objets existants vers le schéma courant."""
+    from app.migrations import run_migrations
+    db = _open_database()
+    try:
+        results = run_migrations(db.root)
+        for name, count in results.items():
+            print(f"Migration '{name}' : {count} objets mis à jour")
+        if not results:
+            print("Aucune migration à appliquer")
+    finally:
+        db.close()
+
+def pack(days):
+    """Compacte la base (FileStorage local non utilisé par un serveur, ou ZEO)."""
+    from app.maintenance import format_pack_report, pack_database
+    db = _open_database("Pour compacter une base en service, passez par un serveur ZEO "
+                        "ou laissez le PackScheduler du serveur s'en charger (ZODB_PACK_INTERVAL_HOURS)")
+    try:
+        print(format_pack_report(pack_database(db, days)))
+    finally:
+        db.close()
+
+def convert_keys(key_type, id_map_path):
+    """Convertit les clés des collections et enregistre la correspondance des identifiants."""
+    import csv
+    from app.migrations import convert_keys as convert
+    db = _open_database()
+    try:
+        try:
+            id_map = convert(db.root, key_type)
+        except RuntimeError as e:
+            print(f"Conversion impossible : {str(e)}")
+            sys.exit(1)
+        with open(id_map_path, 'w', newline='') as id_map_file:
+            writer = csv.writer(id_map_file)
+            writer.writerow(['ancien_id', 'nouvel_id'])
+            writer.writerows(id_map.items())
+        print(f"{len(id_map)} objets convertis en clés '{key_type}', correspondance dans {id_map_path}")
+    finally:
+        db.close()
+
+def serve(args):
+    """Sert l'application avec le serveur WSGI de production."""
+    from app.config import Config
+    from app.server import check_workers, serve as run_server
+    try:
+        check_workers(Config.ZODB_STORAGE, args.workers)
+        run_server(args.host, args.port, args.workers, args.threads, args.graceful_timeout)
+    except (ValueError, RuntimeError) as e:
+        print(f"Erreur : {str(e)}")
+        sys.exit(1)
+
 def parse_args():
     """Analyse les arguments en ligne de commande."""
     parser = argparse.ArgumentParser(description="Serveur d'application Todo")
     parser.add_argument('--force-unlock', action='store_true', help="Forcer le déverrouillage de la base de données")
     parser.add_argument('--reset-data', action='store_true', help="Réinitialiser les données avec sauvegarde")
+    parser.add_argument('--rebuild-indexes', action='store_true', help="Reconstruire les index secondaires")
+    parser.add_argument('--check-stats', action='store_true', help="Vérifier les compteurs de tâches par utilisateur et par liste")
+    parser.add_argument('--repair', action='store_true', help="Recalculer les compteurs incohérents (avec --check-stats)")
+    parser.add_argument('--migrate', action='store_true', help="Migrer les objets existants vers le schéma courant")
+    parser.add_argument('--convert-keys', choices=['uuid', 'int'], help="Convertir les clés des collections (uuid ou int)")
+    parser.add_argument('--id-map', default='id_map.csv', help="Fichier CSV de correspondance des identifiants convertis")
+    parser.add_argument('--pack', action='store_true', help="Compacter la base de données")
+    parser.add_argument('--days', type=float, default=0, help="Conserver les révisions des N derniers jours lors du compactage")
+    parser.add_argument('--backup', action='store_true', help="Sauvegarde en ligne incrémentale (repozo) de la base")
+    parser.add_argument('--full', action='store_true', help="Forcer une sauvegarde complète")
+    parser.add_argument('--verify-backup', action='store_true', help="Vérifier les sommes de contrôle des sauvegardes")
+    parser.add_argument('--restore', metavar='FICHIER', help="Restaurer la base sauvegardée dans ce nouveau fichier")
+    parser.add_argument('--at', help="Date ISO 8601 de l'état à restaurer (par défaut la dernière sauvegarde)")
+    parser.add_argument('--serve', action='store_true', help="Servir l'application avec gunicorn (production)")
+    parser.add_argument('--host', default='127.0.0.1', help="Adresse d'écoute du serveur de production")
+    parser.add_argument('--port', type=int, default=8000, help="Port d'écoute du serveur de production")
+    parser.add_argument('--workers', type=int, default=1, help="Nombre de processus (plus d'un nécessite ZEO)")
+    parser.add_argument('--threads', type=int, default=4, help="Threads de requêtes par processus")
+    parser.add_argument('--graceful-timeout', type=int, default=30, help="Délai (s) accordé aux requêtes en cours à l'arrêt")
     return parser.parse_args()
 
 if __name__ == '__main__':
@@ -53,15 +227,49 @@ if __name__ == '__main__':
         reset_data()
         sys.exit(0)
 
+    if args.rebuild_indexes:
+        rebuild_indexes()
+        sys.exit(0)
+
+    if args.check_stats:
+        check_stats(args.repair)
+        sys.exit(0)
+
+    if args.migrate:
+        migrate()
+        sys.exit(0)
+
+    if args.convert_keys:
+        convert_keys(args.convert_keys, args.id_map)
+        sys.exit(0)
+
+    if args.pack:
+        pack(args.days)
+        sys.exit(0)
+
+    if args.backup:
+        backup(args.full)
+        sys.exit(0)
+
+    if args.verify_backup:
+        verify_backup()
+        sys.exit(0)
+
+    if args.restore:
+        restore(args.restore, args.at)
+        sys.exit(0)
+
+    if args.serve:
+        serve(args)
+        sys.exit(0)
+
     try:
         app = create_app()
 
         # Fermeture propre de la base de données
         def close_db():
-            from app.database import get_db
             try:
-                db = get_db()
-                db.close()
+                shutdown_app(app)
             except Exception as e:
                 print(f"Erreur lors de la fermeture de la base: {str(e)}")
 
@@ -75,8 +283,8 @@ if __name__ == '__main__':
 
         signal.signal(signal.SIGINT, signal_handler)
 
-        # Lancer l'application Flask
-        app.run(debug=True)
+        # Lancer l'application Flask (un thread, donc une connexion ZODB, par requête)
+        app.run(debug=True, threaded=True)
 
     except Exception as e:
         print(f"Erreur au démarrage de l'application: {str(e)}")
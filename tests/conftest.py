@@ -0,0 +1,53 @@
+import os
+
+# Jamais le FileStorage du dépôt : Config lit l'environnement à l'import
+os.environ['ZODB_STORAGE'] = 'memory://'
+
+import pytest
+import transaction
+from app import create_app, shutdown_app
+from app.database import Database, get_db, opened_database
+
+def _forget_database():
+    transaction.abort()
+    if hasattr(get_db, 'instance'):
+        del get_db.instance
+
+@pytest.fixture
+def make_app():
+    """Fabrique d'applications sur une base en mémoire, arrêtées en fin de test"""
+    apps = []
+
+    def factory(**config):
+        settings = {'ZODB_STORAGE': 'memory://', 'AUTH_BCRYPT_ROUNDS': 4, 'TX_RETRY_BACKOFF': 0}
+        settings.update(config)
+        app = create_app(settings)
+        apps.append(app)
+        return app
+
+    yield factory
+    for app in apps:
+        shutdown_app(app)
+    _forget_database()
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def app_db(app, client):
+    """Base de l'application (ouverte par une première requête)"""
+    client.get('/api/users')
+    return opened_database(app)
+
+@pytest.fixture
+def db():
+    """Base en mémoire sans application (modèles, migrations, tâches de fond)"""
+    database = get_db.instance = Database(storage='memory://')
+    yield database
+    database.close()
+    _forget_database()
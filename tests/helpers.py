@@ -0,0 +1,17 @@
+"""Création d'objets par l'API pour les tests"""
+
+def create_user(client, username='alice', email=None, password='secret'):
+    response = client.post('/api/users', json={
+        'username': username, 'email': email or f'{username}@example.com', 'password': password})
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['id']
+
+def create_list(client, user_id, title='Courses'):
+    response = client.post('/api/lists', json={'title': title, 'user_id': user_id})
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['id']
+
+def create_todo(client, user_id, list_id, title='Tâche', **fields):
+    response = client.post('/api/todos', json={'title': title, 'list_id': list_id, 'user_id': user_id, **fields})
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['id']
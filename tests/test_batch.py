@@ -0,0 +1,34 @@
+from app.indexes import check_todo_stats
+from tests.helpers import create_list, create_todo, create_user
+
+def test_batch_applies_operations_in_one_commit(client, app_db):
+    user_id = create_user(client)
+    list_id = create_list(client, user_id)
+    existing = create_todo(client, user_id, list_id)
+    before = app_db.last_transaction()
+
+    response = client.post('/api/todos/batch', json={'operations': [
+        {'op': 'create', 'data': {'title': 'nouvelle', 'list_id': list_id, 'user_id': user_id}},
+        {'op': 'update', 'id': existing, 'data': {'title': 'renommée'}},
+        {'op': 'complete', 'id': existing},
+        {'op': 'delete', 'id': 'inconnue'},
+    ]})
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [result['status'] for result in results] == [201, 200, 200, 404]
+    assert results[2]['todo']['is_completed'] is True
+
+    with app_db.db.transaction() as connection:
+        assert len(connection.root().todos) == 2
+        assert check_todo_stats(connection.root()) == []
+    assert client.get(f'/api/lists/{list_id}').get_json()['todo_count'] == 2
+    # Une seule transaction pour tout le lot
+    history = app_db.storage.iterator(before)
+    assert len([txn for txn in history if txn.tid != before]) == 1
+
+def test_invalid_batch_is_rejected_without_commit(client, app_db):
+    before = app_db.last_transaction()
+    assert client.post('/api/todos/batch', json={'operations': []}).status_code == 400
+    assert client.post('/api/todos/batch', json={'operations': [{'op': 'drop'}]}).status_code == 400
+    assert client.post('/api/todos/batch', json=[]).status_code == 400
+    assert app_db.last_transaction() == before
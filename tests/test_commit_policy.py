@@ -0,0 +1,55 @@
+import pytest
+from flask import jsonify
+from app.database import get_db
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+
+    @app.route('/test/write', methods=['GET', 'POST'])
+    def write():
+        get_db().root.marker = 'written'
+        status = int(app.config.get('TEST_STATUS', 200))
+        return jsonify({}), status
+
+    @app.route('/test/fail', methods=['POST'])
+    def fail():
+        get_db().root.marker = 'failed'
+        raise RuntimeError('échec')
+
+    return app
+
+def marker(app_db):
+    with app_db.db.transaction() as connection:
+        return getattr(connection.root(), 'marker', None)
+
+def commits(app, client, app_db, method, path, status=200):
+    app.config['TEST_STATUS'] = status
+    before = app_db.last_transaction()
+    getattr(client, method)(path)
+    return app_db.last_transaction() != before
+
+def test_successful_write_is_committed(app, client, app_db):
+    assert commits(app, client, app_db, 'post', '/test/write')
+    assert marker(app_db) == 'written'
+
+def test_read_is_not_committed(app, client, app_db):
+    assert not commits(app, client, app_db, 'get', '/test/write')
+    assert marker(app_db) is None
+
+@pytest.mark.parametrize('status', [400, 404, 409])
+def test_client_error_is_not_committed(app, client, app_db, status):
+    assert not commits(app, client, app_db, 'post', '/test/write', status)
+    assert marker(app_db) is None
+
+def test_exception_is_aborted(app, client, app_db):
+    app.config['PROPAGATE_EXCEPTIONS'] = False
+    assert not commits(app, client, app_db, 'post', '/test/fail')
+    assert marker(app_db) is None
+
+def test_api_reads_do_not_commit(client, app_db):
+    before = app_db.last_transaction()
+    client.get('/api/users')
+    client.get('/api/lists')
+    client.post('/api/users', json={})
+    assert app_db.last_transaction() == before
@@ -0,0 +1,100 @@
+import datetime
+import types
+import pytest
+import transaction
+from ZODB.POSException import ConflictError
+from app import jobs
+from app.jobs import JOB_HANDLERS, JobRunner
+from app.models.job import Job, JobResult
+
+@pytest.fixture
+def runner(db):
+    runner = JobRunner(db, workers=1, stale_seconds=60, retry_attempts=3, retry_backoff=0)
+    yield runner
+    runner.stop()
+
+def add_job(db, kind='flaky', **fields):
+    job = Job(kind, {})
+    for name, value in fields.items():
+        setattr(job, name, value)
+    db.root.jobs[job.id] = job
+    transaction.commit()
+    return job.id
+
+def load_job(db, job_id):
+    with db.db.transaction() as connection:
+        job = connection.root().jobs[job_id]
+        return job.status, job.attempts, job.owner, job.error, job.summary
+
+def test_claim(db, runner):
+    pending = add_job(db)
+    fresh = add_job(db, status=Job.RUNNING, owner='ailleurs', heartbeat=datetime.datetime.now())
+    stale = add_job(db, status=Job.RUNNING, owner='ailleurs',
+                    heartbeat=datetime.datetime.now() - datetime.timedelta(minutes=5))
+    done = add_job(db, status=Job.SUCCEEDED)
+
+    connection = db.open_connection()
+    try:
+        root = connection.root()
+        assert runner._claim(root, fresh) is None
+        assert runner._claim(root, done) is None
+        for job_id in (pending, stale):
+            job = runner._claim(root, job_id)
+            assert job.status == Job.RUNNING and job.owner == runner.owner and job.attempts == 1
+    finally:
+        transaction.abort()
+        connection.close()
+    assert load_job(db, stale)[2] == runner.owner
+
+@pytest.fixture
+def flaky(monkeypatch):
+    """Gestionnaire qui échoue sur un conflit lors des `conflicts` premiers appels"""
+    state = types.SimpleNamespace(conflicts=0, calls=[], delays=[])
+
+    def handler(root, job, runner):
+        state.calls.append(job.id)
+        if len(state.calls) <= state.conflicts:
+            raise ConflictError()
+        return {'calls': len(state.calls)}
+
+    monkeypatch.setitem(JOB_HANDLERS, 'flaky', handler)
+    monkeypatch.setattr(jobs, 'retry_delay', lambda backoff, attempt: state.delays.append(attempt) or 0)
+    return state
+
+def test_retry_after_conflict(db, runner, flaky):
+    flaky.conflicts = 2
+    job_id = add_job(db)
+    runner._run(job_id)
+    status, attempts, _, error, summary = load_job(db, job_id)
+    assert (status, attempts, error, summary) == (Job.SUCCEEDED, 1, None, {'calls': 3})
+    # Attente croissante entre les essais
+    assert flaky.delays == [1, 2]
+
+def test_unresolved_conflict_fails(db, runner, flaky):
+    flaky.conflicts = 10
+    job_id = add_job(db)
+    runner._run(job_id)
+    status, _, _, error, _ = load_job(db, job_id)
+    assert status == Job.FAILED and error == "Conflit d'écriture non résolu"
+    assert len(flaky.calls) == 3 and flaky.delays == [1, 2]
+
+def test_resume_submits_pending_and_expires_old_jobs(db, runner, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(runner, 'submit', submitted.append)
+    pending = add_job(db)
+    old = add_job(db, status=Job.SUCCEEDED, finished_at=datetime.datetime.now() - datetime.timedelta(days=30))
+    assert runner.resume() == [pending] and submitted == [pending]
+    with db.db.transaction() as connection:
+        assert old not in connection.root().jobs
+
+def test_result_chunks_keep_their_order(db):
+    result = JobResult()
+    for i in range(5):
+        result.append(f'{i}\n')
+    assert result.next_index == 5
+    assert ''.join(result.iter_chunks()) == '0\n1\n2\n3\n4\n'
+
+    # Résultat écrit avant le compteur de rang : repris après le dernier morceau
+    del result.next_index
+    result.append('5\n')
+    assert list(result.chunks.keys()) == list(range(6))
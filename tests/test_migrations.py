@@ -0,0 +1,58 @@
+import pytest
+import transaction
+from app.indexes import check_todo_stats
+from app.migrations import convert_keys
+from app.models.job import Job
+from app.utils.ids import IntKeyBTree
+from tests.helpers import create_list, create_todo, create_user
+
+@pytest.fixture
+def data(client):
+    user_id = create_user(client)
+    list_id = create_list(client, user_id)
+    todo_ids = [create_todo(client, user_id, list_id, title=f'tâche {i}') for i in range(3)]
+    return user_id, list_id, todo_ids
+
+def test_convert_keys_to_int(client, app_db, data):
+    user_id, list_id, todo_ids = data
+    with app_db.db.transaction() as connection:
+        job = Job('export_user', {'user_id': user_id})
+        job.status = Job.SUCCEEDED
+        connection.root().jobs[job.id] = job
+        job_id = job.id
+
+    with app_db.db.transaction() as connection:
+        root = connection.root()
+        id_map = convert_keys(root, 'int')
+        assert len(id_map) == 5
+        assert isinstance(root.users, IntKeyBTree) and root.key_type == 'int'
+        assert root.jobs[job_id].params['user_id'] == id_map[user_id]
+        assert check_todo_stats(root) == []
+
+    new_user, new_list = id_map[user_id], id_map[list_id]
+    assert new_user.isdigit()
+    assert client.get(f'/api/users/{user_id}').status_code == 404
+    assert client.get('/api/users?username=alice').get_json()[0]['id'] == new_user
+    todos = client.get(f'/api/todos?user_id={new_user}&all=true').get_json()
+    assert sorted(todo['id'] for todo in todos) == sorted(id_map[todo_id] for todo_id in todo_ids)
+    assert {todo['list_id'] for todo in todos} == {new_list}
+    assert client.get(f'/api/lists/{new_list}').get_json()['todo_count'] == 3
+    assert client.get(f'/api/todos/search?user_id={new_user}&q=tâche').status_code == 200
+
+    # Nouvelles clés entières après conversion
+    assert create_list(client, new_user, 'Autre').isdigit()
+
+def test_convert_keys_refuses_unfinished_jobs(app_db, data):
+    user_id, _, _ = data
+    with app_db.db.transaction() as connection:
+        # Pas de runner : la tâche reste en attente
+        job = Job('export_user', {'user_id': user_id})
+        connection.root().jobs[job.id] = job
+    with app_db.db.transaction() as connection:
+        with pytest.raises(RuntimeError):
+            convert_keys(connection.root(), 'int')
+        transaction.abort()
+
+def test_convert_keys_to_current_type_is_a_no_op(app_db, data):
+    with app_db.db.transaction() as connection:
+        assert convert_keys(connection.root(), 'uuid') == {}
@@ -0,0 +1,61 @@
+import base64
+import json
+import pytest
+from app.utils.pagination import PaginationError, decode_cursor, encode_cursor
+from tests.helpers import create_list, create_todo, create_user
+
+def raw_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip('=')
+
+@pytest.fixture(params=['uuid', 'int'])
+def client(request, make_app):
+    return make_app(ZODB_KEY_TYPE=request.param, PAGE_SIZE_DEFAULT=3).test_client()
+
+@pytest.fixture
+def todos(client):
+    user_id = create_user(client)
+    list_id = create_list(client, user_id)
+    return user_id, [create_todo(client, user_id, list_id, title=f't{i}') for i in range(5)]
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(['a', 1])) == ('a', 1)
+    with pytest.raises(PaginationError):
+        decode_cursor('!!')
+
+def test_pages_cover_every_item_once(client, todos):
+    _, ids = todos
+    seen, cursor = [], None
+    while True:
+        query = '/api/todos?limit=2' + (f'&cursor={cursor}' if cursor else '')
+        page = client.get(query).get_json()
+        seen += [item['id'] for item in page['items']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert sorted(seen) == sorted(ids)
+
+def test_default_page_size(client, todos):
+    page = client.get('/api/todos').get_json()
+    assert len(page['items']) == 3 and page['next_cursor'] is not None
+
+def test_unbounded_list_is_opt_in(client, todos):
+    assert len(client.get('/api/todos?all=true').get_json()) == 5
+    assert len(client.get('/api/todos?stream=true').get_json()) == 5
+
+@pytest.mark.parametrize('cursor', ['!!', raw_cursor([1, 'a', 3]), raw_cursor({'a': 1}), raw_cursor([[1]])])
+def test_invalid_cursor_is_rejected(client, todos, cursor):
+    user_id, _ = todos
+    for path in ('/api/todos', '/api/lists', f'/api/todos?user_id={user_id}', f'/api/todos?user_id={user_id}&sort=due_date'):
+        separator = '&' if '?' in path else '?'
+        response = client.get(f'{path}{separator}cursor={cursor}')
+        assert response.status_code == 400, path
+
+def test_non_numeric_cursor_on_integer_keys(make_app):
+    client = make_app(ZODB_KEY_TYPE='int').test_client()
+    user_id = create_user(client)
+    create_list(client, user_id)
+    assert client.get(f"/api/lists?cursor={raw_cursor('zzz')}").status_code == 400
+
+def test_invalid_limit_is_rejected(client, todos):
+    assert client.get('/api/todos?limit=0').status_code == 400
+    assert client.get('/api/todos?limit=abc').status_code == 400
@@ -0,0 +1,75 @@
+import time
+import pytest
+from app.indexes import ChangeLog
+from app.utils.pagination import decode_cursor
+from tests.helpers import create_list, create_todo, create_user
+
+@pytest.fixture
+def lag(monkeypatch):
+    """Pas de délai de validation : le jeton suit immédiatement les écritures"""
+    monkeypatch.setattr(ChangeLog, 'commit_lag_seconds', 0)
+
+@pytest.fixture
+def data(client):
+    user_id = create_user(client)
+    lists = [create_list(client, user_id, f'L{i}') for i in range(2)]
+    todos = [create_todo(client, user_id, lists[i % 2], title=f't{i}') for i in range(4)]
+    return user_id, lists, todos
+
+def sync(client, query):
+    # Les entrées écrites dans la même milliseconde que le jeton seraient renvoyées
+    time.sleep(0.002)
+    response = client.get(f'/api/sync?{query}')
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+def test_snapshot_without_token(client, data):
+    user_id, lists, todos = data
+    result = sync(client, f'user_id={user_id}')
+    assert result['reset'] is True
+    assert (len(result['users']), len(result['lists']), len(result['todos'])) == (1, 2, 4)
+    assert decode_cursor(result['token'])[1] == user_id
+
+def test_changes_since_token(client, data, lag):
+    user_id, lists, todos = data
+    token = sync(client, f'user_id={user_id}')['token']
+    assert sync(client, f'since={token}')['todos'] == []
+
+    client.put(f'/api/todos/{todos[0]}', json={'title': 'modifiée'})
+    client.delete(f'/api/lists/{lists[1]}')
+    result = sync(client, f'since={token}')
+    assert result['reset'] is False
+    assert [todo['title'] for todo in result['todos']] == ['modifiée']
+    deleted = {(entry['type'], entry['id']) for entry in result['deleted']}
+    # Les tâches de la liste supprimée n'ont pas d'entrée propre
+    assert deleted == {('list', lists[1])}
+
+    assert sync(client, f'since={result["token"]}')['todos'] == []
+
+def test_changes_are_paged(client, data, lag):
+    user_id, lists, todos = data
+    token = sync(client, f'user_id={user_id}')['token']
+    for todo_id in todos:
+        client.put(f'/api/todos/{todo_id}/complete')
+
+    seen, has_more = [], True
+    while has_more:
+        result = sync(client, f'since={token}&limit=3')
+        seen += [todo['id'] for todo in result['todos']]
+        token, has_more = result['token'], result['has_more']
+    assert sorted(seen) == sorted(todos)
+
+def test_token_is_not_cached(client, data, monkeypatch):
+    user_id, _, _ = data
+    first = sync(client, f'user_id={user_id}')['token']
+    monkeypatch.setattr(ChangeLog, 'commit_lag_seconds', 0)
+    # Aucune écriture entre les deux : même tid, mais le jeton avance avec l'heure
+    assert sync(client, f'user_id={user_id}')['token'] != first
+
+def test_invalid_requests(client, data):
+    user_id, _, _ = data
+    other = create_user(client, 'bob')
+    token = sync(client, f'user_id={user_id}')['token']
+    for query in ('', 'since=abc', f'since={token}&user_id={other}', f'since={token}&limit=0'):
+        assert client.get(f'/api/sync?{query}').status_code == 400, query
+    assert client.get('/api/sync?user_id=inconnu').status_code == 404
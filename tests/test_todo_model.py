@@ -0,0 +1,38 @@
+import datetime
+import transaction
+from app.models.todo import STATE_VERSION, Todo
+
+LIST_ID = '6f1c2d4e-8a3b-4c5d-9e7f-0a1b2c3d4e5f'
+
+def legacy_state(**fields):
+    """__dict__ pickle d'une tâche d'avant les slots"""
+    state = {
+        'id': '1b9d6bcd-bbfd-4b2d-9b5d-ab8dfbbd4bed', 'title': 'Ancienne', 'description': 'avant',
+        'list_id': LIST_ID, 'user_id': '42', 'created_at': datetime.datetime(2023, 5, 1, 12, 30),
+    }
+    state.update(fields)
+    return state
+
+def test_legacy_state_is_loaded_with_defaults():
+    todo = Todo.__new__(Todo)
+    todo.__setstate__(legacy_state())
+    assert todo.id == '1b9d6bcd-bbfd-4b2d-9b5d-ab8dfbbd4bed' and todo.user_id == '42'
+    assert todo.priority == 1 and todo.is_completed is False
+    assert todo.updated_at == todo.created_at and todo.due_date is None and todo.completed_at is None
+    assert todo.to_dict()['list_id'] == LIST_ID
+
+def test_legacy_state_is_rewritten_compact(db):
+    due = datetime.datetime(2024, 1, 2, 8, 0, tzinfo=datetime.timezone(datetime.timedelta(hours=2)))
+    todo = Todo.__new__(Todo)
+    todo.__setstate__(legacy_state(due_date=due, priority=3, is_completed=True,
+                                   completed_at=datetime.datetime(2024, 1, 3)))
+    state = todo.__getstate__()
+    assert state[0] == STATE_VERSION and isinstance(state[1], bytes) and isinstance(state[5], int)
+
+    db.root.todos[todo.id] = todo
+    transaction.commit()
+    with db.db.transaction() as connection:
+        loaded = connection.root().todos[todo.id]
+        assert (loaded.title, loaded.priority, loaded.is_completed) == ('Ancienne', 3, True)
+        assert loaded.due_date == due and loaded.due_date.utcoffset() == due.utcoffset()
+        assert loaded.to_dict() == todo.to_dict()
@@ -0,0 +1,54 @@
+from app.indexes import check_todo_stats, rebuild_todo_stats
+from tests.helpers import create_list, create_todo, create_user
+
+def check(app_db):
+    with app_db.db.transaction() as connection:
+        return check_todo_stats(connection.root())
+
+def test_counters_follow_todo_changes(client, app_db):
+    user_id = create_user(client)
+    first, second = create_list(client, user_id, 'L1'), create_list(client, user_id, 'L2')
+    todos = [create_todo(client, user_id, first if i < 4 else second, title=f't{i}', priority=i % 3 + 1,
+                         due_date='2020-01-01T00:00:00' if i < 2 else None)
+             for i in range(6)]
+    client.put(f'/api/todos/{todos[0]}/complete')
+    client.put(f'/api/todos/{todos[1]}', json={'priority': 3, 'list_id': second})
+    client.delete(f'/api/todos/{todos[5]}')
+
+    stats = client.get(f'/api/users/{user_id}/stats').get_json()
+    assert (stats['total'], stats['completed'], stats['open'], stats['overdue']) == (5, 1, 4, 1)
+    stats = client.get(f'/api/lists/{second}/stats').get_json()
+    assert (stats['total'], stats['overdue']) == (2, 1)
+    assert check(app_db) == []
+
+def test_cascade_deletes_counters(client, app_db):
+    user_id = create_user(client)
+    first, second = create_list(client, user_id, 'L1'), create_list(client, user_id, 'L2')
+    for i in range(3):
+        create_todo(client, user_id, first, title=f'a{i}')
+        create_todo(client, user_id, second, title=f'b{i}')
+
+    assert client.delete(f'/api/lists/{first}').status_code == 200
+    assert client.get(f'/api/users/{user_id}').get_json()['list_count'] == 1
+    assert client.get(f'/api/users/{user_id}/stats').get_json()['total'] == 3
+    assert check(app_db) == []
+
+    assert client.delete(f'/api/users/{user_id}').status_code == 200
+    assert client.get(f'/api/users/{user_id}/stats').status_code == 404
+    with app_db.db.transaction() as connection:
+        stats = connection.root().todo_stats
+        assert list(stats.by_user.keys()) == [] and list(stats.by_list.keys()) == []
+    assert check(app_db) == []
+
+def test_check_reports_and_repairs_drift(client, app_db):
+    user_id = create_user(client)
+    list_id = create_list(client, user_id)
+    create_todo(client, user_id, list_id)
+    with app_db.db.transaction() as connection:
+        connection.root().todo_stats.by_list[list_id].total.change(5)
+
+    mismatches = check(app_db)
+    assert [(m['scope'], m['id']) for m in mismatches] == [('list', list_id)]
+    with app_db.db.transaction() as connection:
+        assert rebuild_todo_stats(connection.root()) == 1
+    assert check(app_db) == []
@@ -0,0 +1,52 @@
+import pytest
+import transaction
+from app.indexes import UserIndex, rebuild_user_index
+from app.models.user import User
+from tests.helpers import create_user
+
+def test_index_conflicts_and_reindex():
+    index = UserIndex()
+    alice = User('alice', 'Alice@Example.com', 'x')
+    index.index(alice)
+    assert index.find_by_email(' alice@example.COM ') == alice.id
+    assert index.username_taken('alice') and not index.username_taken('alice', alice.id)
+    assert index.email_taken('ALICE@example.com', 'other')
+
+    alice.username, alice.email = 'alicia', 'alicia@example.com'
+    index.reindex(alice, 'alice', 'Alice@Example.com')
+    assert index.find_by_username('alice') is None and index.find_by_email('alice@example.com') is None
+    assert index.find_by_username('alicia') == alice.id
+
+def test_rebuild_skips_duplicates(db):
+    root = db.root
+    first, second = User('bob', 'bob@example.com', 'x'), User('bob', 'other@example.com', 'x')
+    root.users[first.id], root.users[second.id] = first, second
+    assert rebuild_user_index(root) == 1
+    transaction.abort()
+
+def test_create_conflicts(client):
+    create_user(client, 'alice', 'alice@example.com')
+    same_name = client.post('/api/users', json={'username': 'alice', 'email': 'a2@example.com', 'password': 'p'})
+    same_email = client.post('/api/users', json={'username': 'alice2', 'email': 'ALICE@example.com', 'password': 'p'})
+    assert same_name.status_code == 409 and same_email.status_code == 409
+
+def test_update_conflicts(client):
+    create_user(client, 'alice')
+    bob = create_user(client, 'bob')
+    assert client.put(f'/api/users/{bob}', json={'username': 'alice'}).status_code == 409
+    assert client.put(f'/api/users/{bob}', json={'email': 'alice@example.com'}).status_code == 409
+    # Garder son propre nom n'est pas un conflit
+    assert client.put(f'/api/users/{bob}', json={'username': 'bob'}).status_code == 200
+    assert client.put(f'/api/users/{bob}', json={'username': 'robert'}).status_code == 200
+    assert client.get('/api/users?username=bob').get_json() == []
+    assert client.get('/api/users?username=robert').get_json()[0]['id'] == bob
+
+@pytest.mark.parametrize('fields', [{'email': 123}, {'username': ['a']}, {'username': '  '}, {'email': None}])
+def test_invalid_identifiers_are_rejected(client, fields):
+    data = {'username': 'carol', 'email': 'carol@example.com', 'password': 'p', **fields}
+    assert client.post('/api/users', json=data).status_code == 400
+    user_id = create_user(client, 'dave')
+    assert client.put(f'/api/users/{user_id}', json=fields).status_code == 400
+    login = {'password': 'p', **{key: value for key, value in fields.items() if value is not None}}
+    assert client.post('/api/auth/login', json=login).status_code == 400
+    assert client.get('/api/users?email=').status_code == 400